@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.core.admission import llm_admission
 from app.core.database import get_db
-from app.models.models import Commit, Project, CommitAI
+from app.api.auth import current_user_id
+from app.models.models import Commit, CommitAI, CommitFile, Project, ProjectCommit, QnA
 from app.services.portia_agent import portia_agent
 from app.services.github_service import github_service
+from app.services.llm_executor import RequestCancelled, LLMUnavailable
+from app.services.qna_cache import (
+    normalize_question, question_hash, context_version, find_answer, record_hit, shared,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+
 @router.post("/qna")
 async def ask_question(
+    request: Request,
     body: dict = Body(...),
     db: AsyncSession = Depends(get_db)
 ):
@@ -17,7 +28,7 @@ async def ask_question(
     sha = body.get("sha")
     project_id = body.get("project_id")
     
-    print(f"🤖 Asking AI: {question}")
+    logger.info("Q&A request for project %s (sha=%s)", project_id, sha)
     
     if not question or not project_id:
         raise HTTPException(status_code=400, detail="Missing question or project_id")
@@ -42,17 +53,22 @@ async def ask_question(
         ai_result = await db.execute(select(CommitAI).where(CommitAI.sha == sha))
         ai_summary = ai_result.scalar_one_or_none()
         
-        # Get GitHub commit details
-        try:
-            gh_commit = await github_service.get_commit_details(
-                owner=project.github_owner,
-                repo=project.github_repo,
-                sha=sha
-            )
-            files = [f.get("filename") for f in (gh_commit.get("files") or [])]
-        except Exception as e:
-            print(f"⚠️ Failed to fetch GitHub details: {e}")
-            files = commit.files_summary or []
+        # File list from commit_files, GitHub only when it is not stored
+        files_result = await db.execute(
+            select(CommitFile.path).where(CommitFile.sha == sha).order_by(CommitFile.id)
+        )
+        files = list(files_result.scalars())
+        if not files:
+            try:
+                gh_commit = await github_service.get_commit_details(
+                    owner=project.github_owner,
+                    repo=project.github_repo,
+                    sha=sha
+                )
+                files = [f.get("filename") for f in (gh_commit.get("files") or [])]
+            except Exception as e:
+                logger.warning("Failed to fetch GitHub details for %s: %s", sha, e)
+                files = commit.files_summary or []
         
         context_blocks.append({
             "sha": sha,
@@ -63,42 +79,85 @@ async def ask_question(
             "date": commit.committed_at.isoformat()
         })
         
-        print(f"📋 Context for commit {sha[:8]}: {len(files)} files, summary: {'Yes' if ai_summary else 'No'}")
+        logger.debug("Context for commit %s: %d files, summary=%s", sha[:8], len(files), bool(ai_summary))
         
     else:
-        # Fallback: last 5 commits for the project
+        # Fallback: last 5 commits for the project, with their summaries in the same query
         commits_result = await db.execute(
-            select(Commit).where(Commit.project_id == project_id)
-            .order_by(Commit.committed_at.desc()).limit(5)
+            select(Commit, CommitAI.simple_explanation)
+            .join(ProjectCommit, ProjectCommit.sha == Commit.sha)
+            .outerjoin(CommitAI, CommitAI.sha == Commit.sha)
+            .where(ProjectCommit.project_id == project_id)
+            .order_by(ProjectCommit.committed_at.desc()).limit(5)
         )
-        commits = commits_result.scalars().all()
+        commits = commits_result.all()
         
-        for c in commits:
-            # Get AI summary for each commit
-            ai_result = await db.execute(select(CommitAI).where(CommitAI.sha == c.sha))
-            ai_summary = ai_result.scalar_one_or_none()
-            
+        for c, explanation in commits:
             context_blocks.append({
                 "sha": c.sha,
                 "message": c.message,
-                "summary": ai_summary.simple_explanation if ai_summary else "No AI summary available",
+                "summary": explanation or "No AI summary available",
                 "files": c.files_summary or [],
                 "author": c.author_name,
                 "date": c.committed_at.isoformat()
             })
         
-        print(f"📋 Context: {len(commits)} recent commits")
+        logger.debug("Context: %d recent commits", len(commits))
 
-    # Call Portia for Q&A
-    try:
-        answer = await portia_agent.answer_question(
+    # Same question over the same context: serve the stored answer
+    normalized = normalize_question(question)
+    version = context_version(context_blocks)
+    cached = await find_answer(db, project_id, sha, normalized, version)
+    if cached is not None:
+        await record_hit(db, cached)
+        logger.info("Q&A answered from cache (#%s)", cached.id)
+        return {"answer": cached.answer, "plan_run_id": cached.plan_run_id, "cached": True, "qna_id": cached.id}
+
+    async def generate():
+        async with llm_admission.admit(request):
+            answer = await portia_agent.answer_question(
+                question=question,
+                context_blocks=context_blocks,
+                request=request,
+                fallback=False
+            )
+        qna = QnA(
+            sha=sha,
+            project_id=project_id,
+            user_id=await current_user_id(request, db),
             question=question,
-            context_blocks=context_blocks
+            answer=answer["answer"],
+            plan_run_id=answer.get("plan_run_id"),
+            normalized_question=normalized,
+            question_hash=question_hash(normalized),
+            context_version=version,
         )
-        print(f"✅ AI answered: {answer['answer'][:100]}...")
+        db.add(qna)
+        await db.commit()
+        return {**answer, "cached": False, "qna_id": qna.id}
+
+    # Call Portia for Q&A; identical questions in flight share one call
+    try:
+        answer = await shared((project_id, sha, normalized, version), generate)
+        if answer is None:
+            # The request we waited on failed or went away; answer on our own
+            answer = await generate()
+        logger.info("Q&A answered (%d chars)", len(answer["answer"]))
         return answer
+    except RequestCancelled:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except HTTPException:
+        # Shed by admission control (429 with Retry-After)
+        raise
+    except LLMUnavailable as e:
+        # Not stored, so the question is tried again next time
+        logger.warning("Q&A unavailable: %s", e)
+        return {
+            "answer": "I'm experiencing technical difficulties. Please try your question again in a moment.",
+            "plan_run_id": None
+        }
     except Exception as e:
-        print(f"❌ Q&A failed: {e}")
+        logger.exception("Q&A failed: %s", e)
         return {
             "answer": "I'm having trouble processing your question. Please try again or rephrase it.",
             "plan_run_id": None
@@ -1,19 +1,23 @@
-from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, Depends, Query
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import secrets
 import os
-import httpx
+import logging
+from typing import Optional
 
 from app.core.database import get_db
 from app.models.models import User
+from app.services.github_service import github_service, GitHubAPIError, GitHubUnavailable
 from app.services.oauth_github import (
     get_authorize_url,
     exchange_code_for_token,
     get_github_user,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -106,11 +110,20 @@ async def github_callback(
         return response
 
     except Exception as e:
-        print(f"OAuth error: {e}")
+        logger.exception("OAuth error: %s", e)
         error_redirect = f"{FRONTEND_URL}/connect?auth=error"
         return RedirectResponse(url=error_redirect, status_code=302)
 
 
+async def current_user_id(request: Request, db: AsyncSession) -> Optional[int]:
+    """Id of the user whose token is in the cookie, or None when signed out"""
+    token = request.cookies.get("github_token")
+    if not token:
+        return None
+    result = await db.execute(select(User.id).where(User.access_token == token))
+    return result.scalar_one_or_none()
+
+
 @router.get("/me")
 async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)):
     """Get current authenticated user based on cookie token."""
@@ -131,59 +144,59 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
     }
 
 
+REPO_SORTS = {
+    "updated": (lambda r: r["updated_at"] or "", True),
+    "name": (lambda r: r["name"].casefold(), False),
+    "stars": (lambda r: r["stargazers_count"] or 0, True),
+}
+
+
 @router.get("/repositories")
-async def get_user_repositories(request: Request, db: AsyncSession = Depends(get_db)):
-    """Get current user's GitHub repositories (requires cookie)."""
+async def get_user_repositories(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, description="Match name, owner or description"),
+    visibility: str = Query("all", pattern="^(all|public|private)$"),
+    sort: str = Query("updated", pattern="^(updated|name|stars)$"),
+    page: int = Query(1, ge=1),
+    per_page: Optional[int] = Query(None, ge=1, le=100, description="Omit for the full list"),
+):
+    """Get current user's GitHub repositories (requires cookie).
+
+    The full list is fetched from GitHub once and cached per user; search, sort
+    and pagination run over the cached copy. X-Total-Count is the number of matches.
+    """
     token = request.cookies.get("github_token")
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                "https://api.github.com/user/repos",
-                headers={
-                    "Authorization": f"token {token}",
-                    "Accept": "application/vnd.github.v3+json",
-                    "User-Agent": "Synapse-App",
-                },
-                params={
-                    "sort": "updated",
-                    "per_page": 100,
-                },
-                timeout=30,
-            )
-            if resp.status_code == 200:
-                repos = resp.json()
-                # Format minimal
-                return [
-                    {
-                        "id": r["id"],
-                        "name": r["name"],
-                        "full_name": r["full_name"],
-                        "description": r.get("description"),
-                        "language": r.get("language"),
-                        "stargazers_count": r.get("stargazers_count", 0),
-                        "updated_at": r["updated_at"],
-                        "html_url": r["html_url"],
-                        "private": r.get("private", False),
-                        "owner": {
-                            "login": r["owner"]["login"],
-                            "avatar_url": r["owner"]["avatar_url"],
-                        },
-                    }
-                    for r in repos
-                ]
-
-            if resp.status_code == 401:
-                raise HTTPException(status_code=401, detail="GitHub token expired")
-
-            print(f"GitHub API error: {resp.status_code} - {resp.text}")
-            raise HTTPException(status_code=400, detail="Failed to fetch repositories")
-
-    except httpx.RequestError as e:
-        print(f"Request error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to connect to GitHub")
+        repos = await github_service.list_user_repositories(token)
+    except GitHubAPIError as e:
+        if e.status_code == 401:
+            raise HTTPException(status_code=401, detail="GitHub token expired")
+        logger.warning("GitHub API error: %s", e)
+        if isinstance(e, GitHubUnavailable):
+            raise HTTPException(status_code=504, detail="GitHub did not respond in time")
+        raise HTTPException(status_code=502, detail="Failed to fetch repositories from GitHub")
     except Exception as e:
-        print(f"Repository fetch error: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        logger.exception("Repository fetch error: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if visibility != "all":
+        repos = [r for r in repos if r["private"] == (visibility == "private")]
+    if q:
+        needle = q.casefold()
+        repos = [
+            r for r in repos
+            if needle in r["full_name"].casefold() or needle in (r["description"] or "").casefold()
+        ]
+    if sort != "updated":
+        # The cached list is already most recently updated first
+        key, reverse = REPO_SORTS[sort]
+        repos = sorted(repos, key=key, reverse=reverse)
+
+    response.headers["X-Total-Count"] = str(len(repos))
+    if per_page is not None:
+        repos = repos[(page - 1) * per_page:page * per_page]
+    return repos
\ No newline at end of file
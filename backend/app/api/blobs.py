@@ -0,0 +1,33 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db
+from app.services.blob_store import blob_stats, train_dictionary
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def get_blob_stats(db: AsyncSession = Depends(get_db)):
+    """Compression ratio per codec and how often patches are shared between file rows"""
+    return await blob_stats(db)
+
+
+@router.post("/dictionary")
+async def create_blob_dictionary(
+    max_samples: int = Query(2000, ge=50, le=20000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Train a compression dictionary on the newest small patches; used for blobs written afterwards"""
+    try:
+        dictionary = await train_dictionary(db, max_samples=max_samples)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "id": dictionary.id,
+        "codec": dictionary.codec,
+        "size": len(dictionary.data),
+        "sample_count": dictionary.sample_count,
+    }
@@ -1,15 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import os
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime
+from app.core.admission import llm_admission
+from app.core.deadline import deadline
 from app.core.database import get_db
-from app.models.models import Commit, CommitAI, Project, User
-from app.services.portia_agent import portia_agent
-from app.services.github_service import github_service
+from app.models.models import Commit, CommitAI, Project, ProjectCommit, User
+from app.services.github_service import GitHubUnavailable, github_service
 from app.services.gemini_service import gemini_service
+from app.services.llm_executor import RequestCancelled
+from app.services.blob_store import content_hash
+from app.services.activity import record_summaries
+from app.services.commit_files import store_commit_files, stored_files, stored_patch
+from app.services.commit_summaries import generate_summary, summary_row, summary_dict
+from app.services.prefetch import summary_prefetcher
+from app.services.qna_cache import question_history
+from app.services.timeline_events import publish_summaries
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Lines per page of GET /commits/{sha}/files/{path}/patch
+PATCH_PAGE_LINES = 2000
+PATCH_MAX_PAGE_LINES = 20000
+# A commit's patches never change, so clients may keep them for good
+PATCH_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Budget for the GitHub fetch of the interactive commit and patch views
+COMMIT_VIEW_DEADLINE_SECONDS = float(os.getenv("COMMIT_VIEW_DEADLINE_SECONDS", "10"))
+
+
+async def _backfill_files(db: AsyncSession, commit: Commit, gh_files) -> None:
+    """Store file rows and patches fetched from GitHub so the next view skips it"""
+    try:
+        if await store_commit_files(db, commit, gh_files):
+            await db.commit()
+    except Exception as e:
+        logger.debug("Skipped file row backfill for %s: %s", commit.sha[:8], e)
+        await db.rollback()
+
+
+async def _fetch_for_view(project: Project, sha: str) -> dict:
+    """Commit details for a page a user is waiting on: hedged, and within the view's deadline"""
+    try:
+        with deadline(COMMIT_VIEW_DEADLINE_SECONDS):
+            return await github_service.get_commit_details(
+                owner=project.github_owner,
+                repo=project.github_repo,
+                sha=sha,
+                hedge=True
+            )
+    except GitHubUnavailable as e:
+        logger.warning("GitHub did not answer for %s: %s", sha[:8], e)
+        raise HTTPException(status_code=504, detail="GitHub did not respond in time")
+
 
 @router.get("/{sha}")
 async def get_commit(
@@ -28,26 +75,33 @@ async def get_commit(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # 3. Fetch commit details from GitHub
-    gh_commit = await github_service.get_commit_details(
-        owner=project.github_owner,
-        repo=project.github_repo,
-        sha=sha
-    )
+    # 3. File metadata from the database; GitHub only for commits not stored yet.
+    # Patches are loaded per file from /commits/{sha}/files/{path}/patch
+    files = await stored_files(db, sha)
+    if files is None:
+        gh_commit = await _fetch_for_view(project, sha)
 
-    # 4. Extract files info
-    files = []
-    if gh_commit and "files" in gh_commit:
-        files = [
-            {
-                "filename": f.get("filename"),
-                "status": f.get("status"),
-                "additions": f.get("additions"),
-                "deletions": f.get("deletions"),
-                "patch": (f.get("patch") or "")[:4000],  # optional, for AI
-            }
-            for f in gh_commit["files"]
-        ]
+        # 4. Extract files info
+        files = []
+        if gh_commit and "files" in gh_commit:
+            files = [
+                {
+                    "filename": f.get("filename"),
+                    "previous_filename": f.get("previous_filename"),
+                    "status": f.get("status"),
+                    "additions": f.get("additions"),
+                    "deletions": f.get("deletions"),
+                    "has_patch": bool(f.get("patch")),
+                    "patch_size": len(f["patch"].encode("utf-8")) if f.get("patch") else None,
+                }
+                for f in gh_commit["files"]
+            ]
+            await _backfill_files(db, commit, gh_commit["files"])
+
+    projects_result = await db.execute(
+        select(ProjectCommit.project_id).where(ProjectCommit.sha == sha).order_by(ProjectCommit.project_id)
+    )
+    project_ids = list(projects_result.scalars())
 
     # 5. AI summary as before
     ai_result = await db.execute(select(CommitAI).where(CommitAI.sha == sha))
@@ -61,7 +115,9 @@ async def get_commit(
         "committed_at": commit.committed_at.isoformat(),
         "files": files,  # <-- THIS IS WHAT THE FRONTEND NEEDS!
         "url": commit.url,
-        "project_id": commit.project_id
+        "project_id": commit.project_id,
+        # Every connected project whose history contains the commit
+        "project_ids": project_ids
     }
 
     if ai_summary:
@@ -76,14 +132,70 @@ async def get_commit(
 
     return commit_dict
 
+@router.get("/{sha}/files/{path:path}/patch")
+async def get_file_patch(
+    sha: str,
+    path: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0, description="First line of the patch to return"),
+    limit: int = Query(PATCH_PAGE_LINES, ge=1, le=PATCH_MAX_PAGE_LINES),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full (untruncated) patch of one file of a commit, ``limit`` lines at a time"""
+    stored = await stored_patch(db, sha, path)
+    if stored is None:
+        result = await db.execute(select(Commit).where(Commit.sha == sha))
+        commit = result.scalar_one_or_none()
+        if not commit:
+            raise HTTPException(status_code=404, detail="Commit not found")
+        project_result = await db.execute(select(Project).where(Project.id == commit.project_id))
+        project = project_result.scalar_one_or_none()
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        gh_commit = await _fetch_for_view(project, sha)
+        gh_files = (gh_commit or {}).get("files") or []
+        gh_file = next((f for f in gh_files if f.get("filename") == path), None)
+        if gh_file is None:
+            raise HTTPException(status_code=404, detail="File not found in commit")
+        if not gh_file.get("patch"):
+            raise HTTPException(status_code=404, detail="No patch available for this file")
+        await _backfill_files(db, commit, gh_files)
+        stored = (content_hash(gh_file["patch"]), gh_file["patch"])
+
+    patch_hash, patch = stored
+    # Weak: the body may be gzip-encoded on the way out
+    etag = f'W/"{patch_hash[:32]}-{offset}-{limit}"'
+    headers = {"ETag": etag, "Cache-Control": PATCH_CACHE_CONTROL}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    lines = patch.splitlines(keepends=True)
+    page = lines[offset:offset + limit]
+    end = offset + len(page)
+    return {
+        "sha": sha,
+        "path": path,
+        "offset": offset,
+        "total_lines": len(lines),
+        "next_offset": end if end < len(lines) else None,
+        "patch": "".join(page),
+    }
+
 @router.post("/{sha}/summarize")
 async def summarize_commit(
     sha: str,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """Generate AI summary for a commit"""
-    print(f"🔄 Starting AI summary for commit {sha}")
+    logger.info("Starting AI summary for commit %s", sha)
     
+    # A background prefetch may already be summarizing this commit
+    await summary_prefetcher.wait_for(sha)
+
     # Check if summary already exists
     ai_result = await db.execute(
         select(CommitAI).where(CommitAI.sha == sha)
@@ -91,15 +203,8 @@ async def summarize_commit(
     existing_summary = ai_result.scalar_one_or_none()
     
     if existing_summary:
-        print(f"✅ Found existing summary for commit {sha}")
-        return {
-            "simple_explanation": existing_summary.simple_explanation,
-            "technical_summary": existing_summary.technical_summary,
-            "how_to_test": existing_summary.how_to_test,
-            "tags": existing_summary.tags,
-            "risk_level": existing_summary.risk_level.value,
-            "plan_run_id": existing_summary.plan_run_id
-        }
+        logger.debug("Found existing summary for commit %s", sha)
+        return summary_dict(existing_summary)
     
     # Get commit from database
     commit_result = await db.execute(
@@ -115,56 +220,33 @@ async def summarize_commit(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    print(f"📋 Processing commit: {commit.message[:50]}...")
-
-    # Fetch commit details from GitHub for diff and files
-    try:
-        gh_commit = await github_service.get_commit_details(
-            owner=project.github_owner,
-            repo=project.github_repo,
-            sha=sha
-        )
-        files = [f.get("filename") for f in (gh_commit.get("files") or [])]
-        patches = [(f.get("patch") or "") for f in (gh_commit.get("files") or []) if f.get("patch")]
-        diff_snippet = ("\n\n".join(patches))[:8000]
-        
-        print(f"📁 Found {len(files)} files in commit")
-        
-    except Exception as e:
-        print(f"⚠️ Failed to fetch GitHub details: {e}")
-        files = []
-        diff_snippet = ""
+    logger.debug("Processing commit %s", sha[:8])
 
     try:
-        print(f"🧠 Generating AI summary with Portia...")
-        summary = await portia_agent.summarize_commit(
-            message=commit.message,
-            diff_snippet=diff_snippet,
-            files=files
-        )
+        # Only generation is admission-controlled; stored summaries are served above
+        async with llm_admission.admit(request):
+            summary, file_patches = await generate_summary(project, commit, request=request)
         
-        print(f"✅ AI Summary generated successfully")
-        print(f"📝 Summary: {summary.get('simple_explanation', 'No explanation')[:100]}...")
+        logger.info("AI summary generated for commit %s", sha[:8])
         
         # Save to database
-        ai_summary = CommitAI(
-            sha=sha,
-            simple_explanation=summary["simple_explanation"],
-            technical_summary=summary["technical_summary"],
-            how_to_test=summary["how_to_test"],
-            tags=summary["tags"],
-            risk_level=summary["risk_level"],
-            plan_run_id=summary.get("plan_run_id")
-        )
-        db.add(ai_summary)
+        db.add(summary_row(sha, summary))
+        await record_summaries(db, {sha: summary["risk_level"]})
+        await store_commit_files(db, commit, file_patches)
         await db.commit()
+        await publish_summaries(db, {sha: summary})
         
-        print(f"💾 AI Summary saved to database for commit {sha}")
+        logger.debug("AI summary saved for commit %s", sha)
         return summary
         
+    except RequestCancelled:
+        logger.info("Client went away while summarizing %s", sha[:8])
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except HTTPException:
+        # Shed by admission control (429 with Retry-After); no fallback is stored
+        raise
     except Exception as e:
-        print(f"❌ AI summary failed for {sha}: {str(e)}")
-        print(f"🔄 Using fallback summary...")
+        logger.warning("AI summary failed for %s, using fallback: %s", sha, e)
         
         # Create fallback summary
         fallback_summary = {
@@ -200,10 +282,12 @@ async def summarize_commit(
                 plan_run_id=None
             )
             db.add(ai_summary)
+            await record_summaries(db, {sha: fallback_summary["risk_level"]})
             await db.commit()
-            print(f"💾 Fallback summary saved to database for commit {sha}")
+            await publish_summaries(db, {sha: fallback_summary})
+            logger.debug("Fallback summary saved for commit %s", sha)
         except Exception as db_error:
-            print(f"❌ Failed to save fallback summary: {db_error}")
+            logger.error("Failed to save fallback summary for %s: %s", sha, db_error)
         
         return fallback_summary
 
@@ -214,7 +298,7 @@ async def get_gemini_summary(
     db: AsyncSession = Depends(get_db)
 ):
     """Get Gemini AI summary for a commit"""
-    print(f"🔄 Starting Gemini summary for commit {sha}")
+    logger.info("Starting Gemini summary for commit %s", sha)
     
     # Get commit from DB
     result = await db.execute(select(Commit).where(Commit.sha == sha))
@@ -250,15 +334,16 @@ async def get_gemini_summary(
         )
         
         files = gh_commit.get("files", [])
-        print(f"📁 Found {len(files)} files for Gemini analysis")
+        logger.debug("Found %d files for Gemini analysis", len(files))
         
         # Generate Gemini summary
-        summary = await gemini_service.summarize_commit(
-            message=commit.message,
-            files=files
-        )
-        
-        print(f"✅ Gemini summary generated successfully")
+        async with llm_admission.admit(request):
+            summary = await gemini_service.summarize_commit(
+                message=commit.message,
+                files=files,
+                request=request,
+                sha=sha
+            )
         
         return {
             "sha": sha,
@@ -267,13 +352,31 @@ async def get_gemini_summary(
             "generated_at": datetime.utcnow().isoformat()
         }
         
+    except RequestCancelled:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Gemini summary failed for {sha}: {e}")
+        logger.exception("Gemini summary failed for %s: %s", sha, e)
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to generate Gemini summary: {str(e)}"
         )
 
+@router.get("/{sha}/questions")
+async def get_commit_questions(
+    sha: str,
+    project_id: Optional[int] = Query(None, description="Only questions asked in this project"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """Questions asked about a commit and their stored answers, newest first"""
+    result = await db.execute(select(Commit.sha).where(Commit.sha == sha))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Commit not found")
+    return await question_history(db, project_id, sha, limit, offset)
+
 # Add a debug endpoint to check commit status
 @router.get("/{sha}/debug")
 async def debug_commit(
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException
+from app.core import query_trace
+
+router = APIRouter()
+
+
+@router.get("/sql-traces")
+async def list_sql_traces(n_plus_one_only: bool = False, limit: int = 20):
+    """Most recent per-request SQL summaries (only mounted when SQL_TRACE is on)"""
+    traces = list(query_trace.recent_traces)
+    if n_plus_one_only:
+        traces = [t for t in traces if t["n_plus_one"]]
+    return list(reversed(traces))[:limit]
+
+
+@router.get("/sql-traces/{request_id}")
+async def get_sql_trace(request_id: str):
+    for trace in reversed(query_trace.recent_traces):
+        if trace["request_id"] == request_id:
+            return trace
+    raise HTTPException(status_code=404, detail="Trace not found")
@@ -0,0 +1,106 @@
+import os
+import asyncio
+import logging
+from collections import Counter
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from sqlalchemy import select
+from app.core import metrics
+from app.core.admission import client_key
+from app.core.database import AsyncSessionLocal
+from app.core.pubsub import event_bus
+from app.models.models import Project
+from app.services.timeline_events import project_channel
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Open event sockets per worker, and per user (GitHub session, else client address)
+EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "1000"))
+EVENTS_MAX_PER_CLIENT = int(os.getenv("EVENTS_MAX_PER_CLIENT", "5"))
+# Idle sockets get a ping this often, so proxies keep them open and dead peers are noticed
+EVENTS_PING_SECONDS = float(os.getenv("EVENTS_PING_SECONDS", "25"))
+# A client that doesn't take a message within this long is disconnected
+EVENTS_SEND_TIMEOUT_SECONDS = 10
+
+# Close codes: 1013 "try again later"; 4404 is application-defined
+CLOSE_TRY_AGAIN = 1013
+CLOSE_NOT_FOUND = 4404
+
+EVENT_SOCKETS = metrics.Gauge("synapse_event_sockets", "Open timeline event sockets")
+EVENT_SOCKETS_REJECTED = metrics.Counter(
+    "synapse_event_sockets_rejected_total", "Event sockets refused by connection limits", ("reason",)
+)
+
+_open_total = 0
+_open_per_client: Counter = Counter()
+
+
+async def _send_events(websocket: WebSocket, subscription) -> None:
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.get(), EVENTS_PING_SECONDS)
+        except asyncio.TimeoutError:
+            event = {"type": "ping"}
+        await asyncio.wait_for(websocket.send_json(event), EVENTS_SEND_TIMEOUT_SECONDS)
+
+
+async def _drain(websocket: WebSocket) -> None:
+    # Clients don't send anything; reading is how a disconnect is noticed
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/{project_id}/events")
+async def project_events(websocket: WebSocket, project_id: int):
+    """Push timeline events for a project: new commits, new summaries, and resync.
+
+    A client that receives ``resync`` missed events and should refetch the timeline.
+    """
+    global _open_total
+    await websocket.accept()
+    key = client_key(websocket)
+    if _open_total >= EVENTS_MAX_CONNECTIONS or _open_per_client[key] >= EVENTS_MAX_PER_CLIENT:
+        reason = "total" if _open_total >= EVENTS_MAX_CONNECTIONS else "per_client"
+        EVENT_SOCKETS_REJECTED.inc(reason=reason)
+        await websocket.close(code=CLOSE_TRY_AGAIN, reason="Too many event connections")
+        return
+
+    # A short-lived session: the socket must not hold a database connection while open
+    async with AsyncSessionLocal() as db:
+        exists = (await db.execute(select(Project.id).where(Project.id == project_id))).scalar_one_or_none()
+    if exists is None:
+        await websocket.close(code=CLOSE_NOT_FOUND, reason="Project not found")
+        return
+
+    _open_total += 1
+    _open_per_client[key] += 1
+    EVENT_SOCKETS.inc()
+    subscription = event_bus.subscribe(project_channel(project_id))
+    tasks = [
+        asyncio.ensure_future(_send_events(websocket, subscription)),
+        asyncio.ensure_future(_drain(websocket)),
+    ]
+    try:
+        await websocket.send_json({"type": "hello", "project_id": project_id})
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if isinstance(error, asyncio.TimeoutError):
+                logger.info("Event socket of project %s too slow, closing", project_id)
+                await websocket.close(code=CLOSE_TRY_AGAIN, reason="Client too slow")
+            elif error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning("Event socket of project %s failed: %s", project_id, error)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        event_bus.unsubscribe(subscription)
+        EVENT_SOCKETS.dec()
+        _open_total -= 1
+        _open_per_client[key] -= 1
+        if _open_per_client[key] <= 0:
+            del _open_per_client[key]
@@ -0,0 +1,61 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.core.database import get_db
+from app.api.auth import current_user_id
+from app.models.models import Project
+from app.services.history_export import ndjson_lines, csv_lines, iter_ndjson, import_records
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+    "csv": ("text/csv; charset=utf-8", csv_lines),
+}
+
+
+@router.get("/{project_id}/export")
+async def export_project(
+    project_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream every commit of a project with its AI summary and file stats.
+
+    NDJSON starts with a project record and can be fed back to POST /projects/import;
+    CSV has one row per commit with per-commit file totals.
+    """
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    project = result.scalar_one_or_none()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    media_type, lines = EXPORT_FORMATS[format]
+    filename = f"{project.github_owner}-{project.github_repo}-commits.{format}"
+    return StreamingResponse(
+        lines(project),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import")
+async def import_project(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Load an NDJSON export, creating the project if needed. Existing commits are skipped.
+
+    A new project is connected by the signed-in user, if any.
+    """
+    user_id = await current_user_id(request, db)
+    try:
+        return await import_records(db, iter_ndjson(request.stream()), user_id=user_id)
+    except (ValueError, KeyError) as e:
+        # json.JSONDecodeError is a ValueError
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Invalid import: {e}")
@@ -1,17 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, func, and_, or_, exists, literal, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import selectinload
-from app.core.database import get_db
-from app.models.models import Project, User, Commit, CommitAI
-from app.services.github_service import github_service
-from datetime import datetime
-from pydantic import BaseModel
+from app.core.admission import llm_admission
+from app.core.database import get_db, engine
+from app.models.models import Project, ProjectBranch, ProjectCommit, BranchCommit, User, Commit, CommitAI, RiskLevel
+from app.services.commit_files import file_hotspots, language_breakdown, path_history
+from app.services.branches import sync_project, track_branch, tracked_branches
+from app.services.github_service import GitHubAPIError, GitHubUnavailable
+from app.services.llm_executor import RequestCancelled
+from app.services.timeline_events import publish_commits
+from app.services.release_notes import (
+    build_release_notes, find_release_notes, release_notes_dict, resolve_range, stored_notes
+)
+from app.services.activity import rebuild_activity, project_activity, BUCKETS
+from app.services.prefetch import summary_prefetcher, PREFETCH_DEFAULT_LIMIT
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
 
 class ProjectCreate(BaseModel):
     name: str
     github_owner: str
     github_repo: str
+    # Newest commits to summarize in the background (0 disables, None = server default)
+    prefetch_limit: Optional[int] = Field(None, ge=0, le=500)
+    # Tracked in addition to the repository's default branch
+    branches: Optional[List[str]] = None
+
+class BranchCreate(BaseModel):
+    name: str = Field(..., min_length=1)
+
+class ReleaseNotesRequest(BaseModel):
+    # Tags, branches or commit SHAs
+    base: str = Field(..., min_length=1)
+    head: str = Field(..., min_length=1)
+    # Generate again even when notes for this range are stored
+    refresh: bool = False
 
 router = APIRouter()
 
@@ -45,86 +74,48 @@ async def create_project(
     
     if existing:
         commits_result = await db.execute(
-            select(Commit).where(Commit.project_id == existing.id).limit(1)
+            select(ProjectCommit.sha).where(ProjectCommit.project_id == existing.id).limit(1)
         )
         has_commits = commits_result.scalar_one_or_none()
         
         if has_commits:
-            print(f"📋 Project {existing.id} already has commits")
+            logger.debug("Project %s already has commits", existing.id)
             return existing
         else:
-            print(f"📋 Project {existing.id} exists but no commits, fetching...")
+            logger.info("Project %s exists but has no commits, fetching", existing.id)
             db_project = existing
     else:
         db_project = Project(
             name=project.name,
             github_owner=project.github_owner,
             github_repo=project.github_repo,
-            connected_by_user_id=user.id
+            connected_by_user_id=user.id,
+            prefetch_limit=project.prefetch_limit
         )
         db.add(db_project)
         await db.commit()
         await db.refresh(db_project)
-        print(f"📋 Created new project {db_project.id}")
-    
-    print(f"🔍 Fetching commits for {project.github_owner}/{project.github_repo}")
-    
-    all_commits = []
-    for page in range(1, 6):
-        try:
-            github_commits = await github_service.get_public_repo_commits(
-                project.github_owner,
-                project.github_repo,
-                per_page=30,
-                page=page
-            )
-            
-            if not github_commits:
-                break
-                
-            all_commits.extend(github_commits)
-            print(f"📄 Page {page}: {len(github_commits)} commits")
-            
-            if len(all_commits) >= 100:
-                break
-                
-        except Exception as e:
-            print(f"❌ Error fetching page {page}: {e}")
-            break
-    
-    print(f"✅ Fetched {len(all_commits)} commits from GitHub")
-    
-    stored_count = 0
-    for commit_data in all_commits:
-        try:
-            existing_commit = await db.execute(
-                select(Commit).where(Commit.sha == commit_data["sha"])
-            )
-            if existing_commit.scalar_one_or_none():
-                continue
-                
-            commit = Commit(
-                sha=commit_data["sha"],
-                project_id=db_project.id,
-                message=commit_data["commit"]["message"],
-                author_name=commit_data["commit"]["author"]["name"],
-                author_login=commit_data["author"]["login"] if commit_data.get("author") else None,
-                committed_at=datetime.fromisoformat(commit_data["commit"]["author"]["date"].replace("Z", "+00:00")),
-                files_summary=[],
-                url=commit_data["html_url"]
-            )
-            db.add(commit)
-            stored_count += 1
-            
-        except Exception as e:
-            print(f"❌ Error storing commit: {e}")
-            continue
+        logger.info("Created project %s", db_project.id)
     
+    logger.info("Fetching commits for %s/%s", project.github_owner, project.github_repo)
+
+    # Commits are stored once per SHA: history shared with another project (a fork,
+    # another tracked branch) is only linked, reusing files and summaries
+    for name in project.branches or []:
+        await track_branch(db, db_project, name)
+    results = await _sync_or_502(db, db_project)
+    new_commits = [c for sync in results for c in sync.new_commits]
+
     try:
         await db.commit()
-        print(f"💾 Stored {stored_count} commits in Supabase")
+        logger.info(
+            "Stored %d new commits for project %s, linked %d shared ones",
+            len(new_commits), db_project.id, sum(sync.shared for sync in results),
+        )
+        summary_prefetcher.schedule(db_project.id, new_commits, db_project.prefetch_limit)
+        await publish_commits(db_project.id, new_commits, sum(sync.stored + sync.shared for sync in results))
     except Exception as e:
-        print(f"❌ Database commit failed: {e}")
+        logger.error("Database commit failed: %s", e)
         await db.rollback()
     
     return db_project
@@ -144,42 +135,104 @@ async def get_project(
     
     return project
 
+def _tags_clause(tags: List[str]):
+    """Summaries carrying every tag in ``tags``"""
+    if engine.dialect.name == "postgresql":
+        # JSONB containment, served by the GIN index on commit_ai.tags
+        return type_coerce(CommitAI.tags, JSONB).contains(tags)
+    values = func.json_each(CommitAI.tags).table_valued("value")
+    return and_(*(
+        exists(select(literal(1)).select_from(values).where(values.c.value == tag))
+        for tag in tags
+    ))
+
 @router.get("/{project_id}/commits")
 async def get_project_commits(
     project_id: int,
-    page: int = 1,
-    per_page: int = 20,
+    response: Response,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    risk_level: Optional[List[RiskLevel]] = Query(None, description="Repeat for several levels"),
+    tag: Optional[List[str]] = Query(None, description="Repeat to require several tags"),
+    author: Optional[str] = Query(None, description="GitHub login or author name"),
+    since: Optional[datetime] = Query(None, description="Committed at or after (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Committed before (ISO 8601)"),
+    branch: Optional[str] = Query(None, description="Only commits on this tracked branch"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get commits for a project with their AI summaries"""
+    """Get commits for a project with their AI summaries.
+
+    Optional filters combine with AND; risk_level and tag only match summarized
+    commits. The total number of matches is returned in X-Total-Count.
+    """
     offset = (page - 1) * per_page
     
-    print(f"📊 Fetching commits for project {project_id}, page {page}")
+    logger.debug("Fetching commits for project %s, page %d", project_id, page)
+
+    branch_id = None
+    if branch:
+        branch_id = (await db.execute(
+            select(ProjectBranch.id).where(ProjectBranch.project_id == project_id, ProjectBranch.name == branch)
+        )).scalar_one_or_none()
+        if branch_id is None:
+            raise HTTPException(status_code=404, detail=f"Branch {branch!r} is not tracked")
     
     try:
-        # Get commits with a more explicit query
+        # Branch membership carries its own committed_at, so a branch timeline pages on its index
+        membership = BranchCommit if branch_id is not None else ProjectCommit
+        conditions = [ProjectCommit.project_id == project_id]
+        if branch_id is not None:
+            conditions.append(BranchCommit.branch_id == branch_id)
+        if author:
+            conditions.append(or_(Commit.author_login == author, Commit.author_name == author))
+        if since:
+            conditions.append(membership.committed_at >= since)
+        if until:
+            conditions.append(membership.committed_at < until)
+        if risk_level:
+            conditions.append(CommitAI.risk_level.in_(risk_level))
+        if tag:
+            conditions.append(_tags_clause(tag))
+
+        # One query for commits and summaries; an inner join when filtering on the summary
+        needs_summary = bool(risk_level or tag)
+
+        def with_summary(query):
+            query = query.join(ProjectCommit, ProjectCommit.sha == Commit.sha)
+            if branch_id is not None:
+                query = query.join(BranchCommit, BranchCommit.sha == Commit.sha)
+            if needs_summary:
+                return query.join(CommitAI, CommitAI.sha == Commit.sha)
+            return query.outerjoin(CommitAI, CommitAI.sha == Commit.sha)
+
         commits_query = (
-            select(Commit)
-            .where(Commit.project_id == project_id)
-            .order_by(Commit.committed_at.desc())
+            with_summary(select(Commit, CommitAI))
+            .where(*conditions)
+            .order_by(membership.committed_at.desc(), membership.sha)
             .offset(offset)
             .limit(per_page)
         )
+        if needs_summary or author:
+            count_query = with_summary(select(func.count()).select_from(Commit)).where(*conditions)
+        elif branch_id is not None:
+            count_query = (
+                select(func.count()).select_from(BranchCommit)
+                .join(ProjectCommit, ProjectCommit.sha == BranchCommit.sha)
+                .where(*conditions)
+            )
+        else:
+            # Membership alone answers the count
+            count_query = select(func.count()).select_from(ProjectCommit).where(*conditions)
         
         result = await db.execute(commits_query)
-        commits = result.scalars().all()
+        rows = result.all()
+        total = (await db.execute(count_query)).scalar_one()
+        response.headers["X-Total-Count"] = str(total)
         
-        print(f"📋 Found {len(commits)} commits in database")
+        logger.debug("Found %d of %d matching commits in database", len(rows), total)
         
         commits_data = []
-        for commit in commits:
-            print(f"🔍 Processing commit {commit.sha[:8]}...")
-            
-            # Get AI summary with explicit query
-            ai_query = select(CommitAI).where(CommitAI.sha == commit.sha)
-            ai_result = await db.execute(ai_query)
-            ai_summary = ai_result.scalar_one_or_none()
-            
+        for commit, ai_summary in rows:
             commit_dict = {
                 "sha": commit.sha,
                 "message": commit.message,
@@ -188,7 +241,7 @@ async def get_project_commits(
                 "committed_at": commit.committed_at.isoformat(),
                 "files_summary": commit.files_summary or [],
                 "url": commit.url,
-                "project_id": commit.project_id,
+                "project_id": project_id,
                 "ai_summary": None
             }
             
@@ -203,24 +256,252 @@ async def get_project_commits(
                         "risk_level": ai_summary.risk_level.value if ai_summary.risk_level else "low",
                         "plan_run_id": ai_summary.plan_run_id
                     }
-                    print(f"✅ Added AI summary for commit {commit.sha[:8]}")
                 except Exception as e:
-                    print(f"❌ Error formatting AI summary for {commit.sha[:8]}: {e}")
+                    logger.warning("Error formatting AI summary for %s: %s", commit.sha[:8], e)
                     commit_dict["ai_summary"] = None
-            else:
-                print(f"📝 No AI summary found for commit {commit.sha[:8]}")
             
             commits_data.append(commit_dict)
         
-        # Final debug info
-        commits_with_ai = [c for c in commits_data if c["ai_summary"]]
-        print(f"📊 Returning {len(commits_data)} commits, {len(commits_with_ai)} with AI summaries")
-        
-        if commits_with_ai:
-            print(f"🧠 First AI summary example: {commits_with_ai[0]['ai_summary']['simple_explanation'][:100]}...")
-        
+        if logger.isEnabledFor(logging.DEBUG):
+            with_ai = sum(1 for c in commits_data if c["ai_summary"])
+            logger.debug("Returning %d commits, %d with AI summaries", len(commits_data), with_ai)
+
         return commits_data
         
     except Exception as e:
-        print(f"❌ Error in get_project_commits: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch commits: {str(e)}")
\ No newline at end of file
+        logger.exception("Error in get_project_commits: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch commits: {str(e)}")
+
+@router.get("/{project_id}/prefetch")
+async def get_prefetch_status(project_id: int):
+    """Progress of background summaries queued for this project (this worker only)"""
+    status = summary_prefetcher.status(project_id)
+    if status is None:
+        return {"project_id": project_id, "requested": 0, "pending": 0}
+    return {"project_id": project_id, **status}
+
+@router.post("/{project_id}/prefetch")
+async def schedule_prefetch(
+    project_id: int,
+    limit: Optional[int] = Query(None, ge=0, le=500, description="Also saved as the project's prefetch_limit"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue background summaries for the newest commits that have none yet"""
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    project = result.scalar_one_or_none()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if limit is not None:
+        project.prefetch_limit = limit
+        await db.commit()
+
+    effective = project.prefetch_limit if project.prefetch_limit is not None else PREFETCH_DEFAULT_LIMIT
+    result = await db.execute(
+        select(Commit)
+        .join(ProjectCommit, ProjectCommit.sha == Commit.sha)
+        .outerjoin(CommitAI, CommitAI.sha == Commit.sha)
+        .where(ProjectCommit.project_id == project_id, CommitAI.id.is_(None))
+        .order_by(ProjectCommit.committed_at.desc())
+        .limit(effective)
+    )
+    queued = summary_prefetcher.schedule(project_id, result.scalars().all(), effective)
+    return {"project_id": project_id, "prefetch_limit": project.prefetch_limit, "queued": queued}
+
+@router.get("/{project_id}/files/hotspots")
+async def get_file_hotspots(
+    project_id: int,
+    days: int = Query(90, ge=0, description="Window in days; 0 for all history"),
+    limit: int = Query(20, ge=1, le=200),
+    include_generated: bool = Query(False, description="Count lockfiles, minified and vendored files too"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Files changed in the most commits over the window, with line churn"""
+    since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+    hotspots = await file_hotspots(db, project_id, since, limit, include_generated=include_generated)
+    return {"project_id": project_id, "days": days, "hotspots": hotspots}
+
+@router.get("/{project_id}/files/languages")
+async def get_file_languages(
+    project_id: int,
+    days: int = Query(90, ge=0, description="Window in days; 0 for all history"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Changed lines per language over the window, generated files excluded"""
+    since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+    languages = await language_breakdown(db, project_id, since)
+    return {"project_id": project_id, "days": days, "languages": languages}
+
+@router.get("/{project_id}/files/history")
+async def get_path_history(
+    project_id: int,
+    path: str = Query(..., min_length=1, description="File path, or a directory ending in '/'"),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Commits that touched a file (or any file under a directory), newest first"""
+    history = await path_history(db, project_id, path, per_page, (page - 1) * per_page)
+    return {"project_id": project_id, "path": path, "page": page, "commits": history}
+
+@router.get("/{project_id}/activity")
+async def get_project_activity(
+    project_id: int,
+    days: int = Query(365, ge=0, description="Window in days; 0 for all history"),
+    bucket: str = Query("week", description="Series bucket: day, week or month"),
+    author: Optional[str] = Query(None, description="Only this author (login, else name)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Commits-per-day heatmap, per-author activity and risk levels over time, from daily rollups"""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(BUCKETS)}")
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).date() if days else None
+    activity = await project_activity(db, project_id, since, bucket, author)
+    return {"project_id": project_id, "days": days, "bucket": bucket, **activity}
+
+@router.post("/{project_id}/activity/rebuild")
+async def rebuild_project_activity(
+    project_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Recount the activity rollups from the project's commits (after imports or manual edits)"""
+    result = await db.execute(select(Project.id).where(Project.id == project_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    commits = await rebuild_activity(db, project_id)
+    return {"project_id": project_id, "commits": commits}
+
+def _branch_dict(branch: ProjectBranch) -> dict:
+    return {
+        "name": branch.name,
+        "is_default": branch.is_default,
+        "head_sha": branch.head_sha,
+        "synced_at": branch.synced_at.isoformat() if branch.synced_at else None,
+    }
+
+async def _get_project_or_404(db: AsyncSession, project_id: int) -> Project:
+    project = (await db.execute(select(Project).where(Project.id == project_id))).scalar_one_or_none()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+async def _sync_or_502(db: AsyncSession, project: Project, names: Optional[List[str]] = None):
+    try:
+        return await sync_project(db, project, names)
+    except GitHubAPIError as e:
+        await db.rollback()
+        logger.warning("Syncing project %s failed: %s", project.id, e)
+        if isinstance(e, GitHubUnavailable):
+            raise HTTPException(status_code=504, detail="GitHub did not respond in time")
+        raise HTTPException(status_code=502, detail="Failed to fetch commits from GitHub")
+
+@router.get("/{project_id}/branches")
+async def list_branches(
+    project_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Tracked branches, default first"""
+    await _get_project_or_404(db, project_id)
+    return [_branch_dict(b) for b in await tracked_branches(db, project_id)]
+
+@router.post("/{project_id}/branches")
+async def add_branch(
+    project_id: int,
+    body: BranchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Track a branch and ingest the commits it has beyond the default branch"""
+    project = await _get_project_or_404(db, project_id)
+    branch = await track_branch(db, project, body.name)
+    results = await _sync_or_502(db, project, [body.name])
+    if branch.head_sha is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=f"Branch {body.name!r} not found on GitHub")
+    await db.commit()
+    new_commits = [c for sync in results for c in sync.new_commits]
+    summary_prefetcher.schedule(project.id, new_commits, project.prefetch_limit)
+    await publish_commits(project.id, new_commits, sum(sync.stored + sync.shared for sync in results))
+    return {**_branch_dict(branch), "sync": [sync.as_dict() for sync in results]}
+
+@router.delete("/{project_id}/branches/{name:path}")
+async def remove_branch(
+    project_id: int,
+    name: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Stop tracking a branch; commits on no other tracked branch leave the project"""
+    await _get_project_or_404(db, project_id)
+    branch = (await db.execute(
+        select(ProjectBranch).where(ProjectBranch.project_id == project_id, ProjectBranch.name == name)
+    )).scalar_one_or_none()
+    if branch is None:
+        raise HTTPException(status_code=404, detail=f"Branch {name!r} is not tracked")
+    if branch.is_default:
+        raise HTTPException(status_code=400, detail="The default branch can't be untracked")
+
+    on_branch = select(BranchCommit.sha).where(BranchCommit.branch_id == branch.id)
+    on_other_branches = (
+        select(BranchCommit.sha)
+        .join(ProjectBranch, ProjectBranch.id == BranchCommit.branch_id)
+        .where(ProjectBranch.project_id == project_id, ProjectBranch.id != branch.id)
+    )
+    unlinked = await db.execute(
+        delete(ProjectCommit)
+        .where(
+            ProjectCommit.project_id == project_id,
+            ProjectCommit.sha.in_(on_branch),
+            ProjectCommit.sha.not_in(on_other_branches),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(delete(BranchCommit).where(BranchCommit.branch_id == branch.id))
+    await db.delete(branch)
+    await db.commit()
+    if unlinked.rowcount:
+        await rebuild_activity(db, project_id)
+    return {"name": name, "removed_commits": unlinked.rowcount}
+
+@router.post("/{project_id}/sync")
+async def sync_project_branches(
+    project_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Fetch new commits on every tracked branch, comparing from the last synced head"""
+    project = await _get_project_or_404(db, project_id)
+    results = await _sync_or_502(db, project)
+    await db.commit()
+    new_commits = [c for sync in results for c in sync.new_commits]
+    summary_prefetcher.schedule(project.id, new_commits, project.prefetch_limit)
+    await publish_commits(project.id, new_commits, sum(sync.stored + sync.shared for sync in results))
+    return {"project_id": project_id, "branches": [sync.as_dict() for sync in results]}
+
+@router.post("/{project_id}/release-notes")
+async def release_notes(
+    project_id: int,
+    body: ReleaseNotesRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Release notes for the commits in base...head, built from per-commit summaries"""
+    project = await _get_project_or_404(db, project_id)
+    try:
+        commit_range = await resolve_range(db, project, body.base, body.head)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except GitHubAPIError as e:
+        logger.warning("Resolving %s...%s failed: %s", body.base, body.head, e)
+        raise HTTPException(status_code=502, detail="Failed to compare the range on GitHub")
+
+    if not body.refresh:
+        stored = await find_release_notes(db, commit_range)
+        if stored is not None:
+            return release_notes_dict(stored_notes(stored), commit_range, cached=True)
+
+    try:
+        # Only generation is admission-controlled; stored notes are served above
+        async with llm_admission.admit(request):
+            return await build_release_notes(db, project, commit_range, request=request)
+    except RequestCancelled:
+        logger.info("Client went away while writing release notes for %s...%s", body.base, body.head)
+        raise HTTPException(status_code=499, detail="Client closed request")
@@ -0,0 +1,214 @@
+import os
+import math
+import time
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from fastapi import HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Requests running at once across the LLM-backed endpoints of this worker
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+# Requests allowed to wait for a slot; beyond this they are shed with 429
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+# Longest a request may wait for a slot; arrivals whose estimated wait is longer are shed at once
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+# Per user (GitHub session, else client address); 0 disables the limit
+ADMISSION_USER_CONCURRENT = int(os.getenv("ADMISSION_USER_CONCURRENT", "2"))
+ADMISSION_USER_RATE_PER_MINUTE = float(os.getenv("ADMISSION_USER_RATE_PER_MINUTE", "20"))
+ADMISSION_USER_BURST = int(os.getenv("ADMISSION_USER_BURST", "5"))
+# Idle per-user entries are pruned once there are this many
+MAX_TRACKED_USERS = 10000
+
+ADMISSION_DECISIONS = metrics.Counter(
+    "synapse_admission_total", "Admission decisions for LLM-backed endpoints", ("pool", "result")
+)
+ADMISSION_RUNNING = metrics.Gauge(
+    "synapse_admission_running", "Requests holding an admission slot", ("pool",)
+)
+ADMISSION_QUEUE_DEPTH = metrics.Gauge(
+    "synapse_admission_queue_depth", "Requests waiting for an admission slot", ("pool",)
+)
+ADMISSION_WAIT = metrics.Histogram(
+    "synapse_admission_wait_seconds", "Time spent waiting for an admission slot", ("pool",)
+)
+
+
+class _UserState:
+    __slots__ = ("tokens", "updated_at", "in_flight")
+
+    def __init__(self, burst: int):
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.in_flight = 0
+
+
+def client_key(request: HTTPConnection) -> str:
+    """Who a request is charged to: the GitHub session if there is one, else the client address"""
+    token = request.cookies.get("github_token")
+    if token:
+        return "user:" + hashlib.sha256(token.encode()).hexdigest()[:16]
+    return "addr:" + (request.client.host if request.client else "unknown")
+
+
+class AdmissionController:
+    """Global concurrency with a bounded FIFO queue, plus per-user concurrency and rate limits.
+
+    Excess load is rejected with 429 and a Retry-After derived from the
+    observed service time, instead of queueing work no one will wait for.
+    Per worker: each uvicorn process enforces its own limits.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_wait: float,
+        user_concurrent: int,
+        user_rate_per_minute: float,
+        user_burst: int,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.user_concurrent = user_concurrent
+        self.user_rate = user_rate_per_minute / 60.0
+        self.user_burst = max(user_burst, 1)
+        self._running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._users: Dict[str, _UserState] = {}
+        # Moving average of how long an admitted request holds its slot; None until measured
+        self._service_seconds: Optional[float] = None
+
+    def _reject(self, result: str, retry_after: float, detail: str) -> HTTPException:
+        ADMISSION_DECISIONS.inc(pool=self.name, result=result)
+        seconds = max(1, math.ceil(retry_after))
+        return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(seconds)})
+
+    def estimated_wait(self) -> float:
+        """Expected queueing delay for a request arriving now"""
+        if self._running < self.max_concurrent and not self._waiters:
+            return 0.0
+        return (len(self._waiters) + 1) * (self._service_seconds or 1.0) / max(self.max_concurrent, 1)
+
+    def _user(self, key: str) -> _UserState:
+        state = self._users.get(key)
+        if state is None:
+            if len(self._users) >= MAX_TRACKED_USERS:
+                self._prune()
+            state = self._users[key] = _UserState(self.user_burst)
+        return state
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key, state in list(self._users.items()):
+            refilled = state.tokens + (now - state.updated_at) * self.user_rate
+            if state.in_flight == 0 and refilled >= self.user_burst:
+                del self._users[key]
+
+    def _check_user(self, key: str) -> _UserState:
+        state = self._user(key)
+        if self.user_concurrent and state.in_flight >= self.user_concurrent:
+            raise self._reject(
+                "user_concurrency", self._service_seconds or 1.0,
+                f"Too many AI requests in progress ({self.user_concurrent} allowed)",
+            )
+        if self.user_rate > 0:
+            now = time.monotonic()
+            state.tokens = min(self.user_burst, state.tokens + (now - state.updated_at) * self.user_rate)
+            state.updated_at = now
+            if state.tokens < 1:
+                raise self._reject(
+                    "user_rate", (1 - state.tokens) / self.user_rate, "AI request rate limit exceeded"
+                )
+            state.tokens -= 1
+        return state
+
+    async def _acquire_slot(self) -> None:
+        if self._running < self.max_concurrent and not self._waiters:
+            self._running += 1
+            ADMISSION_RUNNING.inc(pool=self.name)
+            ADMISSION_DECISIONS.inc(pool=self.name, result="admitted")
+            return
+
+        wait = self.estimated_wait()
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full", wait, "Server busy, try again shortly")
+        if self._service_seconds is not None and wait > self.max_wait:
+            raise self._reject("wait_too_long", wait, "Server busy, try again shortly")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        ADMISSION_QUEUE_DEPTH.inc(pool=self.name)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._waiters.remove(future)
+                future.cancel()
+                raise self._reject("timed_out", self.estimated_wait(), "Server busy, try again shortly")
+            # The slot was handed over just as the wait ran out
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            else:
+                self._waiters.remove(future)
+                future.cancel()
+            raise
+        finally:
+            ADMISSION_QUEUE_DEPTH.dec(pool=self.name)
+            ADMISSION_WAIT.observe(time.perf_counter() - start, pool=self.name)
+        ADMISSION_DECISIONS.inc(pool=self.name, result="queued")
+
+    def _release_slot(self) -> None:
+        # Hand the slot straight to the oldest waiter so arrivals can't jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._running -= 1
+        ADMISSION_RUNNING.dec(pool=self.name)
+
+    @asynccontextmanager
+    async def admit(self, request: Request) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block, or raise HTTPException(429)"""
+        key = client_key(request)
+        state = self._check_user(key)
+        state.in_flight += 1
+        try:
+            await self._acquire_slot()
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - start
+                if self._service_seconds is None:
+                    self._service_seconds = elapsed
+                else:
+                    self._service_seconds += 0.2 * (elapsed - self._service_seconds)
+                self._release_slot()
+        finally:
+            state.in_flight -= 1
+
+
+llm_admission = AdmissionController(
+    "llm",
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_USER_CONCURRENT,
+    ADMISSION_USER_RATE_PER_MINUTE,
+    ADMISSION_USER_BURST,
+)
@@ -2,8 +2,10 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import NullPool
 import os
+import time
 import asyncio
 from dotenv import load_dotenv
+from app.core import metrics, query_trace
 
 load_dotenv()
 
@@ -11,12 +13,9 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-# Keep your existing settings - they were working fine!
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,  # Reduce logging noise
-    poolclass=NullPool,
-    connect_args={
+# asyncpg-specific settings; SQLite (benchmark smoke runs, local dev) takes none
+if DATABASE_URL and DATABASE_URL.startswith("postgresql+asyncpg"):
+    connect_args = {
         "statement_cache_size": 0,
         "prepared_statement_cache_size": 0,
         "command_timeout": 60,
@@ -24,12 +23,25 @@ engine = create_async_engine(
             "jit": "off",
             "application_name": "synapse_app"
         }
-    },
+    }
+else:
+    connect_args = {}
+
+# Keep your existing settings - they were working fine!
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,  # Reduce logging noise
+    poolclass=NullPool,
+    connect_args=connect_args,
     pool_pre_ping=True,
     pool_recycle=300
     # Removed pool_timeout and max_overflow - they don't work with NullPool
 )
 
+metrics.instrument_engine(engine)
+if query_trace.SQL_TRACE:
+    query_trace.instrument_engine(engine)
+
 AsyncSessionLocal = sessionmaker(
     engine,
     class_=AsyncSession,
@@ -39,6 +51,8 @@ AsyncSessionLocal = sessionmaker(
 Base = declarative_base()
 
 async def get_db():
+    metrics.DB_SESSIONS_IN_FLIGHT.inc()
+    start = time.perf_counter()
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -46,4 +60,6 @@ async def get_db():
             await session.rollback()
             raise e
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+            metrics.DB_SESSIONS_IN_FLIGHT.dec()
+            metrics.DB_SESSION_LATENCY.observe(time.perf_counter() - start)
@@ -0,0 +1,43 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Time budget of an HTTP request; GitHub and LLM calls made for it never outlive it
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+
+# Monotonic time by which the current request must be answered; None outside requests
+_deadline_var: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, None when there is none (background work)"""
+    at = _deadline_var.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def clamp(timeout: float) -> float:
+    """``timeout`` shortened to what is left of the deadline"""
+    left = remaining()
+    return timeout if left is None else max(min(timeout, left), 0.0)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Give the block at most ``seconds``; an earlier deadline already in force still wins.
+
+    Tasks created inside the block inherit the deadline with the rest of the context.
+    """
+    at = time.monotonic() + seconds
+    current = _deadline_var.get()
+    token = _deadline_var.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline_var.reset(token)
@@ -0,0 +1,217 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Minimal Prometheus text-format metrics. Updates are a dict lookup plus a
+# bisect under a lock, cheap enough to sit on every request and upstream call.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[idx] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += row[len(self.buckets)]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP
+HTTP_REQUESTS = Counter("synapse_http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("synapse_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("synapse_http_requests_in_flight", "HTTP requests currently being handled")
+
+# GitHub
+GITHUB_REQUESTS = Counter("synapse_github_requests_total", "GitHub API calls", ("endpoint", "status"))
+GITHUB_LATENCY = Histogram("synapse_github_request_duration_seconds", "GitHub API call latency", ("endpoint",))
+GITHUB_RETRIES = Counter(
+    "synapse_github_retries_total", "GitHub GETs retried, or given up on for lack of deadline", ("endpoint", "reason")
+)
+GITHUB_HEDGES = Counter(
+    "synapse_github_hedges_total", "Hedged GitHub GETs: second requests sent and which one answered", ("endpoint", "outcome")
+)
+GITHUB_DEADLINE_EXCEEDED = Counter(
+    "synapse_github_deadline_exceeded_total", "GitHub calls not made because the request deadline had passed", ("endpoint",)
+)
+
+# LLM providers
+LLM_CALLS = Counter("synapse_llm_calls_total", "LLM calls by provider, model and outcome", ("provider", "model", "outcome"))
+LLM_LATENCY = Histogram(
+    "synapse_llm_call_duration_seconds", "LLM call latency", ("provider", "model"),
+    buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0),
+)
+LLM_IN_FLIGHT = Gauge("synapse_llm_calls_in_flight", "LLM calls currently running", ("provider",))
+
+# Database
+DB_SESSION_LATENCY = Histogram("synapse_db_session_duration_seconds", "Lifetime of request DB sessions")
+DB_SESSIONS_IN_FLIGHT = Gauge("synapse_db_sessions_in_flight", "DB sessions currently open")
+DB_QUERY_LATENCY = Histogram(
+    "synapse_db_query_duration_seconds", "SQL statement latency", ("operation",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+
+def observe_github(endpoint: str, status, seconds: float) -> None:
+    GITHUB_REQUESTS.inc(endpoint=endpoint, status=status)
+    GITHUB_LATENCY.observe(seconds, endpoint=endpoint)
+
+
+@contextmanager
+def track_llm(provider: str, model: str = "") -> Iterator[dict]:
+    """Time an LLM call. Set ``call["outcome"]`` to override the default "ok"."""
+    call = {"outcome": "ok"}
+    LLM_IN_FLIGHT.inc(provider=provider)
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call["outcome"] = "error"
+        raise
+    finally:
+        LLM_IN_FLIGHT.dec(provider=provider)
+        LLM_LATENCY.observe(time.perf_counter() - start, provider=provider, model=model)
+        LLM_CALLS.inc(provider=provider, model=model, outcome=call["outcome"])
+
+
+def instrument_engine(engine) -> None:
+    """Record per-statement timings from SQLAlchemy cursor events."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+        DB_QUERY_LATENCY.observe(elapsed, operation=operation)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("_query_start"):
+            conn.info["_query_start"].pop()
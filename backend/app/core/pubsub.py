@@ -0,0 +1,159 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+# local: events reach subscribers of this worker only; postgres: LISTEN/NOTIFY across workers
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local").lower()
+# Events buffered per subscriber before it is told to resync instead
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_PG_CHANNEL = "synapse_events"
+# NOTIFY payloads must stay under 8000 bytes
+MAX_NOTIFY_BYTES = 7900
+
+RESYNC = {"type": "resync"}
+
+EVENTS_PUBLISHED = metrics.Counter(
+    "synapse_events_published_total", "Events published", ("type",)
+)
+EVENTS_DROPPED = metrics.Counter(
+    "synapse_events_dropped_total", "Events dropped because a subscriber fell behind"
+)
+EVENTS_SUBSCRIBERS = metrics.Gauge(
+    "synapse_events_subscribers", "Open event subscriptions"
+)
+
+
+class Subscription:
+    """One subscriber's bounded event queue.
+
+    A subscriber that falls behind has its queue replaced by a single resync
+    event, so a slow client never holds memory or slows publishers down; it
+    refetches what it missed instead.
+    """
+
+    def __init__(self, channel: str, maxsize: int):
+        self.channel = channel
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def put(self, event: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            EVENTS_DROPPED.inc(self._queue.qsize() + 1)
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC)
+
+    async def get(self) -> Dict[str, Any]:
+        return await self._queue.get()
+
+
+class PostgresBackend:
+    """Carries events between workers with LISTEN/NOTIFY on a dedicated connection.
+
+    Every worker, the publishing one included, receives each event once
+    through its listener.
+    """
+
+    def __init__(self, dsn: str, deliver: Callable[[str, Dict[str, Any]], None]):
+        self.dsn = dsn
+        self._deliver = deliver
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        self._conn = await asyncpg.connect(self.dsn)
+        await self._conn.add_listener(EVENTS_PG_CHANNEL, self._on_notify)
+
+    async def start(self) -> None:
+        await self._connect()
+        logger.info("Event bus listening on Postgres channel %s", EVENTS_PG_CHANNEL)
+
+    async def stop(self) -> None:
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+            self._deliver(message["channel"], message["event"])
+        except (ValueError, KeyError) as e:
+            logger.warning("Ignoring malformed event notification: %s", e)
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        payload = json.dumps({"channel": channel, "event": event}, default=str)
+        if len(payload.encode("utf-8")) > MAX_NOTIFY_BYTES:
+            payload = json.dumps({"channel": channel, "event": RESYNC})
+        async with self._lock:
+            if self._conn is None or self._conn.is_closed():
+                # Events sent while the listener was down are lost; subscribers resync on reconnect
+                await self._connect()
+            await self._conn.execute("SELECT pg_notify($1, $2)", EVENTS_PG_CHANNEL, payload)
+
+
+class EventBus:
+    """Per-channel fan-out to this worker's subscribers, through a cross-worker backend if one is set"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.backend: Optional[PostgresBackend] = None
+        self._channels: Dict[str, Set[Subscription]] = {}
+
+    async def start(self) -> None:
+        if EVENTS_BACKEND == "postgres":
+            from app.core.database import DATABASE_URL
+
+            dsn = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+            backend = PostgresBackend(dsn, self.deliver)
+            try:
+                await backend.start()
+                self.backend = backend
+            except Exception as e:
+                logger.warning("Postgres event backend unavailable, events stay in this worker: %s", e)
+
+    async def stop(self) -> None:
+        if self.backend is not None:
+            await self.backend.stop()
+            self.backend = None
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(channel, self.queue_size)
+        self._channels.setdefault(channel, set()).add(subscription)
+        EVENTS_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._channels.get(subscription.channel)
+        if subscribers is not None and subscription in subscribers:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[subscription.channel]
+            EVENTS_SUBSCRIBERS.dec()
+
+    def deliver(self, channel: str, event: Dict[str, Any]) -> None:
+        for subscription in list(self._channels.get(channel, ())):
+            subscription.put(event)
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        """Best effort: a failed publish is logged, never raised to the caller"""
+        EVENTS_PUBLISHED.inc(type=event.get("type", "unknown"))
+        if self.backend is None:
+            self.deliver(channel, event)
+            return
+        try:
+            await self.backend.publish(channel, event)
+        except Exception as e:
+            logger.warning("Publishing to the event backend failed, delivering locally: %s", e)
+            self.deliver(channel, event)
+
+
+event_bus = EventBus(EVENTS_QUEUE_SIZE)
@@ -0,0 +1,124 @@
+import os
+import re
+import time
+import logging
+import contextvars
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Development/staging only: per-request statement counting and N+1 detection
+SQL_TRACE = os.getenv("SQL_TRACE", "false").lower() in ("1", "true", "yes")
+# Same statement shape executed at least this many times in one request is flagged
+SQL_TRACE_N1_THRESHOLD = int(os.getenv("SQL_TRACE_N1_THRESHOLD", "5"))
+SQL_TRACE_HISTORY = int(os.getenv("SQL_TRACE_HISTORY", "100"))
+
+_current_trace: contextvars.ContextVar[Optional["QueryTrace"]] = contextvars.ContextVar(
+    "sql_query_trace", default=None
+)
+recent_traces: deque = deque(maxlen=SQL_TRACE_HISTORY)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]*)\)", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|(?<![:\w]):\w+|\?")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalise a statement so executions differing only in parameters group together."""
+    shape = _STRING.sub("?", statement)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryTrace:
+    def __init__(self, method: str, path: str, request_id: str):
+        self.method = method
+        self.path = path
+        self.request_id = request_id
+        self.count = 0
+        self.total_seconds = 0.0
+        self.shapes: Dict[str, dict] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = {"count": 0, "total_ms": 0.0}
+        entry["count"] += 1
+        entry["total_ms"] += seconds * 1000
+
+    def suspects(self) -> list:
+        """Statement shapes repeated often enough to look like an N+1 loop."""
+        return [
+            {"shape": shape, "count": e["count"], "total_ms": round(e["total_ms"], 2)}
+            for shape, e in self.shapes.items()
+            if e["count"] >= SQL_TRACE_N1_THRESHOLD
+        ]
+
+    def summary(self) -> dict:
+        shapes = sorted(self.shapes.items(), key=lambda item: item[1]["count"], reverse=True)
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "query_count": self.count,
+            "total_ms": round(self.total_seconds * 1000, 2),
+            "n_plus_one": self.suspects(),
+            "statements": [
+                {"shape": shape, "count": e["count"], "total_ms": round(e["total_ms"], 2)}
+                for shape, e in shapes
+            ],
+        }
+
+
+def start_trace(method: str, path: str, request_id: str):
+    return _current_trace.set(QueryTrace(method, path, request_id))
+
+
+def finish_trace(token) -> Optional[QueryTrace]:
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is None:
+        return None
+    recent_traces.append(trace.summary())
+    suspects = trace.suspects()
+    if suspects:
+        logger.warning(
+            "Possible N+1 in %s %s: %d queries, repeated shapes: %s",
+            trace.method, trace.path, trace.count,
+            "; ".join(f"{s['count']}x {s['shape'][:120]}" for s in suspects),
+        )
+    return trace
+
+
+def instrument_engine(engine) -> None:
+    """Attribute every cursor execution to the active request trace."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_trace.get() is not None:
+            conn.info.setdefault("_trace_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = _current_trace.get()
+        starts = conn.info.get("_trace_start")
+        if trace is None or not starts:
+            return
+        trace.record(statement, time.perf_counter() - starts.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("_trace_start"):
+            conn.info["_trace_start"].pop()
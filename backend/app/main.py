@@ -1,8 +1,31 @@
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import os
+import asyncio
+import logging
+
+from app.core.logging_config import setup_logging, request_id_var, new_request_id
+from app.core import deadline, metrics, query_trace
+
+setup_logging()
+
+from app.api import auth, projects, commits, ai, debug, exports, blobs, events
+from app.services.github_service import github_service
+from app.services.llm_gateway import llm_gateway
+from app.services.prefetch import summary_prefetcher
+from app.core.pubsub import event_bus
+from app.services.diff_analysis import shutdown_diff_pool
+
+logger = logging.getLogger(__name__)
 
-from app.api import auth, projects, commits, ai
+# Build AI provider clients in the background once the server is answering,
+# instead of on the first summarize/Q&A request
+AI_WARMUP = os.getenv("AI_WARMUP", "true").lower() in ("1", "true", "yes")
 
 app = FastAPI(title="Synapse API", version="1.0.0")
 
@@ -16,13 +39,99 @@ app.add_middleware(
     allow_credentials=True,                       # send cookies
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Total-Count", "Retry-After", "X-SQL-Query-Count", "X-SQL-Time-Ms", "X-SQL-N-Plus-One"],
 )
 
+# Patches, timelines and exports compress well; tiny JSON bodies are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Per-route latency histogram and in-flight gauge."""
+    metrics.HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        # Label by route template, never the raw path, to keep cardinality bounded
+        route_path = getattr(route, "path", "unmatched")
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route_path)
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route_path, status=status)
+
+
+if query_trace.SQL_TRACE:
+    @app.middleware("http")
+    async def trace_queries(request: Request, call_next):
+        """Count and time SQL per request; summary goes to headers and /debug/sql-traces."""
+        token = query_trace.start_trace(request.method, request.url.path, request_id_var.get())
+        try:
+            response = await call_next(request)
+        finally:
+            trace = query_trace.finish_trace(token)
+        if trace is not None:
+            response.headers["X-SQL-Query-Count"] = str(trace.count)
+            response.headers["X-SQL-Time-Ms"] = f"{trace.total_seconds * 1000:.1f}"
+            response.headers["X-SQL-N-Plus-One"] = str(len(trace.suspects()))
+        return response
+
+
+# Registered last so it wraps the other middlewares and they see the request id
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag every log line emitted while handling a request with its request id, and start its deadline."""
+    request_id = request.headers.get("x-request-id") or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        # Upstream calls made for this request share its time budget
+        with deadline.deadline(deadline.REQUEST_DEADLINE_SECONDS):
+            response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def _warm_up_providers() -> None:
+    start = time.perf_counter()
+    llm_gateway.warm_up()
+    logger.info("AI providers warmed up in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+@app.on_event("startup")
+async def on_startup():
+    logger.info("app.main imported in %.0f ms", (app_ready_at - _import_started) * 1000)
+    if AI_WARMUP:
+        asyncio.get_running_loop().run_in_executor(None, _warm_up_providers)
+    summary_prefetcher.start()
+    await event_bus.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await summary_prefetcher.stop()
+    await event_bus.stop()
+    shutdown_diff_pool()
+    await github_service.aclose()
+
+
 # Routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(projects.router, prefix="/projects", tags=["projects"])
+app.include_router(exports.router, prefix="/projects", tags=["export"])
+app.include_router(events.router, prefix="/projects", tags=["events"])
 app.include_router(commits.router, prefix="/commits", tags=["commits"])
 app.include_router(ai.router, prefix="/ai", tags=["ai"])
+app.include_router(blobs.router, prefix="/blobs", tags=["blobs"])
+if query_trace.SQL_TRACE:
+    app.include_router(debug.router, prefix="/debug", tags=["debug"])
+
+app_ready_at = time.perf_counter()
 
 
 @app.get("/")
@@ -32,4 +141,9 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "database": "Supabase"}
\ No newline at end of file
+    return {"status": "healthy", "database": "Supabase"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
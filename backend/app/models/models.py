@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Text, Enum
+from sqlalchemy import Column, String, Integer, Boolean, Date, DateTime, ForeignKey, JSON, Text, Enum, Index, UniqueConstraint, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -32,15 +33,88 @@ class Project(Base):
     github_owner = Column(String)
     github_repo = Column(String)
     connected_by_user_id = Column(Integer, ForeignKey("users.id"))
+    # Newest commits summarized in the background after ingestion; NULL uses PREFETCH_DEFAULT_LIMIT
+    prefetch_limit = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     owner = relationship("User", back_populates="projects")
     commits = relationship("Commit", back_populates="project")
 
+class ProjectCommit(Base):
+    """A commit's membership in a project's history.
+
+    Commits, their files and summaries are stored once per SHA; a fork or a
+    repository connected twice only adds rows here for the history it shares.
+    """
+    __tablename__ = "project_commits"
+    __table_args__ = (
+        # Timeline paging and date windows on /projects/{id}/commits; sha makes the
+        # walks behind hotspots and path history index-only
+        Index("ix_project_commits_project_committed_at", "project_id", "committed_at", postgresql_include=["sha"]),
+        # Projects containing a commit (commit view, live events, activity); the primary
+        # key can't serve it, and with partitioning every partition is probed
+        Index("ix_project_commits_sha", "sha"),
+    )
+    
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    sha = Column(String, ForeignKey("commits.sha", ondelete="CASCADE"), primary_key=True)
+    # Copied from the commit so project timelines sort without touching commits
+    committed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ProjectBranch(Base):
+    """A branch whose history is ingested into a project"""
+    __tablename__ = "project_branches"
+    __table_args__ = (
+        UniqueConstraint("project_id", "name", name="uq_project_branches_project_name"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    # The repository's default branch; it can't be untracked
+    is_default = Column(Boolean, nullable=False, default=False)
+    # Newest commit ingested; the next sync compares from here
+    head_sha = Column(String)
+    synced_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class BranchCommit(Base):
+    """A commit's membership in a tracked branch; the commit row itself is shared"""
+    __tablename__ = "branch_commits"
+    __table_args__ = (
+        # Timeline filtered by branch: WHERE branch_id = ? ORDER BY committed_at DESC
+        Index("ix_branch_commits_branch_committed_at", "branch_id", "committed_at"),
+    )
+    
+    branch_id = Column(Integer, ForeignKey("project_branches.id", ondelete="CASCADE"), primary_key=True)
+    sha = Column(String, ForeignKey("commits.sha", ondelete="CASCADE"), primary_key=True)
+    committed_at = Column(DateTime(timezone=True))
+
+class ActivityDaily(Base):
+    """Commits per project, day, author and risk level, kept current as commits and summaries are written.
+
+    Dashboards read these buckets instead of scanning commits and commit_ai.
+    """
+    __tablename__ = "activity_daily"
+    
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC day of committed_at
+    author = Column(String, primary_key=True)  # author_login, else author_name
+    risk_level = Column(String, primary_key=True)  # low/medium/high, or "unsummarized"
+    commits = Column(Integer, nullable=False, default=0)
+
 class Commit(Base):
     __tablename__ = "commits"
+    __table_args__ = (
+        Index("ix_commits_project_committed_at", "project_id", "committed_at"),
+        # Author filter on /projects/{id}/commits, joined to project_commits
+        Index("ix_commits_author_login", "author_login", "committed_at"),
+        Index("ix_commits_author_name", "author_name", "committed_at"),
+    )
     
     sha = Column(String, primary_key=True, index=True)
+    # Project that first ingested the commit, used for GitHub lookups; membership is in project_commits
     project_id = Column(Integer, ForeignKey("projects.id"))
     message = Column(Text)
     author_name = Column(String)
@@ -52,17 +126,74 @@ class Commit(Base):
     project = relationship("Project", back_populates="commits")
     ai_summary = relationship("CommitAI", back_populates="commit", uselist=False)
     questions = relationship("QnA", back_populates="commit")
+    files = relationship("CommitFile", back_populates="commit")
+
+class CommitFile(Base):
+    """One row per file touched by a commit, for path history and hotspot queries"""
+    __tablename__ = "commit_files"
+    __table_args__ = (
+        # Also serves the per-commit lookup when hotspots join from project_commits
+        UniqueConstraint("sha", "path", name="uq_commit_files_sha_path"),
+        # Path history picks its page from index entries alone (see migrations/012_path_history_indexes.sql)
+        Index("ix_commit_files_path", "path", "committed_at", postgresql_include=["sha", "id"]),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    sha = Column(String, ForeignKey("commits.sha", ondelete="CASCADE"), nullable=False)
+    # Project that first ingested the commit; per-project queries join project_commits
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    path = Column(String, nullable=False)
+    previous_path = Column(String)
+    status = Column(String)
+    additions = Column(Integer, default=0)
+    deletions = Column(Integer, default=0)
+    # Copied from the commit so windowed aggregations never join commits
+    committed_at = Column(DateTime(timezone=True))
+    # Full patch text lives in the blob store; NULL for binary/oversized files and older rows
+    patch_hash = Column(String(64), ForeignKey("blobs.hash"), nullable=True)
+    # From app.services.diff_analysis; NULL language/symbols on rows stored before it
+    language = Column(String)
+    generated = Column(Boolean, nullable=False, default=False)
+    symbols = Column(JSON)
+    
+    commit = relationship("Commit", back_populates="files")
+
+class Blob(Base):
+    """Compressed, content-addressed text (patches), shared by every row with the same content"""
+    __tablename__ = "blobs"
+    
+    hash = Column(String(64), primary_key=True)  # sha256 of the uncompressed UTF-8 bytes
+    codec = Column(String, nullable=False)  # zstd, zlib or raw
+    dictionary_id = Column(Integer, ForeignKey("blob_dictionaries.id"), nullable=True)
+    size = Column(Integer, nullable=False)
+    stored_size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class BlobDictionary(Base):
+    """Compression dictionary trained on small blobs; the newest one for the codec is used"""
+    __tablename__ = "blob_dictionaries"
+    
+    id = Column(Integer, primary_key=True)
+    codec = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class CommitAI(Base):
     __tablename__ = "commit_ai"
+    __table_args__ = (
+        # Tag containment (tags @> '["security"]'); plain index elsewhere
+        Index("ix_commit_ai_tags", "tags", postgresql_using="gin", postgresql_ops={"tags": "jsonb_path_ops"}),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     sha = Column(String, ForeignKey("commits.sha"), unique=True)
     simple_explanation = Column(Text)
     technical_summary = Column(JSON)
     how_to_test = Column(JSON)
-    tags = Column(JSON)
-    risk_level = Column(Enum(RiskLevel))
+    tags = Column(JSON().with_variant(JSONB(), "postgresql"))
+    risk_level = Column(Enum(RiskLevel), index=True)
     plan_run_id = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -70,6 +201,12 @@ class CommitAI(Base):
 
 class QnA(Base):
     __tablename__ = "qna"
+    __table_args__ = (
+        # Answer cache lookup; (project_id, sha) prefix also serves history and near-duplicate scans
+        Index("ix_qna_lookup", "project_id", "sha", "question_hash", "context_version"),
+        # Per-commit history across the projects sharing the commit
+        Index("ix_qna_sha", "sha"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     sha = Column(String, ForeignKey("commits.sha"), nullable=True)
@@ -78,7 +215,32 @@ class QnA(Base):
     question = Column(Text)
     answer = Column(Text)
     plan_run_id = Column(String)
+    normalized_question = Column(Text)
+    question_hash = Column(String(64))
+    # Hash of the commit context the answer was based on; a new summary or commit changes it
+    context_version = Column(String(64))
+    # Times the answer was served again from the cache
+    hit_count = Column(Integer, default=0, nullable=False, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     commit = relationship("Commit", back_populates="questions")
     user = relationship("User", back_populates="questions")
+
+class ReleaseNotes(Base):
+    """Notes generated for a commit range, reused for the same resolved base and head.
+
+    Keyed by SHAs rather than by project, so forks sharing a range share the notes.
+    """
+    __tablename__ = "release_notes"
+    __table_args__ = (
+        UniqueConstraint("base_sha", "head_sha", name="uq_release_notes_range"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    base_sha = Column(String, nullable=False)
+    head_sha = Column(String, nullable=False)
+    commit_count = Column(Integer, nullable=False)
+    notes = Column(Text)
+    # Counts per risk level, tag and author, computed without a model call
+    stats = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
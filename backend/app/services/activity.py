@@ -0,0 +1,175 @@
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import engine
+from app.models.models import ActivityDaily, Commit, CommitAI, ProjectCommit
+
+logger = logging.getLogger(__name__)
+
+UNSUMMARIZED = "unsummarized"
+RISK_LEVELS = ("low", "medium", "high", UNSUMMARIZED)
+BUCKETS = ("day", "week", "month")
+
+def activity_author(author_login: Optional[str], author_name: Optional[str]) -> str:
+    return author_login or author_name or "unknown"
+
+
+def activity_day(committed_at: Optional[datetime]) -> Optional[date]:
+    if committed_at is None:
+        return None
+    if committed_at.tzinfo is not None:
+        committed_at = committed_at.astimezone(timezone.utc)
+    return committed_at.date()
+
+
+def risk_key(risk_level) -> str:
+    """Bucket name of a RiskLevel or its value; UNSUMMARIZED when there is no summary"""
+    if risk_level is None:
+        return UNSUMMARIZED
+    return getattr(risk_level, "value", risk_level)
+
+
+async def _apply(db: AsyncSession, deltas: Counter) -> None:
+    # Deltas are added in place, so concurrent writers never overwrite each other's counts
+    rows = [
+        {"project_id": key[0], "day": key[1], "author": key[2], "risk_level": key[3], "commits": n}
+        for key, n in deltas.items() if n
+    ]
+    if not rows:
+        return
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(ActivityDaily)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["project_id", "day", "author", "risk_level"],
+        set_={"commits": ActivityDaily.commits + stmt.excluded.commits},
+    )
+    await db.execute(stmt, rows)
+
+
+async def add_links(db: AsyncSession, project_id: int, shas: Iterable[str]) -> None:
+    """Count commits newly linked to a project.
+
+    Reads the commits and their summaries, so pending rows are flushed first and
+    commits shared with another project keep their risk level. The caller commits.
+    """
+    shas = list(shas)
+    if not shas:
+        return
+    rows = (await db.execute(
+        select(Commit.committed_at, Commit.author_login, Commit.author_name, CommitAI.risk_level)
+        .outerjoin(CommitAI, CommitAI.sha == Commit.sha)
+        .where(Commit.sha.in_(shas), Commit.committed_at.isnot(None))
+    )).all()
+    deltas: Counter = Counter()
+    for committed_at, author_login, author_name, risk_level in rows:
+        deltas[(project_id, activity_day(committed_at), activity_author(author_login, author_name), risk_key(risk_level))] += 1
+    await _apply(db, deltas)
+
+
+async def record_summaries(
+    db: AsyncSession,
+    risks: Dict[str, object],
+    counted: Optional[Set[Tuple[int, str]]] = None,
+) -> None:
+    """Move commits that just got a summary from "unsummarized" to their risk level.
+
+    ``counted`` holds (project_id, sha) links added in the same transaction
+    and already counted with their final risk. The caller commits.
+    """
+    if not risks:
+        return
+    rows = (await db.execute(
+        select(ProjectCommit.project_id, ProjectCommit.sha, Commit.committed_at, Commit.author_login, Commit.author_name)
+        .join(Commit, Commit.sha == ProjectCommit.sha)
+        .where(ProjectCommit.sha.in_(list(risks)))
+    )).all()
+    deltas: Counter = Counter()
+    for project_id, sha, committed_at, author_login, author_name in rows:
+        if committed_at is None or (counted and (project_id, sha) in counted):
+            continue
+        day, author = activity_day(committed_at), activity_author(author_login, author_name)
+        deltas[(project_id, day, author, UNSUMMARIZED)] -= 1
+        deltas[(project_id, day, author, risk_key(risks[sha]))] += 1
+    await _apply(db, deltas)
+
+
+async def rebuild_activity(db: AsyncSession, project_id: int) -> int:
+    """Recount a project's buckets from its commits; returns the number of commits counted"""
+    result = await db.stream(
+        select(ProjectCommit.committed_at, Commit.author_login, Commit.author_name, CommitAI.risk_level)
+        .join(Commit, Commit.sha == ProjectCommit.sha)
+        .outerjoin(CommitAI, CommitAI.sha == ProjectCommit.sha)
+        .where(ProjectCommit.project_id == project_id, ProjectCommit.committed_at.isnot(None))
+        .execution_options(yield_per=1000)
+    )
+    counts: Counter = Counter()
+    async for committed_at, author_login, author_name, risk_level in result:
+        counts[(project_id, activity_day(committed_at), activity_author(author_login, author_name), risk_key(risk_level))] += 1
+
+    await db.execute(delete(ActivityDaily).where(ActivityDaily.project_id == project_id))
+    await _apply(db, counts)
+    await db.commit()
+    logger.info("Rebuilt activity rollups for project %s from %d commits", project_id, sum(counts.values()))
+    return sum(counts.values())
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+async def project_activity(
+    db: AsyncSession,
+    project_id: int,
+    since: Optional[date],
+    bucket: str,
+    author: Optional[str] = None,
+) -> Dict:
+    """Heatmap, per-author totals and risk-level series from the rollup table in one read"""
+    query = select(ActivityDaily.day, ActivityDaily.author, ActivityDaily.risk_level, ActivityDaily.commits).where(
+        ActivityDaily.project_id == project_id, ActivityDaily.commits > 0
+    )
+    if since is not None:
+        query = query.where(ActivityDaily.day >= since)
+    if author is not None:
+        query = query.where(ActivityDaily.author == author)
+    rows = (await db.execute(query)).all()
+
+    per_day: Counter = Counter()
+    series: Dict[date, Counter] = {}
+    authors: Dict[str, Dict] = {}
+    for day, name, risk_level, commits in rows:
+        per_day[day] += commits
+        series.setdefault(_bucket_start(day, bucket), Counter())[risk_level] += commits
+        stats = authors.setdefault(name, {"author": name, "commits": 0, "days": set(), "risk": Counter()})
+        stats["commits"] += commits
+        stats["days"].add(day)
+        stats["risk"][risk_level] += commits
+
+    return {
+        "heatmap": [{"day": day.isoformat(), "commits": per_day[day]} for day in sorted(per_day)],
+        "series": [
+            {"start": start.isoformat(), "commits": sum(counts.values()), **{r: counts[r] for r in RISK_LEVELS}}
+            for start, counts in sorted(series.items())
+        ],
+        "authors": [
+            {
+                "author": stats["author"],
+                "commits": stats["commits"],
+                "active_days": len(stats["days"]),
+                "first_day": min(stats["days"]).isoformat(),
+                "last_day": max(stats["days"]).isoformat(),
+                "risk": {r: stats["risk"][r] for r in RISK_LEVELS},
+            }
+            for stats in sorted(authors.values(), key=lambda s: s["commits"], reverse=True)
+        ],
+    }
@@ -0,0 +1,303 @@
+import os
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.database import engine
+from app.models.models import Blob, BlobDictionary, CommitFile
+from app.utils.cache import TTLCache
+
+try:
+    import zstandard
+except ImportError:  # optional: blobs are written with zlib without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Codec for new blobs; blobs already stored keep the codec they were written with
+BLOB_CODEC = os.getenv("BLOB_CODEC", "zstd" if zstandard else "zlib")
+BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", "9"))
+BLOB_ZLIB_LEVEL = int(os.getenv("BLOB_ZLIB_LEVEL", "6"))
+# Blobs up to this size are compressed with the trained dictionary, where it pays off most
+BLOB_DICT_MAX_BYTES = int(os.getenv("BLOB_DICT_MAX_BYTES", "4096"))
+# Target dictionary size; zlib can use at most 32 KiB of it
+BLOB_DICT_SIZE = int(os.getenv("BLOB_DICT_SIZE", str(32 * 1024)))
+BLOB_DICT_MIN_SAMPLES = 50
+# Decompressed texts kept per worker
+BLOB_CACHE_SIZE = int(os.getenv("BLOB_CACHE_SIZE", "2048"))
+# How long a worker trusts its idea of the newest dictionary (another worker may train one)
+ACTIVE_DICTIONARY_TTL = 300
+
+BLOB_BYTES = metrics.Counter(
+    "synapse_blob_bytes_total", "Bytes of new blobs before and after compression", ("codec", "kind")
+)
+
+_texts = TTLCache("blobs", maxsize=BLOB_CACHE_SIZE)
+# Dictionaries are immutable once stored, so they are cached for the process lifetime
+_dictionaries: Dict[int, Tuple[str, bytes]] = {}
+_zstd_dictionaries: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+_active: Dict[str, Tuple[Optional[int], float]] = {}
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _zstd_dictionary(dictionary_id: int) -> "zstandard.ZstdCompressionDict":
+    prepared = _zstd_dictionaries.get(dictionary_id)
+    if prepared is None:
+        prepared = zstandard.ZstdCompressionDict(_dictionaries[dictionary_id][1])
+        _zstd_dictionaries[dictionary_id] = prepared
+    return prepared
+
+
+def compress(data: bytes, codec: str = BLOB_CODEC, dictionary_id: Optional[int] = None) -> Tuple[str, Optional[int], bytes]:
+    """Compress ``data``; returns (codec, dictionary id used, payload).
+
+    Falls back to storing the bytes as-is when compression does not make them smaller.
+    """
+    if len(data) > BLOB_DICT_MAX_BYTES:
+        dictionary_id = None
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("BLOB_CODEC=zstd needs the zstandard package")
+        dict_data = _zstd_dictionary(dictionary_id) if dictionary_id else None
+        payload = zstandard.ZstdCompressor(level=BLOB_ZSTD_LEVEL, dict_data=dict_data).compress(data)
+    elif codec == "zlib":
+        if dictionary_id:
+            compressor = zlib.compressobj(BLOB_ZLIB_LEVEL, zdict=_dictionaries[dictionary_id][1])
+        else:
+            compressor = zlib.compressobj(BLOB_ZLIB_LEVEL)
+        payload = compressor.compress(data) + compressor.flush()
+    else:
+        return "raw", None, data
+
+    if len(payload) >= len(data):
+        return "raw", None, data
+    return codec, dictionary_id, payload
+
+
+def decompress(codec: str, payload: bytes, dictionary_id: Optional[int] = None) -> bytes:
+    if codec == "raw":
+        return payload
+    if codec == "zlib":
+        if dictionary_id:
+            decompressor = zlib.decompressobj(zdict=_dictionaries[dictionary_id][1])
+        else:
+            decompressor = zlib.decompressobj()
+        return decompressor.decompress(payload) + decompressor.flush()
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd blobs needs the zstandard package")
+        dict_data = _zstd_dictionary(dictionary_id) if dictionary_id else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(payload)
+    raise ValueError(f"Unknown blob codec: {codec!r}")
+
+
+async def _load_dictionaries(db: AsyncSession, ids: Iterable[int]) -> None:
+    missing = [i for i in ids if i and i not in _dictionaries]
+    if not missing:
+        return
+    result = await db.execute(
+        select(BlobDictionary.id, BlobDictionary.codec, BlobDictionary.data).where(BlobDictionary.id.in_(missing))
+    )
+    for dictionary_id, codec, data in result:
+        _dictionaries[dictionary_id] = (codec, bytes(data))
+
+
+async def _active_dictionary(db: AsyncSession) -> Optional[int]:
+    """Newest dictionary trained for BLOB_CODEC, if any"""
+    cached = _active.get(BLOB_CODEC)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    dictionary_id = (await db.execute(
+        select(func.max(BlobDictionary.id)).where(BlobDictionary.codec == BLOB_CODEC)
+    )).scalar_one_or_none()
+    if dictionary_id:
+        await _load_dictionaries(db, [dictionary_id])
+    _active[BLOB_CODEC] = (dictionary_id, time.monotonic() + ACTIVE_DICTIONARY_TTL)
+    return dictionary_id
+
+
+def _insert_ignoring_duplicates():
+    # Two requests can store the same content at once; the first one wins
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(Blob).on_conflict_do_nothing(index_elements=["hash"])
+
+
+async def put_blobs(db: AsyncSession, texts: Iterable[str]) -> int:
+    """Store the texts that are not stored yet and return how many were new.
+
+    Rows are inserted right away so commit_files rows added afterwards can
+    reference them; the caller commits.
+    """
+    by_hash = {}
+    for text in texts:
+        if text:
+            by_hash.setdefault(content_hash(text), text)
+    if not by_hash:
+        return 0
+
+    existing = set((await db.execute(select(Blob.hash).where(Blob.hash.in_(list(by_hash))))).scalars())
+    dictionary_id = await _active_dictionary(db)
+    rows = []
+    for blob_hash, text in by_hash.items():
+        if blob_hash in existing:
+            continue
+        data = text.encode("utf-8")
+        codec, used_dictionary, payload = compress(data, dictionary_id=dictionary_id)
+        rows.append({
+            "hash": blob_hash,
+            "codec": codec,
+            "dictionary_id": used_dictionary,
+            "size": len(data),
+            "stored_size": len(payload),
+            "data": payload,
+        })
+        BLOB_BYTES.inc(len(data), codec=codec, kind="raw")
+        BLOB_BYTES.inc(len(payload), codec=codec, kind="stored")
+        _texts.set(blob_hash, text)
+
+    if rows:
+        await db.execute(_insert_ignoring_duplicates(), rows)
+    return len(rows)
+
+
+async def get_blobs(db: AsyncSession, hashes: Iterable[str]) -> Dict[str, str]:
+    """Decompressed text per hash; unknown hashes are left out"""
+    texts: Dict[str, str] = {}
+    missing: List[str] = []
+    for blob_hash in set(h for h in hashes if h):
+        text = _texts.get(blob_hash)
+        if text is None:
+            missing.append(blob_hash)
+        else:
+            texts[blob_hash] = text
+    if not missing:
+        return texts
+
+    rows = (await db.execute(
+        select(Blob.hash, Blob.codec, Blob.dictionary_id, Blob.data).where(Blob.hash.in_(missing))
+    )).all()
+    await _load_dictionaries(db, {row.dictionary_id for row in rows})
+    for row in rows:
+        text = decompress(row.codec, bytes(row.data), row.dictionary_id).decode("utf-8")
+        _texts.set(row.hash, text)
+        texts[row.hash] = text
+    return texts
+
+
+def _zlib_dictionary(samples: List[bytes], size: int) -> bytes:
+    """Preset dictionary of the lines shared by most samples.
+
+    zlib only matches within the last 32 KiB and short distances are cheaper,
+    so the most useful lines go last.
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        counts.update(set(line for line in sample.splitlines(keepends=True) if len(line) >= 8))
+    shared = [(count * len(line), line) for line, count in counts.items() if count > 1]
+    shared.sort()
+    dictionary = b"".join(line for _, line in shared)
+    return dictionary[-min(size, 32 * 1024):]
+
+
+def _train(codec: str, samples: List[bytes]) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("BLOB_CODEC=zstd needs the zstandard package")
+        return zstandard.train_dictionary(BLOB_DICT_SIZE, samples).as_bytes()
+    if codec == "zlib":
+        return _zlib_dictionary(samples, BLOB_DICT_SIZE)
+    raise ValueError(f"Dictionaries are not supported for codec {codec!r}")
+
+
+async def train_dictionary(db: AsyncSession, max_samples: int = 2000) -> BlobDictionary:
+    """Train a dictionary for BLOB_CODEC on the newest small blobs and make it the active one.
+
+    Only blobs written afterwards use it; existing blobs keep the dictionary they
+    were compressed with.
+    """
+    hashes = list((await db.execute(
+        select(Blob.hash)
+        .where(Blob.size <= BLOB_DICT_MAX_BYTES)
+        .order_by(Blob.created_at.desc())
+        .limit(max_samples)
+    )).scalars())
+    samples = [text.encode("utf-8") for text in (await get_blobs(db, hashes)).values()]
+    if len(samples) < BLOB_DICT_MIN_SAMPLES:
+        raise ValueError(f"Need at least {BLOB_DICT_MIN_SAMPLES} small blobs to train, found {len(samples)}")
+
+    data = await asyncio.to_thread(_train, BLOB_CODEC, samples)
+    if not data:
+        raise ValueError("Samples share too little content for a dictionary")
+    dictionary = BlobDictionary(codec=BLOB_CODEC, data=data, sample_count=len(samples))
+    db.add(dictionary)
+    await db.commit()
+
+    _dictionaries[dictionary.id] = (dictionary.codec, data)
+    _active[BLOB_CODEC] = (dictionary.id, time.monotonic() + ACTIVE_DICTIONARY_TTL)
+    logger.info("Trained %s dictionary %s (%d bytes) on %d blobs", BLOB_CODEC, dictionary.id, len(data), len(samples))
+    return dictionary
+
+
+async def blob_stats(db: AsyncSession) -> Dict:
+    """Stored versus raw size per codec, and how much content is shared between rows"""
+    result = await db.execute(
+        select(
+            Blob.codec,
+            (Blob.dictionary_id.is_not(None)).label("with_dictionary"),
+            func.count().label("blobs"),
+            func.coalesce(func.sum(Blob.size), 0).label("size"),
+            func.coalesce(func.sum(Blob.stored_size), 0).label("stored_size"),
+        )
+        .group_by(Blob.codec, Blob.dictionary_id.is_not(None))
+        .order_by(Blob.codec)
+    )
+    groups = [
+        {
+            "codec": row.codec,
+            "with_dictionary": bool(row.with_dictionary),
+            "blobs": row.blobs,
+            "size": row.size,
+            "stored_size": row.stored_size,
+            "ratio": round(row.size / row.stored_size, 2) if row.stored_size else None,
+        }
+        for row in result
+    ]
+    blobs = sum(g["blobs"] for g in groups)
+    size = sum(g["size"] for g in groups)
+    stored_size = sum(g["stored_size"] for g in groups)
+    references = (await db.execute(
+        select(func.count()).select_from(CommitFile).where(CommitFile.patch_hash.is_not(None))
+    )).scalar_one()
+    dictionary = (await db.execute(
+        select(BlobDictionary).where(BlobDictionary.codec == BLOB_CODEC).order_by(BlobDictionary.id.desc()).limit(1)
+    )).scalar_one_or_none()
+
+    return {
+        "codec": BLOB_CODEC,
+        "blobs": blobs,
+        "size": size,
+        "stored_size": stored_size,
+        "ratio": round(size / stored_size, 2) if stored_size else None,
+        # File rows per distinct blob: how often the same patch recurs
+        "references": references,
+        "dedupe_ratio": round(references / blobs, 2) if blobs else None,
+        "by_codec": groups,
+        "dictionary": {
+            "id": dictionary.id,
+            "size": len(dictionary.data),
+            "sample_count": dictionary.sample_count,
+            "created_at": dictionary.created_at.isoformat() if dictionary.created_at else None,
+        } if dictionary else None,
+    }
@@ -0,0 +1,340 @@
+import os
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, delete, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import engine
+from app.models.models import BranchCommit, Commit, Project, ProjectBranch, ProjectCommit
+from app.services.activity import add_links
+from app.services.commit_files import ingest_commit_files
+from app.services.github_service import github_service, GitHubAPIError
+
+logger = logging.getLogger(__name__)
+
+# History listed when a branch is first ingested without anything to compare against
+INITIAL_HISTORY_COMMITS = int(os.getenv("INITIAL_HISTORY_COMMITS", "100"))
+INITIAL_HISTORY_PAGE_SIZE = 30
+# Commits taken from one sync; a branch further ahead catches up on the next sync
+COMPARE_MAX_COMMITS = int(os.getenv("COMPARE_MAX_COMMITS", "1000"))
+COMPARE_PAGE_SIZE = 100
+
+
+@dataclass
+class BranchSync:
+    branch: str
+    # initial: listed from the branch head; compare: only commits after the last sync
+    mode: str
+    fetched: int = 0
+    stored: int = 0
+    shared: int = 0
+    removed: int = 0
+    new_commits: List[Commit] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        return {
+            "branch": self.branch,
+            "mode": self.mode,
+            "fetched": self.fetched,
+            "stored": self.stored,
+            "shared": self.shared,
+            "removed": self.removed,
+        }
+
+
+def _committed_at(gh_commit: Dict) -> datetime:
+    return datetime.fromisoformat(gh_commit["commit"]["author"]["date"].replace("Z", "+00:00"))
+
+
+async def tracked_branches(db: AsyncSession, project_id: int) -> List[ProjectBranch]:
+    result = await db.execute(
+        select(ProjectBranch)
+        .where(ProjectBranch.project_id == project_id)
+        .order_by(ProjectBranch.is_default.desc(), ProjectBranch.name)
+    )
+    return list(result.scalars())
+
+
+async def ensure_default_branch(db: AsyncSession, project: Project) -> ProjectBranch:
+    """The project's default-branch row, created from the repository's real default branch.
+
+    Projects ingested before branches were tracked get their existing history as
+    the default branch's, so the next sync only compares from the newest commit.
+    """
+    result = await db.execute(
+        select(ProjectBranch).where(ProjectBranch.project_id == project.id, ProjectBranch.is_default.is_(True))
+    )
+    branch = result.scalar_one_or_none()
+    if branch is not None:
+        return branch
+
+    repository = await github_service.get_repository(project.github_owner, project.github_repo)
+    branch = ProjectBranch(project_id=project.id, name=repository.get("default_branch") or "main", is_default=True)
+    db.add(branch)
+    await db.flush()
+
+    newest = (await db.execute(
+        select(ProjectCommit.sha)
+        .where(ProjectCommit.project_id == project.id)
+        .order_by(ProjectCommit.committed_at.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+    if newest is not None:
+        await db.execute(
+            _insert_memberships().from_select(
+                ["branch_id", "sha", "committed_at"],
+                select(literal(branch.id), ProjectCommit.sha, ProjectCommit.committed_at)
+                .where(ProjectCommit.project_id == project.id),
+            )
+        )
+        branch.head_sha = newest
+        logger.info("Adopted the stored history of project %s as branch %s", project.id, branch.name)
+    return branch
+
+
+async def track_branch(db: AsyncSession, project: Project, name: str) -> ProjectBranch:
+    result = await db.execute(
+        select(ProjectBranch).where(ProjectBranch.project_id == project.id, ProjectBranch.name == name)
+    )
+    branch = result.scalar_one_or_none()
+    if branch is None:
+        branch = ProjectBranch(project_id=project.id, name=name, is_default=False)
+        db.add(branch)
+        await db.flush()
+    return branch
+
+
+def _insert_memberships():
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(BranchCommit).on_conflict_do_nothing(index_elements=["branch_id", "sha"])
+
+
+def commit_from_github(project: Project, commit_data: Dict) -> Commit:
+    """A Commit row for a GitHub commit entry, not added to any session"""
+    return Commit(
+        sha=commit_data["sha"],
+        project_id=project.id,
+        message=commit_data["commit"]["message"],
+        author_name=commit_data["commit"]["author"]["name"],
+        author_login=commit_data["author"]["login"] if commit_data.get("author") else None,
+        committed_at=_committed_at(commit_data),
+        files_summary=[],
+        url=commit_data["html_url"]
+    )
+
+
+async def store_commits(db: AsyncSession, project: Project, gh_commits: List[Dict]) -> Tuple[List[Commit], int, Dict[str, datetime]]:
+    """Store commits not known yet and link them to the project.
+
+    Returns the new Commit rows, how many were already stored for another
+    project, and the commit date of every usable entry. The caller commits.
+    """
+    shas = [c["sha"] for c in gh_commits]
+    if not shas:
+        return [], 0, {}
+    known = set((await db.execute(select(Commit.sha).where(Commit.sha.in_(shas)))).scalars())
+    linked = set((await db.execute(
+        select(ProjectCommit.sha).where(ProjectCommit.project_id == project.id, ProjectCommit.sha.in_(shas))
+    )).scalars())
+
+    new_commits: List[Commit] = []
+    shared = 0
+    dates: Dict[str, datetime] = {}
+    new_links = []
+    for commit_data in gh_commits:
+        sha = commit_data["sha"]
+        try:
+            committed_at = _committed_at(commit_data)
+            if sha not in linked:
+                if sha in known:
+                    shared += 1
+                else:
+                    commit = commit_from_github(project, commit_data)
+                    db.add(commit)
+                    new_commits.append(commit)
+                    known.add(sha)
+                db.add(ProjectCommit(project_id=project.id, sha=sha, committed_at=committed_at))
+                new_links.append(sha)
+                linked.add(sha)
+            dates[sha] = committed_at
+        except Exception as e:
+            logger.warning("Error storing commit: %s", e)
+            continue
+
+    # Also flushes the rows above, so callers can reference them
+    await add_links(db, project.id, new_links)
+    return new_commits, shared, dates
+
+
+async def _store(db: AsyncSession, project: Project, branch: ProjectBranch, gh_commits: List[Dict], sync: BranchSync) -> None:
+    """Store commits not known yet, link them to the project and record branch membership"""
+    new_commits, shared, dates = await store_commits(db, project, gh_commits)
+    sync.new_commits.extend(new_commits)
+    sync.stored += len(new_commits)
+    sync.shared += shared
+    if dates:
+        await db.execute(_insert_memberships(), [
+            {"branch_id": branch.id, "sha": sha, "committed_at": committed_at}
+            for sha, committed_at in dates.items()
+        ])
+
+
+async def _list_history(project: Project, branch: str) -> List[Dict]:
+    commits: List[Dict] = []
+    page = 1
+    while len(commits) < INITIAL_HISTORY_COMMITS:
+        batch = await github_service.get_public_repo_commits(
+            project.github_owner, project.github_repo, branch=branch,
+            per_page=INITIAL_HISTORY_PAGE_SIZE, page=page
+        )
+        if not batch:
+            break
+        commits.extend(batch)
+        logger.debug("Branch %s page %d: %d commits", branch, page, len(batch))
+        page += 1
+    return commits
+
+
+async def compare_refs(project: Project, base: str, head: str, max_commits: int = COMPARE_MAX_COMMITS) -> Dict:
+    """Compare ``base...head``, following pages up to ``max_commits`` commits (oldest first)"""
+    result = await github_service.compare_commits(
+        project.github_owner, project.github_repo, base, head, per_page=COMPARE_PAGE_SIZE
+    )
+    commits = list(result.get("commits") or [])
+    page = 2
+    while len(commits) < min(result.get("ahead_by", 0), max_commits):
+        more = await github_service.compare_commits(
+            project.github_owner, project.github_repo, base, head, per_page=COMPARE_PAGE_SIZE, page=page
+        )
+        batch = more.get("commits") or []
+        if not batch:
+            break
+        commits.extend(batch)
+        page += 1
+    result["commits"] = commits[:max_commits]
+    return result
+
+
+async def _member_shas(db: AsyncSession, branch: ProjectBranch) -> Set[str]:
+    return set((await db.execute(select(BranchCommit.sha).where(BranchCommit.branch_id == branch.id))).scalars())
+
+
+async def _drop_rewritten(db: AsyncSession, project: Project, branch: ProjectBranch, merge_base: str) -> int:
+    """Remove branch membership of commits a force push took off the branch"""
+    dropped = await compare_refs(project, merge_base, branch.head_sha)
+    shas = [c["sha"] for c in dropped["commits"]]
+    if shas:
+        await db.execute(delete(BranchCommit).where(BranchCommit.branch_id == branch.id, BranchCommit.sha.in_(shas)))
+    return len(shas)
+
+
+async def sync_branch(
+    db: AsyncSession,
+    project: Project,
+    branch: ProjectBranch,
+    default: Optional[ProjectBranch] = None,
+) -> BranchSync:
+    """Bring a branch up to date, fetching only commits after what is already stored.
+
+    A synced branch is compared from its last head. A new branch is compared
+    from the default branch's head: only its own commits are fetched, and the
+    history it shares with the default branch up to the merge base is recorded
+    from stored rows. Without either, the newest INITIAL_HISTORY_COMMITS are
+    listed. The caller commits.
+    """
+    base = branch.head_sha
+    if base is None and default is not None and default.id != branch.id and default.head_sha:
+        base = default.head_sha
+
+    if base is None:
+        sync = BranchSync(branch.name, "initial")
+        gh_commits = await _list_history(project, branch.name)
+        head = gh_commits[0]["sha"] if gh_commits else None
+    else:
+        sync = BranchSync(branch.name, "compare")
+        try:
+            comparison = await compare_refs(project, base, branch.name)
+        except GitHubAPIError as e:
+            if e.status_code != 404:
+                raise
+            if branch.head_sha is None:
+                # Compared from the default branch: the branch itself is missing, or unrelated to it
+                return await sync_branch(db, project, branch)
+            # The last synced head is gone (force push): forget the branch's history and start over
+            logger.info("Head %s of %s is gone, syncing it again", base[:8], branch.name)
+            before = await _member_shas(db, branch)
+            await db.execute(delete(BranchCommit).where(BranchCommit.branch_id == branch.id))
+            branch.head_sha = None
+            sync = await sync_branch(db, project, branch, default)
+            sync.removed = len(before - await _member_shas(db, branch))
+            return sync
+
+        gh_commits = comparison["commits"]
+        merge_base = (comparison.get("merge_base_commit") or {}).get("sha")
+        status = comparison.get("status")
+        if branch.head_sha is None:
+            # New branch: shares the default branch's history up to the merge base
+            if merge_base:
+                await _adopt_shared_history(db, project, default, branch, merge_base)
+        elif status in ("diverged", "behind") and merge_base:
+            sync.removed = await _drop_rewritten(db, project, branch, merge_base)
+        # Oldest first; when capped, the next sync continues after the last one taken.
+        # With nothing new the branch head is the merge base (identical, behind or an ancestor)
+        head = gh_commits[-1]["sha"] if gh_commits else (merge_base or branch.head_sha)
+
+    sync.fetched = len(gh_commits)
+    await _store(db, project, branch, gh_commits, sync)
+    if head:
+        branch.head_sha = head
+    branch.synced_at = datetime.now(timezone.utc)
+    logger.info(
+        "Synced %s of project %s (%s): %d fetched, %d new, %d shared, %d removed",
+        branch.name, project.id, sync.mode, sync.fetched, sync.stored, sync.shared, sync.removed,
+    )
+    return sync
+
+
+async def _adopt_shared_history(
+    db: AsyncSession, project: Project, default: ProjectBranch, branch: ProjectBranch, merge_base: str
+) -> None:
+    """Record the default branch's commits reachable from the merge base as part of ``branch``"""
+    # Stored default-branch commits are ancestors of its head; those past the merge base are the ones to leave out
+    past_base: Set[str] = set()
+    if merge_base != default.head_sha:
+        comparison = await compare_refs(project, merge_base, default.head_sha)
+        if comparison.get("ahead_by", 0) > len(comparison["commits"]):
+            logger.info("%s forked more than %d commits behind %s; not adopting shared history",
+                        branch.name, COMPARE_MAX_COMMITS, default.name)
+            return
+        past_base = {c["sha"] for c in comparison["commits"]}
+    query = select(literal(branch.id), BranchCommit.sha, BranchCommit.committed_at).where(BranchCommit.branch_id == default.id)
+    if past_base:
+        query = query.where(BranchCommit.sha.not_in(past_base))
+    await db.execute(_insert_memberships().from_select(["branch_id", "sha", "committed_at"], query))
+
+
+async def sync_project(db: AsyncSession, project: Project, names: Optional[List[str]] = None) -> List[BranchSync]:
+    """Sync the default branch, then the other tracked branches (or only ``names``).
+
+    Also fetches file lists for the new commits. The caller commits and
+    schedules background summaries for the new commits.
+    """
+    default = await ensure_default_branch(db, project)
+    branches = [default] + [b for b in await tracked_branches(db, project.id) if not b.is_default]
+    if names is not None:
+        branches = [b for b in branches if b.name in names]
+
+    results = []
+    for branch in branches:
+        results.append(await sync_branch(db, project, branch, default))
+
+    new_commits = [c for sync in results for c in sync.new_commits]
+    try:
+        await ingest_commit_files(db, project, new_commits)
+    except Exception as e:
+        logger.warning("File list ingestion failed for project %s: %s", project.id, e)
+    return results
@@ -0,0 +1,296 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Blob, Commit, CommitFile, Project, ProjectCommit
+from app.services.blob_store import content_hash, get_blobs, put_blobs
+from app.services.diff_analysis import DiffAnalysis, analyze_commit
+from app.services.github_service import github_service
+
+logger = logging.getLogger(__name__)
+
+# Commit detail requests in flight while ingesting a project's file lists
+GITHUB_DETAIL_CONCURRENCY = int(os.getenv("GITHUB_DETAIL_CONCURRENCY", "8"))
+# Fetch per-commit file lists during project ingestion (one GitHub call per commit)
+INGEST_COMMIT_FILES = os.getenv("INGEST_COMMIT_FILES", "true").lower() in ("1", "true", "yes")
+
+
+def file_rows(
+    project_id: int,
+    sha: str,
+    committed_at: Optional[datetime],
+    gh_files: List[Dict],
+    analysis: Optional[DiffAnalysis] = None,
+) -> List[CommitFile]:
+    """CommitFile rows for the ``files`` list of a GitHub commit response"""
+    parsed = {f.path: f for f in analysis.files} if analysis else {}
+    rows = {}
+    for f in gh_files:
+        path = f.get("filename")
+        if not path:
+            continue
+        diff = parsed.get(path)
+        rows[path] = CommitFile(
+            sha=sha,
+            project_id=project_id,
+            path=path,
+            previous_path=f.get("previous_filename"),
+            status=f.get("status"),
+            additions=f.get("additions") or 0,
+            deletions=f.get("deletions") or 0,
+            committed_at=committed_at,
+            patch_hash=content_hash(f["patch"]) if f.get("patch") else None,
+            language=diff.language if diff else None,
+            generated=diff.generated if diff else False,
+            symbols=diff.symbols if diff else None,
+        )
+    return list(rows.values())
+
+
+async def has_commit_files(db: AsyncSession, sha: str) -> bool:
+    result = await db.execute(select(CommitFile.id).where(CommitFile.sha == sha).limit(1))
+    return result.scalar_one_or_none() is not None
+
+
+async def store_patches(db: AsyncSession, gh_files: List[Dict]) -> int:
+    """Put the patches of a GitHub ``files`` list in the blob store; call before adding file rows"""
+    return await put_blobs(db, (f.get("patch") for f in gh_files))
+
+
+async def store_commit_files(db: AsyncSession, commit: Commit, gh_files: List[Dict]) -> int:
+    """Record a commit's files and patches if they are not stored yet.
+
+    Rows stored before the blob store existed get their patches attached. Returns
+    the number of rows added or updated; the caller commits.
+    """
+    if not gh_files:
+        return 0
+    existing = (await db.execute(select(CommitFile).where(CommitFile.sha == commit.sha))).scalars().all()
+    if any(row.patch_hash for row in existing):
+        return 0
+    patches = {f.get("filename"): f.get("patch") for f in gh_files if f.get("patch")}
+    if existing and not patches:
+        return 0
+    await store_patches(db, gh_files)
+    analysis = await analyze_commit(commit.sha, gh_files)
+
+    if existing:
+        parsed = {f.path: f for f in analysis.files}
+        updated = 0
+        for row in existing:
+            if patches.get(row.path):
+                row.patch_hash = content_hash(patches[row.path])
+                updated += 1
+            diff = parsed.get(row.path)
+            if diff is not None:
+                row.language, row.generated, row.symbols = diff.language, diff.generated, diff.symbols
+        return updated
+
+    rows = file_rows(commit.project_id, commit.sha, commit.committed_at, gh_files, analysis)
+    db.add_all(rows)
+    return len(rows)
+
+
+async def stored_files(db: AsyncSession, sha: str) -> Optional[List[Dict]]:
+    """A commit's file metadata, read from the database; patches are served separately.
+
+    Returns None when the commit's patches are not stored, so the caller has to ask GitHub.
+    """
+    rows = (await db.execute(
+        select(CommitFile, Blob.size)
+        .outerjoin(Blob, Blob.hash == CommitFile.patch_hash)
+        .where(CommitFile.sha == sha)
+        .order_by(CommitFile.id)
+    )).all()
+    if not any(row.patch_hash for row, _ in rows):
+        return None
+    return [
+        {
+            "filename": row.path,
+            "previous_filename": row.previous_path,
+            "status": row.status,
+            "additions": row.additions,
+            "deletions": row.deletions,
+            "has_patch": row.patch_hash is not None,
+            # Bytes of the uncompressed patch
+            "patch_size": size,
+            "language": row.language,
+            "generated": row.generated,
+            "symbols": row.symbols or [],
+        }
+        for row, size in rows
+    ]
+
+
+async def stored_patch(db: AsyncSession, sha: str, path: str) -> Optional[Tuple[str, str]]:
+    """(blob hash, full patch text) of one file of a commit, or None if it is not stored"""
+    patch_hash = (await db.execute(
+        select(CommitFile.patch_hash).where(CommitFile.sha == sha, CommitFile.path == path)
+    )).scalar_one_or_none()
+    if not patch_hash:
+        return None
+    patch = (await get_blobs(db, [patch_hash])).get(patch_hash)
+    return (patch_hash, patch) if patch is not None else None
+
+
+async def ingest_commit_files(db: AsyncSession, project: Project, commits: List[Commit]) -> int:
+    """Fetch file lists for newly stored commits, a bounded number at a time.
+
+    GitHub's commit list has no per-file data, so this costs one detail request per
+    commit. Commits whose details fail are skipped and get their rows the next time
+    the commit is viewed or summarized.
+    """
+    if not INGEST_COMMIT_FILES or not commits:
+        return 0
+    semaphore = asyncio.Semaphore(GITHUB_DETAIL_CONCURRENCY)
+
+    async def fetch(commit: Commit) -> List[Dict]:
+        async with semaphore:
+            try:
+                details = await github_service.get_commit_details(
+                    project.github_owner, project.github_repo, commit.sha
+                )
+                return details.get("files") or []
+            except Exception as e:
+                logger.warning("Could not fetch files for %s: %s", commit.sha[:8], e)
+                return []
+
+    file_lists = await asyncio.gather(*(fetch(c) for c in commits))
+    # Blob rows go in first so the file rows can reference them
+    await store_patches(db, (f for gh_files in file_lists for f in gh_files))
+    stored = 0
+    for commit, gh_files in zip(commits, file_lists):
+        analysis = await analyze_commit(commit.sha, gh_files)
+        rows = file_rows(project.id, commit.sha, commit.committed_at, gh_files, analysis)
+        db.add_all(rows)
+        stored += len(rows)
+    logger.info("Stored %d file rows for %d commits in project %s", stored, len(commits), project.id)
+    return stored
+
+
+async def file_hotspots(
+    db: AsyncSession,
+    project_id: int,
+    since: Optional[datetime],
+    limit: int,
+    include_generated: bool = False,
+) -> List[Dict]:
+    """Most frequently changed paths, aggregated in SQL; lockfiles and other generated files are left out by default"""
+    commits = func.count(CommitFile.id).label("commits")
+    query = (
+        select(
+            CommitFile.path,
+            commits,
+            func.coalesce(func.sum(CommitFile.additions), 0).label("additions"),
+            func.coalesce(func.sum(CommitFile.deletions), 0).label("deletions"),
+            func.max(CommitFile.committed_at).label("last_changed_at"),
+        )
+        .join(ProjectCommit, ProjectCommit.sha == CommitFile.sha)
+        .where(ProjectCommit.project_id == project_id)
+        .group_by(CommitFile.path)
+        .order_by(commits.desc(), CommitFile.path)
+        .limit(limit)
+    )
+    if since is not None:
+        query = query.where(ProjectCommit.committed_at >= since)
+    if not include_generated:
+        query = query.where(CommitFile.generated.is_(False))
+
+    result = await db.execute(query)
+    return [
+        {
+            "path": row.path,
+            "commits": row.commits,
+            "additions": row.additions,
+            "deletions": row.deletions,
+            "churn": row.additions + row.deletions,
+            "last_changed_at": row.last_changed_at.isoformat() if row.last_changed_at else None,
+        }
+        for row in result
+    ]
+
+
+async def path_history(db: AsyncSession, project_id: int, path: str, limit: int, offset: int) -> List[Dict]:
+    """Commits that touched ``path`` (or anything under it when it ends with '/'), newest first"""
+    if path.endswith("/"):
+        condition = CommitFile.path.startswith(path, autoescape=True)
+    else:
+        condition = CommitFile.path == path
+
+    # The page is picked from index entries (project_commits walked newest first, or the
+    # path's entries in ix_commit_files_path); only its rows are read in full
+    page = (
+        select(CommitFile.id, ProjectCommit.sha, ProjectCommit.committed_at)
+        .join(ProjectCommit, ProjectCommit.sha == CommitFile.sha)
+        .where(ProjectCommit.project_id == project_id, condition)
+        .order_by(ProjectCommit.committed_at.desc(), ProjectCommit.sha.desc(), CommitFile.path)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+    result = await db.execute(
+        select(CommitFile, Commit.message, Commit.author_name, Commit.author_login)
+        .join(page, page.c.id == CommitFile.id)
+        .join(Commit, Commit.sha == CommitFile.sha)
+        .order_by(page.c.committed_at.desc(), page.c.sha.desc(), CommitFile.path)
+    )
+    return [
+        {
+            "sha": f.sha,
+            "path": f.path,
+            "previous_path": f.previous_path,
+            "status": f.status,
+            "additions": f.additions,
+            "deletions": f.deletions,
+            "symbols": f.symbols or [],
+            "committed_at": f.committed_at.isoformat() if f.committed_at else None,
+            "message": message,
+            "author_name": author_name,
+            "author_login": author_login,
+        }
+        for f, message, author_name, author_login in result
+    ]
+
+
+async def language_breakdown(db: AsyncSession, project_id: int, since: Optional[datetime]) -> List[Dict]:
+    """Changed lines and commits per language, generated files excluded"""
+    commits = func.count(func.distinct(CommitFile.sha)).label("commits")
+    churn = func.coalesce(func.sum(CommitFile.additions + CommitFile.deletions), 0).label("churn")
+    query = (
+        select(
+            CommitFile.language,
+            commits,
+            func.count(func.distinct(CommitFile.path)).label("files"),
+            func.coalesce(func.sum(CommitFile.additions), 0).label("additions"),
+            func.coalesce(func.sum(CommitFile.deletions), 0).label("deletions"),
+            churn,
+        )
+        .join(ProjectCommit, ProjectCommit.sha == CommitFile.sha)
+        .where(
+            ProjectCommit.project_id == project_id,
+            CommitFile.generated.is_(False),
+            CommitFile.language.is_not(None),
+        )
+        .group_by(CommitFile.language)
+        .order_by(churn.desc(), CommitFile.language)
+    )
+    if since is not None:
+        query = query.where(ProjectCommit.committed_at >= since)
+
+    result = await db.execute(query)
+    return [
+        {
+            "language": row.language,
+            "commits": row.commits,
+            "files": row.files,
+            "additions": row.additions,
+            "deletions": row.deletions,
+            "churn": row.churn,
+        }
+        for row in result
+    ]
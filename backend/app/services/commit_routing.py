@@ -0,0 +1,127 @@
+import os
+import re
+from typing import Any, Dict, List
+
+from app.core import metrics
+
+# Which model tier a commit summary goes to. "rules" never reaches an LLM.
+TIER_RULES = "rules"
+TIER_FAST = "fast"
+TIER_STANDARD = "standard"
+TIER_HEAVY = "heavy"
+
+# Diffs up to this many characters (and few files) go to the fast model
+LLM_SMALL_DIFF_CHARS = int(os.getenv("LLM_SMALL_DIFF_CHARS", "1500"))
+# Diffs above this, or touching many files, go to the heavy model
+LLM_LARGE_DIFF_CHARS = int(os.getenv("LLM_LARGE_DIFF_CHARS", "20000"))
+LLM_LARGE_FILE_COUNT = int(os.getenv("LLM_LARGE_FILE_COUNT", "30"))
+
+LLM_ROUTES = metrics.Counter("synapse_llm_routes_total", "Commit summaries by routing tier", ("tier", "reason"))
+
+DOC_EXTENSIONS = (".md", ".mdx", ".rst", ".adoc")
+# Also documentation inside docs/ (but not code there, such as docs/conf.py)
+DOCS_DIR_EXTENSIONS = (".txt", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp")
+DOC_NAMES = {"readme", "license", "licence", "authors", "contributors", "changelog", "notice", "codeowners"}
+VERSION_FILES = {
+    "package.json", "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "pyproject.toml",
+    "setup.py", "setup.cfg", "version.py", "_version.py", "__version__.py", "cargo.toml",
+    "cargo.lock", "poetry.lock", "version", "version.txt", "changelog.md", "chart.yaml",
+}
+VERSION_MESSAGE = re.compile(
+    r"^\s*(?:(?:chore|build|release)(?:\([^)]*\))?:\s*)?(?:bump|release|prepare release|version|v?\d+\.\d+\.\d+)",
+    re.IGNORECASE,
+)
+# Paths where a small diff can still be a large risk
+RISKY_PATH = re.compile(
+    r"(^|/)(migrations?|alembic|auth|security|crypto|payments?|\.github/workflows)(/|$)"
+    r"|(^|/)(dockerfile|requirements[^/]*\.txt|.*\.sql)$",
+    re.IGNORECASE,
+)
+
+
+def _basename(path: str) -> str:
+    return path.rsplit("/", 1)[-1].lower()
+
+
+def is_doc_file(path: str) -> bool:
+    name = _basename(path)
+    return (
+        name.endswith(DOC_EXTENSIONS)
+        or name.split(".", 1)[0] in DOC_NAMES
+        or (path.lower().startswith(("docs/", "doc/")) and name.endswith(DOCS_DIR_EXTENSIONS))
+    )
+
+
+def is_version_bump(message: str, filenames: List[str], diff_chars: int) -> bool:
+    return (
+        bool(VERSION_MESSAGE.match(message or ""))
+        and all(_basename(f) in VERSION_FILES for f in filenames)
+        and diff_chars <= 4 * LLM_SMALL_DIFF_CHARS
+    )
+
+
+def route_commit(message: str, filenames: List[str], diff_chars: int) -> str:
+    """Pick the cheapest tier that can describe this commit well"""
+    tier, reason = _route(message, filenames, diff_chars)
+    LLM_ROUTES.inc(tier=tier, reason=reason)
+    return tier
+
+
+def needs_llm(message: str, filenames: List[str], diff_chars: int) -> bool:
+    """Whether route_commit would send this commit to a model; nothing is counted"""
+    return _route(message, filenames, diff_chars)[0] != TIER_RULES
+
+
+def _route(message: str, filenames: List[str], diff_chars: int):
+    if filenames:
+        if all(is_doc_file(f) for f in filenames):
+            return TIER_RULES, "docs"
+        if is_version_bump(message, filenames, diff_chars):
+            return TIER_RULES, "version_bump"
+        if any(RISKY_PATH.search(f) for f in filenames):
+            return TIER_HEAVY, "risky_path"
+    if diff_chars > LLM_LARGE_DIFF_CHARS or len(filenames) > LLM_LARGE_FILE_COUNT:
+        return TIER_HEAVY, "large_diff"
+    if filenames and diff_chars <= LLM_SMALL_DIFF_CHARS and len(filenames) <= 3:
+        return TIER_FAST, "small_diff"
+    return TIER_STANDARD, "default"
+
+
+def rule_based_summary(message: str, filenames: List[str], diff_chars: int = 0) -> Dict[str, Any]:
+    """CommitAI-shaped summary for commits that don't need a model"""
+    title = (message or "").strip().split("\n", 1)[0][:120]
+    shown = ", ".join(filenames[:5]) + (f" and {len(filenames) - 5} more" if len(filenames) > 5 else "")
+
+    if is_version_bump(message, filenames, diff_chars):
+        explanation = f"Version/release bookkeeping: {title}. Only version and lock files change ({shown})."
+        tags = ["release", "version-bump"]
+        steps = [
+            "Check the new version number is what you expect",
+            "Reinstall dependencies and run the test suite",
+        ]
+    else:
+        explanation = f"Documentation-only change: {title}. It updates {shown} and does not touch code."
+        tags = ["docs"]
+        steps = ["Render or preview the changed documents and check links and formatting"]
+
+    return {
+        "simple_explanation": explanation,
+        "technical_summary": [f"Updates {f}" for f in filenames[:5]] or ["No file details available"],
+        "how_to_test": {"steps": steps, "curl": None, "postman": None},
+        "tags": tags,
+        "risk_level": "low",
+        "plan_run_id": None,
+    }
+
+
+def rule_based_markdown(message: str, filenames: List[str], diff_chars: int = 0) -> str:
+    """The rule-based summary rendered like GeminiService's markdown output"""
+    summary = rule_based_summary(message, filenames, diff_chars)
+    details = "\n".join(f"- {item}" for item in summary["technical_summary"])
+    testing = "\n".join(f"- {step}" for step in summary["how_to_test"]["steps"])
+    return (
+        f"## Summary\n{summary['simple_explanation']}\n\n"
+        f"## Technical Details\n{details}\n\n"
+        f"## Risks\n- None identified\n\n"
+        f"## Testing\n{testing}\n"
+    )
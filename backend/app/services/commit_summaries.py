@@ -0,0 +1,84 @@
+import os
+import logging
+from typing import Any, Dict, List, Tuple
+
+from app.models.models import Commit, CommitAI, Project
+from app.services.commit_routing import needs_llm
+from app.services.diff_analysis import analyze_commit, describe, diff_excerpt, reviewable_files
+from app.services.github_service import github_service
+from app.services.portia_agent import portia_agent
+
+logger = logging.getLogger(__name__)
+
+# Diff text in a summary prompt: an overview, then whole hunks shared between files
+SUMMARY_DIFF_CHARS = int(os.getenv("SUMMARY_DIFF_CHARS", "4000"))
+
+
+async def generate_summary(
+    project: Project,
+    commit: Commit,
+    request=None,
+    fallback: bool = True,
+) -> Tuple[Dict[str, Any], List[Dict]]:
+    """Fetch a commit's diff from GitHub and summarize it.
+
+    Returns the CommitAI-shaped summary and the GitHub ``files`` list (empty if
+    the fetch failed). Nothing is written to the database.
+    """
+    try:
+        gh_commit = await github_service.get_commit_details(
+            owner=project.github_owner,
+            repo=project.github_repo,
+            sha=commit.sha
+        )
+        file_patches = gh_commit.get("files") or []
+    except Exception as e:
+        logger.warning("Failed to fetch GitHub details for %s: %s", commit.sha, e)
+        file_patches = []
+
+    files = [f.get("filename") for f in file_patches]
+    logger.debug("Found %d files in commit %s", len(files), commit.sha[:8])
+    # Cached by SHA, so storing the commit's file rows afterwards reuses this parse
+    analysis = await analyze_commit(commit.sha, file_patches)
+
+    summary = await portia_agent.summarize_commit(
+        message=commit.message,
+        diff_snippet=diff_excerpt(analysis, file_patches, SUMMARY_DIFF_CHARS),
+        files=files,
+        request=request,
+        diff_chars=analysis.review_chars,
+        file_patches=reviewable_files(analysis, file_patches),
+        fallback=fallback,
+        diff_overview=describe(analysis),
+    )
+    return summary, file_patches
+
+
+async def needs_llm_summary(commit: Commit, file_patches: List[Dict]) -> bool:
+    """Whether generate_summary sent this commit to a model rather than the rules tier"""
+    # The analysis is cached by SHA, so this reuses generate_summary's parse
+    analysis = await analyze_commit(commit.sha, file_patches)
+    return needs_llm(commit.message, [f.get("filename") for f in file_patches], analysis.review_chars)
+
+
+def summary_row(sha: str, summary: Dict[str, Any]) -> CommitAI:
+    return CommitAI(
+        sha=sha,
+        simple_explanation=summary["simple_explanation"],
+        technical_summary=summary["technical_summary"],
+        how_to_test=summary["how_to_test"],
+        tags=summary["tags"],
+        risk_level=summary["risk_level"],
+        plan_run_id=summary.get("plan_run_id")
+    )
+
+
+def summary_dict(ai_summary: CommitAI) -> Dict[str, Any]:
+    return {
+        "simple_explanation": ai_summary.simple_explanation,
+        "technical_summary": ai_summary.technical_summary,
+        "how_to_test": ai_summary.how_to_test,
+        "tags": ai_summary.tags,
+        "risk_level": ai_summary.risk_level.value,
+        "plan_run_id": ai_summary.plan_run_id
+    }
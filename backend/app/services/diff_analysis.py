@@ -0,0 +1,433 @@
+"""Structured view of a commit's diff: files, hunks, per-hunk line counts,
+language, generated/binary detection and changed symbol names.
+
+A commit is parsed once; the result feeds prompt building, routing, file rows
+and analytics. Large diffs are parsed in a worker process so the event loop
+never stalls on them.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Diffs with at least this much patch text are parsed in a worker process
+DIFF_PROCESS_MIN_CHARS = int(os.getenv("DIFF_PROCESS_MIN_CHARS", "100000"))
+# Worker processes for large diffs; 0 parses everything inline
+DIFF_PROCESS_WORKERS = int(os.getenv("DIFF_PROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Parsed commits kept per worker, so summarizing and storing a commit share one parse
+DIFF_ANALYSIS_CACHE_SIZE = int(os.getenv("DIFF_ANALYSIS_CACHE_SIZE", "256"))
+# Changed symbols kept per file
+MAX_FILE_SYMBOLS = 50
+
+DIFF_PARSES = metrics.Counter(
+    "synapse_diff_parses_total", "Commit diffs parsed", ("where",)
+)
+DIFF_PARSE_SECONDS = metrics.Histogram(
+    "synapse_diff_parse_seconds", "Time to parse a commit's diff, including the hop to a worker", ("where",)
+)
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+
+LANGUAGES = {
+    ".py": "Python", ".pyi": "Python",
+    ".js": "JavaScript", ".jsx": "JavaScript", ".mjs": "JavaScript", ".cjs": "JavaScript",
+    ".ts": "TypeScript", ".tsx": "TypeScript",
+    ".go": "Go", ".rs": "Rust", ".rb": "Ruby", ".php": "PHP",
+    ".java": "Java", ".kt": "Kotlin", ".kts": "Kotlin", ".scala": "Scala", ".cs": "C#",
+    ".c": "C", ".h": "C", ".cc": "C++", ".cpp": "C++", ".cxx": "C++", ".hpp": "C++",
+    ".swift": "Swift", ".m": "Objective-C", ".dart": "Dart",
+    ".sh": "Shell", ".bash": "Shell", ".sql": "SQL",
+    ".html": "HTML", ".css": "CSS", ".scss": "CSS", ".vue": "Vue", ".svelte": "Svelte",
+    ".json": "JSON", ".yaml": "YAML", ".yml": "YAML", ".toml": "TOML", ".xml": "XML",
+    ".md": "Markdown", ".mdx": "Markdown", ".rst": "reStructuredText",
+}
+LANGUAGE_NAMES = {"dockerfile": "Dockerfile", "makefile": "Makefile", "gemfile": "Ruby", "rakefile": "Ruby"}
+
+BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".pdf", ".zip", ".gz", ".tgz",
+    ".bz2", ".xz", ".7z", ".jar", ".war", ".class", ".so", ".dylib", ".dll", ".exe", ".bin",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot", ".mp3", ".mp4", ".mov", ".wav", ".sqlite", ".db",
+    ".pyc", ".lockb",
+}
+GENERATED_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock",
+    "pipfile.lock", "uv.lock", "cargo.lock", "composer.lock", "gemfile.lock", "go.sum",
+    "packages.lock.json", "podfile.lock", "mix.lock",
+}
+GENERATED_PATH = re.compile(
+    r"(^|/)(node_modules|vendor|third_party|dist|__generated__|generated)/"
+    r"|\.min\.(js|css)$|\.(js|css)\.map$|\.pb\.go$|_pb2(_grpc)?\.pyi?$|\.g\.dart$|\.designer\.cs$|\.snap$",
+    re.IGNORECASE,
+)
+GENERATED_MARKER = re.compile(r"@generated|DO NOT EDIT|Code generated by|auto-?generated", re.IGNORECASE)
+# An added line this long is minified or machine-written
+MINIFIED_LINE_CHARS = 1000
+
+_PYTHON = [r"^\s*(?:async\s+)?(?:def|class)\s+([A-Za-z_]\w*)"]
+_JS = [
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)",
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?(?:class|interface|enum|type)\s+([A-Za-z_$][\w$]*)",
+    r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s+)?"
+    r"(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)",
+]
+_JVM = [
+    r"^\s*(?:(?:public|private|protected|internal|static|final|abstract|sealed|open|data|partial)\s+)*"
+    r"(?:class|interface|enum|record|object|struct)\s+([A-Za-z_]\w*)",
+    r"^\s*(?:(?:public|private|protected|internal|static|final|abstract|override|suspend|async|virtual|synchronized)\s+)*"
+    r"fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?([A-Za-z_]\w*)",
+    r"^\s*(?:(?:public|private|protected|internal|static|final|abstract|override|async|virtual|synchronized)\s+)+"
+    r"[\w<>\[\],.?]+(?:\s*<[^>]*>)?\s+([A-Za-z_]\w*)\s*\(",
+]
+_C = [
+    r"^(?:struct|class|enum|union)\s+([A-Za-z_]\w*)\s*[:{]?\s*$",
+    r"^(?:(?:static|inline|extern|virtual|const|unsigned)\s+)*[A-Za-z_][\w:<>,]*[\s*&]+\**([A-Za-z_][\w:~]*)\s*\([^;]*$",
+]
+DEFINITIONS = {
+    "Python": _PYTHON,
+    "JavaScript": _JS, "TypeScript": _JS, "Vue": _JS, "Svelte": _JS,
+    "Go": [r"^\s*func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)", r"^\s*type\s+([A-Za-z_]\w*)"],
+    "Rust": [r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+|const\s+|unsafe\s+)*(?:fn|struct|enum|trait|mod)\s+([A-Za-z_]\w*)"],
+    "Ruby": [r"^\s*def\s+(?:self\.)?([A-Za-z_]\w*[?!=]?)", r"^\s*(?:class|module)\s+([A-Z][\w:]*)"],
+    "PHP": [r"^\s*(?:(?:public|private|protected|static|abstract|final)\s+)*(?:function|class|interface|trait)\s+([A-Za-z_]\w*)"],
+    "Java": _JVM, "Kotlin": _JVM, "Scala": _JVM, "C#": _JVM, "Swift": _JVM, "Dart": _JVM,
+    "C": _C, "C++": _C, "Objective-C": _C,
+    "Shell": [r"^\s*(?:function\s+)?([A-Za-z_][\w-]*)\s*\(\)\s*\{?"],
+}
+GENERIC_DEFINITIONS = [r"^\s*(?:export\s+)?(?:async\s+)?(?:def|function|func|fn|class)\s+([A-Za-z_]\w*)"]
+NOT_SYMBOLS = {"if", "for", "while", "switch", "return", "catch", "sizeof", "else", "new", "do", "elif"}
+
+_COMPILED: Dict[Optional[str], List["re.Pattern"]] = {}
+
+
+def _definitions(language: Optional[str]) -> List["re.Pattern"]:
+    patterns = _COMPILED.get(language)
+    if patterns is None:
+        patterns = _COMPILED[language] = [re.compile(p) for p in DEFINITIONS.get(language, GENERIC_DEFINITIONS)]
+    return patterns
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_lines: int
+    new_start: int
+    new_lines: int
+    # Enclosing function or class git prints after the range, if any
+    section: str = ""
+    additions: int = 0
+    deletions: int = 0
+    # Character span of the hunk in the file's patch
+    start: int = 0
+    end: int = 0
+
+
+@dataclass
+class FileDiff:
+    path: str
+    previous_path: Optional[str] = None
+    status: Optional[str] = None
+    language: Optional[str] = None
+    generated: bool = False
+    binary: bool = False
+    additions: int = 0
+    deletions: int = 0
+    # Length of the patch text; 0 when GitHub sent none (binary or oversized)
+    patch_chars: int = 0
+    hunks: List[Hunk] = field(default_factory=list)
+    # Functions, classes and types defined on changed lines or enclosing a hunk
+    symbols: List[str] = field(default_factory=list)
+
+    @property
+    def reviewable(self) -> bool:
+        """Worth showing to a model or a reviewer: hand-written text with a patch"""
+        return self.patch_chars > 0 and not self.generated and not self.binary
+
+
+@dataclass
+class DiffAnalysis:
+    files: List[FileDiff] = field(default_factory=list)
+
+    @property
+    def additions(self) -> int:
+        return sum(f.additions for f in self.files)
+
+    @property
+    def deletions(self) -> int:
+        return sum(f.deletions for f in self.files)
+
+    @property
+    def review_chars(self) -> int:
+        """Patch text of the reviewable files; what prompt size and routing go by"""
+        return sum(f.patch_chars for f in self.files if f.reviewable)
+
+    @property
+    def skipped(self) -> List[str]:
+        """Generated, binary and oversized files: named in prompts, never shown"""
+        return [f.path for f in self.files if not f.reviewable and (f.generated or f.binary or f.additions or f.deletions)]
+
+    def languages(self) -> Dict[str, int]:
+        """Changed lines per language, largest first"""
+        totals: Dict[str, int] = {}
+        for f in self.files:
+            if f.language and not f.generated:
+                totals[f.language] = totals.get(f.language, 0) + f.additions + f.deletions
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def symbols(self, limit: int = 20) -> List[str]:
+        names = dict.fromkeys(s for f in self.files if not f.generated for s in f.symbols)
+        return list(names)[:limit]
+
+
+def _extension(path: str) -> str:
+    """Lower-case extension of the file name only, so dotted directories (.github/, v1.2/) don't count"""
+    return os.path.splitext(os.path.basename(path))[1].lower()
+
+
+def detect_language(path: str) -> Optional[str]:
+    name = os.path.basename(path).lower()
+    if name in LANGUAGE_NAMES:
+        return LANGUAGE_NAMES[name]
+    return LANGUAGES.get(_extension(path))
+
+
+def is_generated_path(path: str) -> bool:
+    return path.rsplit("/", 1)[-1].lower() in GENERATED_NAMES or bool(GENERATED_PATH.search(path))
+
+
+def _symbol(patterns: List["re.Pattern"], text: str) -> Optional[str]:
+    for pattern in patterns:
+        match = pattern.match(text)
+        if match:
+            name = next((g for g in match.groups() if g), None)
+            if name and name not in NOT_SYMBOLS:
+                return name
+    return None
+
+
+def parse_patch(patch: str, language: Optional[str] = None) -> Tuple[List[Hunk], List[str], bool]:
+    """Hunks of one file's unified diff, the symbols it changes, and whether it looks machine-written.
+
+    Lines before the first hunk header (``diff --git``, ``---``/``+++``) are skipped,
+    so both GitHub's per-file patches and ``git diff`` output for one file parse.
+    """
+    patterns = _definitions(language)
+    hunks: List[Hunk] = []
+    symbols: Dict[str, None] = {}
+    machine_written = False
+    current: Optional[Hunk] = None
+    offset = 0
+    for line in patch.splitlines(keepends=True):
+        start, offset = offset, offset + len(line)
+        header = HUNK_HEADER.match(line) if line.startswith("@@") else None
+        if header:
+            if current is not None:
+                current.end = start
+            old_start, old_lines, new_start, new_lines, section = header.groups()
+            current = Hunk(
+                old_start=int(old_start),
+                old_lines=int(old_lines) if old_lines is not None else 1,
+                new_start=int(new_start),
+                new_lines=int(new_lines) if new_lines is not None else 1,
+                section=section.strip(),
+                start=start,
+            )
+            hunks.append(current)
+            name = _symbol(patterns, current.section) if current.section else None
+            if name:
+                symbols.setdefault(name)
+            continue
+        if current is None or not line:
+            continue
+        marker = line[0]
+        if marker == "+":
+            current.additions += 1
+            if len(line) > MINIFIED_LINE_CHARS:
+                machine_written = True
+        elif marker == "-":
+            current.deletions += 1
+        else:
+            continue
+        # Markers near the top of a file ("@generated", "Code generated by ... DO NOT EDIT")
+        if current.new_start <= 5 and len(hunks) == 1 and GENERATED_MARKER.search(line):
+            machine_written = True
+        name = _symbol(patterns, line[1:])
+        if name:
+            symbols.setdefault(name)
+    if current is not None:
+        current.end = offset
+    return hunks, list(symbols)[:MAX_FILE_SYMBOLS], machine_written
+
+
+def analyze_file(entry: Dict) -> FileDiff:
+    """Parse one entry of a GitHub ``files`` list"""
+    path = entry.get("filename") or ""
+    patch = entry.get("patch") or ""
+    language = detect_language(path)
+    hunks, symbols, machine_written = parse_patch(patch, language) if patch else ([], [], False)
+    additions, deletions = entry.get("additions"), entry.get("deletions")
+    # GitHub sends no patch for binary files; renames without changes have none either
+    binary = _extension(path) in BINARY_EXTENSIONS
+    if not patch and not additions and not deletions and entry.get("status") != "renamed":
+        binary = True
+    return FileDiff(
+        path=path,
+        previous_path=entry.get("previous_filename"),
+        status=entry.get("status"),
+        language=language,
+        generated=machine_written or is_generated_path(path),
+        binary=binary,
+        # GitHub's counts cover patches it truncated; parsed counts are the fallback
+        additions=additions if additions is not None else sum(h.additions for h in hunks),
+        deletions=deletions if deletions is not None else sum(h.deletions for h in hunks),
+        patch_chars=len(patch),
+        hunks=hunks,
+        symbols=symbols,
+    )
+
+
+def analyze_files(files: List[Dict]) -> DiffAnalysis:
+    """Parse a commit's GitHub ``files`` list; pure and picklable, so it runs in worker processes"""
+    return DiffAnalysis(files=[analyze_file(f) for f in files if f.get("filename")])
+
+
+_PARSE_FIELDS = ("filename", "previous_filename", "status", "additions", "deletions", "patch")
+
+analysis_cache = TTLCache("diff_analysis", maxsize=DIFF_ANALYSIS_CACHE_SIZE, ttl=600)
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: the server has threads (LLM pool, caches) whose locks a fork would copy
+        _pool = ProcessPoolExecutor(
+            max_workers=DIFF_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_diff_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def analyze_commit(sha: Optional[str], files: List[Dict]) -> DiffAnalysis:
+    """Parse a commit's files once per worker; later calls for the same SHA reuse the result.
+
+    Diffs of DIFF_PROCESS_MIN_CHARS or more are parsed in a worker process.
+    """
+    cached = analysis_cache.get(sha) if sha else None
+    if cached is not None:
+        return cached
+
+    # Only the fields parsing needs cross the process boundary
+    entries = [{k: f.get(k) for k in _PARSE_FIELDS} for f in files]
+    chars = sum(len(f["patch"] or "") for f in entries)
+    where = "process" if DIFF_PROCESS_WORKERS > 0 and chars >= DIFF_PROCESS_MIN_CHARS else "inline"
+    started = time.perf_counter()
+    analysis = None
+    if where == "process":
+        try:
+            analysis = await asyncio.get_running_loop().run_in_executor(_process_pool(), analyze_files, entries)
+        except BrokenProcessPool as e:
+            logger.warning("Diff worker pool broke, parsing inline: %s", e)
+            shutdown_diff_pool()
+            where = "inline"
+    if analysis is None:
+        analysis = analyze_files(entries)
+    DIFF_PARSES.inc(where=where)
+    DIFF_PARSE_SECONDS.observe(time.perf_counter() - started, where=where)
+
+    if sha and files:
+        analysis_cache.set(sha, analysis)
+    return analysis
+
+
+def reviewable_files(analysis: DiffAnalysis, files: List[Dict]) -> List[Dict]:
+    """The entries of a GitHub ``files`` list worth summarizing, e.g. for map-reduce"""
+    keep = {f.path for f in analysis.files if f.reviewable}
+    return [f for f in files if f.get("filename") in keep]
+
+
+def describe(analysis: DiffAnalysis) -> str:
+    """Few-line overview of a diff: size, languages, changed symbols, files not shown"""
+    lines = [f"{len(analysis.files)} files changed (+{analysis.additions} -{analysis.deletions})"]
+    languages = analysis.languages()
+    if languages:
+        lines.append("Languages: " + ", ".join(list(languages)[:5]))
+    symbols = analysis.symbols()
+    if symbols:
+        lines.append("Changed symbols: " + ", ".join(symbols))
+    if analysis.skipped:
+        shown = analysis.skipped[:10]
+        more = len(analysis.skipped) - len(shown)
+        lines.append(
+            "Generated, binary or too large to show: " + ", ".join(shown) + (f" and {more} more" if more else "")
+        )
+    return "\n".join(lines)
+
+
+def _file_excerpt(f: FileDiff, patch: str, limit: int) -> str:
+    """Whole hunks of one file in order while they fit; a hunk is only cut when none fit"""
+    title = f"File: {f.path} ({f.status or 'modified'}, +{f.additions} -{f.deletions})\n"
+    parts = [title]
+    used = len(title)
+    shown = 0
+    for hunk in f.hunks:
+        text = patch[hunk.start:hunk.end]
+        if used + len(text) > limit:
+            if shown:
+                break
+            cut = patch.rfind("\n", hunk.start, hunk.start + max(limit - used, 0))
+            if cut <= hunk.start:
+                break
+            text = patch[hunk.start:cut + 1] + "...\n"
+        parts.append(text)
+        used += len(text)
+        shown += 1
+    rest = f.hunks[shown:]
+    if rest:
+        parts.append(
+            f"[{len(rest)} more hunks, +{sum(h.additions for h in rest)} -{sum(h.deletions for h in rest)}]\n"
+        )
+    return "".join(parts)
+
+
+def diff_excerpt(analysis: DiffAnalysis, files: List[Dict], max_chars: int) -> str:
+    """Prompt text for a diff in about ``max_chars``: the overview, then each reviewable file.
+
+    The budget is shared between files, smallest first, so a small file is shown
+    whole and what it leaves over goes to the larger ones.
+    """
+    patches = {f.get("filename"): f.get("patch") or "" for f in files}
+    overview = describe(analysis)
+    reviewable = [f for f in analysis.files if f.reviewable]
+    remaining = max_chars - len(overview)
+    excerpts: Dict[str, str] = {}
+    by_size = sorted(reviewable, key=lambda f: f.patch_chars)
+    for i, f in enumerate(by_size):
+        share = remaining // (len(by_size) - i)
+        if share < 200:
+            break
+        excerpts[f.path] = _file_excerpt(f, patches.get(f.path, ""), share)
+        remaining -= len(excerpts[f.path])
+
+    parts = [overview]
+    parts.extend(excerpts[f.path] for f in reviewable if f.path in excerpts)
+    hidden = [f.path for f in reviewable if f.path not in excerpts]
+    if hidden:
+        parts.append("Not shown: " + ", ".join(hidden[:20]) + (" ..." if len(hidden) > 20 else ""))
+    return "\n".join(parts)
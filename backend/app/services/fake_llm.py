@@ -0,0 +1,60 @@
+import os
+import json
+import time
+import asyncio
+import random
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Offline stand-in for the real providers, selected with LLM_PROVIDERS=fake.
+# Used by the benchmark harness and local development without API keys.
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "800"))
+LLM_FAKE_JITTER_MS = float(os.getenv("LLM_FAKE_JITTER_MS", "200"))
+LLM_FAKE_FAILURE_RATE = float(os.getenv("LLM_FAKE_FAILURE_RATE", "0.0"))
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+class FakeLLM:
+    def __init__(self, latency_ms: float, jitter_ms: float, failure_rate: float):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+    def _delay(self) -> float:
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _reply(self, prompt: str) -> str:
+        digest = hashlib.sha1(prompt.encode("utf-8", "ignore")).hexdigest()
+        if "JSON" in prompt:
+            return json.dumps({
+                "simple_explanation": f"Synthetic summary {digest[:8]} of this commit.",
+                "technical_summary": ["Synthetic detail one", "Synthetic detail two"],
+                "how_to_test": {"steps": ["Run the test suite"], "curl": None, "postman": None},
+                "tags": ["synthetic", digest[:4]],
+                "risk_level": ("low", "medium", "high")[int(digest[0], 16) % 3],
+            })
+        if "## Summary" in prompt:
+            return f"## Summary\nSynthetic summary {digest[:8]}.\n\n## Technical Details\n- Detail\n\n## Risks\n- None identified\n\n## Testing\n- Run tests\n"
+        return f"Synthetic answer {digest[:8]}."
+
+    def complete(self, prompt: str) -> str:
+        """Blocking completion, mirroring the synchronous provider SDKs"""
+        time.sleep(self._delay())
+        if random.random() < self.failure_rate:
+            raise FakeLLMError("Injected fake LLM failure")
+        return self._reply(prompt)
+
+    async def acomplete(self, prompt: str) -> str:
+        await asyncio.sleep(self._delay())
+        if random.random() < self.failure_rate:
+            raise FakeLLMError("Injected fake LLM failure")
+        return self._reply(prompt)
+
+
+fake_llm = FakeLLM(LLM_FAKE_LATENCY_MS, LLM_FAKE_JITTER_MS, LLM_FAKE_FAILURE_RATE)
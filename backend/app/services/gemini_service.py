@@ -1,36 +1,31 @@
-import os
-import asyncio
+import logging
 from typing import List, Dict, Optional
-import google.generativeai as genai
+from app.services.commit_routing import TIER_RULES, route_commit, rule_based_markdown
+from app.services.diff_analysis import DiffAnalysis, analyze_commit, describe, diff_excerpt, reviewable_files
+from app.services.llm_executor import LLMUnavailable, RequestCancelled
+from app.services.llm_gateway import llm_gateway
+from app.services.map_reduce import needs_map_reduce, map_commit, format_chunk_summaries
+
+logger = logging.getLogger(__name__)
 
 class GeminiService:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        self.model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-    
-    def _summarize_sync(self, message: str, files: List[Dict], max_chars: int = 8000) -> str:
-        """Synchronous Gemini summarization"""
-        if not self.api_key:
-            return f"Summary: {message[:200]}"  # Fallback
-        
-        model = genai.GenerativeModel(self.model_name)
-        
-        # Build context from commit data
-        context_parts = [f"Commit message: {message}\n"]
-        
-        for file in files[:20]:  # Limit files to avoid huge prompts
-            filename = file.get("filename", "")
-            patch = file.get("patch", "")
-            if patch:
-                # Take first 500 chars of each patch
-                context_parts.append(f"\nFile: {filename}\n{patch[:500]}\n")
-        
-        full_context = "\n".join(context_parts)[:max_chars]
-        
-        prompt = f"""You are a senior software engineer reviewing this Git commit.
-        
+    def _diff_context(self, message: str, analysis: DiffAnalysis, files: List[Dict], max_chars: int = 8000) -> str:
+        """Commit message and a diff excerpt of whole hunks, about ``max_chars`` long"""
+        header = f"Commit message: {message}\n\n"
+        return header + diff_excerpt(analysis, files, max(max_chars - len(header), 0))
+
+    async def _map_context(self, message: str, analysis: DiffAnalysis, files: List[Dict], request=None) -> str:
+        """Context built from per-chunk summaries covering the whole diff"""
+        summaries, skipped = await map_commit(reviewable_files(analysis, files), request=request)
+        return (
+            f"Commit message: {message}\n\n"
+            f"{describe(analysis)}\n\n"
+            f"Summaries of each part of the diff:\n\n{format_chunk_summaries(summaries, skipped)}"
+        )
+
+    def _build_prompt(self, full_context: str) -> str:
+        return f"""You are a senior software engineer reviewing this Git commit.
+
 Provide a clear, concise summary with:
 1. What changed (in plain English)
 2. Key technical details
@@ -54,26 +49,42 @@ Format your response as:
 ## Testing
 - How to test these changes
 """
-        
-        try:
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            print(f"Gemini error: {e}")
-            return f"Summary: {message[:200]}"
-    
+
     async def summarize_commit(
-        self, 
-        message: str, 
-        files: List[Dict], 
-        max_chars: int = 8000
+        self,
+        message: str,
+        files: List[Dict],
+        max_chars: int = 8000,
+        request=None,
+        sha: Optional[str] = None
     ) -> str:
-        """Async wrapper for commit summarization"""
-        return await asyncio.to_thread(
-            self._summarize_sync, 
-            message, 
-            files, 
-            max_chars
-        )
+        """Markdown summary of a commit, routed to a model tier by diff size.
+
+        Pass the commit ``sha`` to share the diff parse with other users of the same commit.
+        """
+        filenames = [f.get("filename", "") for f in files]
+        analysis = await analyze_commit(sha, files)
+        diff_chars = analysis.review_chars
+        tier = route_commit(message, filenames, diff_chars)
+        if tier == TIER_RULES:
+            return rule_based_markdown(message, filenames, diff_chars)
+
+        try:
+            full_context = None
+            if needs_map_reduce(diff_chars):
+                try:
+                    full_context = await self._map_context(message, analysis, files, request=request)
+                except LLMUnavailable as e:
+                    logger.warning("Map step failed, summarizing from patch excerpts: %s", e)
+            if full_context is None:
+                full_context = self._diff_context(message, analysis, files, max_chars)
+            return await llm_gateway.complete(
+                self._build_prompt(full_context), tier=tier, request=request
+            )
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            logger.warning("Gemini error: %s", e)
+            return f"Summary: {message[:200]}"  # Fallback
 
-gemini_service = GeminiService()
\ No newline at end of file
+gemini_service = GeminiService()
@@ -1,62 +1,395 @@
 import httpx
 import os
+import time
+import random
+import asyncio
+import hashlib
+import logging
+from collections import deque
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from dotenv import load_dotenv
+from app.core import deadline
+from app.core.metrics import GITHUB_DEADLINE_EXCEEDED, GITHUB_HEDGES, GITHUB_RETRIES, observe_github
+from app.utils.cache import TTLCache
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Overridable so benchmarks can point at a local GitHub stand-in
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+# Repository list pages fetched at once
+GITHUB_PAGE_CONCURRENCY = int(os.getenv("GITHUB_PAGE_CONCURRENCY", "4"))
+# A user's repository list is served from memory this long, then revalidated with its ETag
+REPO_LIST_TTL_SECONDS = float(os.getenv("REPO_LIST_TTL_SECONDS", "60"))
+# Refetched in full after this long: the ETag only covers the first page
+REPO_LIST_MAX_AGE_SECONDS = float(os.getenv("REPO_LIST_MAX_AGE_SECONDS", "3600"))
+# Per attempt; never past the request's deadline (app.core.deadline)
+GITHUB_TIMEOUT_SECONDS = float(os.getenv("GITHUB_TIMEOUT_SECONDS", "10"))
+# Extra attempts for GETs that time out, fail to connect or get a 5xx
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "2"))
+# Backoff before retry n is uniform in [0, base * 2**n) ("full jitter")
+GITHUB_RETRY_BASE_SECONDS = float(os.getenv("GITHUB_RETRY_BASE_SECONDS", "0.2"))
+# A retry is only started with at least this much of the deadline left
+GITHUB_MIN_ATTEMPT_SECONDS = 0.5
+# Hedged GETs (the commit view) send a second request once the first has taken
+# the endpoint's recent p95; at most GITHUB_HEDGE_MAX_RATIO of calls get one
+GITHUB_HEDGING = os.getenv("GITHUB_HEDGING", "true").lower() in ("1", "true", "yes")
+GITHUB_HEDGE_MAX_RATIO = float(os.getenv("GITHUB_HEDGE_MAX_RATIO", "0.1"))
+# Successful calls remembered per endpoint for the p95, and needed before hedging starts
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+# token hash -> (etag, repos, checked_at, fetched_at)
+repo_lists = TTLCache("github_repos", maxsize=1024, ttl=REPO_LIST_MAX_AGE_SECONDS)
+
+
+class GitHubAPIError(Exception):
+    def __init__(self, status_code: int, detail: str = ""):
+        super().__init__(f"GitHub API returned {status_code}: {detail}")
+        self.status_code = status_code
+
+
+class GitHubUnavailable(GitHubAPIError):
+    """No answer from GitHub: timed out, connection failed, or the request deadline passed.
+
+    ``status_code`` is 504 for timeouts and deadlines, 503 for connection errors.
+    """
+
+
+class LatencyWindow:
+    """Recent successful call latencies of one endpoint, and its hedging budget"""
+
+    def __init__(self, size: int):
+        self._samples: deque = deque(maxlen=size)
+        self.calls = 0
+        self.hedges = 0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def take_hedge(self) -> bool:
+        if self.hedges >= self.calls * GITHUB_HEDGE_MAX_RATIO:
+            return False
+        self.hedges += 1
+        return True
+
+
+def _last_page(response: httpx.Response) -> int:
+    """Page count from the Link header (1 when everything fit on the first page)"""
+    last = response.links.get("last", {}).get("url")
+    if not last:
+        return 1
+    try:
+        return int(httpx.URL(last).params.get("page", "1"))
+    except ValueError:
+        return 1
+
+
+def _format_repo(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": r["id"],
+        "name": r["name"],
+        "full_name": r["full_name"],
+        "description": r.get("description"),
+        "language": r.get("language"),
+        "stargazers_count": r.get("stargazers_count", 0),
+        "updated_at": r["updated_at"],
+        "html_url": r["html_url"],
+        "private": r.get("private", False),
+        "owner": {
+            "login": r["owner"]["login"],
+            "avatar_url": r["owner"]["avatar_url"],
+        },
+    }
+
+
 class GitHubService:
     def __init__(self):
         self.client_id = os.getenv("GITHUB_CLIENT_ID")
         self.client_secret = os.getenv("GITHUB_CLIENT_SECRET")
         self.redirect_uri = os.getenv("GITHUB_REDIRECT_URI")
-        
+        self._client: Optional[httpx.AsyncClient] = None
+        self._latency: Dict[str, LatencyWindow] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, so GitHub calls reuse pooled keep-alive connections"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=30,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _window(self, endpoint: str) -> LatencyWindow:
+        window = self._latency.get(endpoint)
+        if window is None:
+            window = self._latency[endpoint] = LatencyWindow(LATENCY_WINDOW)
+        return window
+
+    async def _attempt(self, client: httpx.AsyncClient, endpoint: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+        """One GET with per-endpoint call/latency/status metrics"""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await client.get(url, timeout=timeout, **kwargs)
+            status = response.status_code
+            return response
+        except asyncio.CancelledError:
+            # The losing half of a hedged pair
+            status = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            observe_github(endpoint, status, elapsed)
+            if isinstance(status, int) and status < 500:
+                self._window(endpoint).add(elapsed)
+
+    async def _hedged(self, client: httpx.AsyncClient, endpoint: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+        """GET that sends a second, identical request if the first outlasts the endpoint's p95.
+
+        The first usable answer wins and the other request is cancelled.
+        """
+        window = self._window(endpoint)
+        delay = window.p95()
+        first = asyncio.ensure_future(self._attempt(client, endpoint, url, timeout, **kwargs))
+        if delay is None or delay >= timeout:
+            return await first
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+            if not window.take_hedge():
+                GITHUB_HEDGES.inc(endpoint=endpoint, outcome="no_budget")
+                return await first
+            GITHUB_HEDGES.inc(endpoint=endpoint, outcome="sent")
+            tasks.append(asyncio.ensure_future(
+                self._attempt(client, endpoint, url, deadline.clamp(timeout), **kwargs)
+            ))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        GITHUB_HEDGES.inc(endpoint=endpoint, outcome="hedge_won" if task is not first else "primary_won")
+                        return task.result()
+            GITHUB_HEDGES.inc(endpoint=endpoint, outcome="both_failed")
+            return first.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _get(self, client: httpx.AsyncClient, endpoint: str, url: str, hedge: bool = False, **kwargs) -> httpx.Response:
+        """GET bounded by the request deadline, retried with jitter while budget remains.
+
+        Every attempt's timeout is cut to what is left of the deadline. Timeouts,
+        connection errors and 5xx answers are retried up to GITHUB_MAX_RETRIES times;
+        a last 5xx is returned to the caller, the others raise GitHubUnavailable.
+        With ``hedge`` (interactive paths) slow attempts are hedged, see _hedged().
+        """
+        window = self._window(endpoint)
+        attempt = 0
+        while True:
+            if deadline.expired():
+                GITHUB_DEADLINE_EXCEEDED.inc(endpoint=endpoint)
+                raise GitHubUnavailable(504, f"{endpoint}: request deadline exceeded")
+            timeout = deadline.clamp(GITHUB_TIMEOUT_SECONDS)
+            window.calls += 1
+            response = None
+            try:
+                if hedge and GITHUB_HEDGING:
+                    response = await self._hedged(client, endpoint, url, timeout, **kwargs)
+                else:
+                    response = await self._attempt(client, endpoint, url, timeout, **kwargs)
+                if response.status_code < 500:
+                    return response
+                reason, error = "status", None
+            except httpx.TimeoutException as e:
+                reason, error = "timeout", GitHubUnavailable(504, f"{endpoint}: timed out")
+                error.__cause__ = e
+            except httpx.TransportError as e:
+                reason, error = "transport", GitHubUnavailable(503, f"{endpoint}: {e}")
+                error.__cause__ = e
+
+            attempt += 1
+            backoff = random.uniform(0, GITHUB_RETRY_BASE_SECONDS * 2 ** attempt)
+            left = deadline.remaining()
+            out_of_budget = left is not None and left - backoff < GITHUB_MIN_ATTEMPT_SECONDS
+            if attempt > GITHUB_MAX_RETRIES or out_of_budget:
+                if out_of_budget and attempt <= GITHUB_MAX_RETRIES:
+                    GITHUB_RETRIES.inc(endpoint=endpoint, reason="no_budget")
+                if error is not None:
+                    raise error
+                return response
+            GITHUB_RETRIES.inc(endpoint=endpoint, reason=reason)
+            logger.debug("Retrying %s in %.2fs (%s)", endpoint, backoff, reason)
+            await asyncio.sleep(backoff)
+
     async def get_public_repo_commits(
         self, 
         owner: str, 
         repo: str,
-        branch: str = "main",
+        branch: Optional[str] = None,
         per_page: int = 30,
         page: int = 1
     ) -> List[Dict[str, Any]]:
-        """Get commits from a PUBLIC repository with pagination"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"https://api.github.com/repos/{owner}/{repo}/commits",
-                    headers={"Accept": "application/vnd.github.v3+json"},
-                    params={"sha": branch, "per_page": per_page, "page": page}
-                )
-                
-                if response.status_code == 409:
-                    response = await client.get(
-                        f"https://api.github.com/repos/{owner}/{repo}/commits",
-                        headers={"Accept": "application/vnd.github.v3+json"},
-                        params={"sha": "master", "per_page": per_page, "page": page}
-                    )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    print(f"GitHub API error: {response.status_code}")
-                    return []
-                    
-            except Exception as e:
-                print(f"Error fetching commits: {e}")
-                return []
-            
-
-    async def get_commit_details(self, owner: str, repo: str, sha: str) -> dict:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-            f"https://api.github.com/repos/{owner}/{repo}/commits/{sha}",
+        """Get commits from a PUBLIC repository with pagination; ``branch`` defaults to the repo's default branch.
+
+        An empty or missing repository or branch lists no commits. Other failures
+        raise GitHubAPIError, so a partial history is never taken for the whole.
+        """
+        params = {"per_page": per_page, "page": page}
+        if branch:
+            params["sha"] = branch
+        response = await self._get(
+            self.client,
+            "repos.commits.list",
+            f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits",
+            headers={"Accept": "application/vnd.github.v3+json"},
+            params=params
+        )
+        if response.status_code == 200:
+            return response.json()
+        # 409 is an empty repository
+        if response.status_code in (404, 409):
+            logger.warning("GitHub API error listing %s/%s@%s commits: %s", owner, repo, branch or "default", response.status_code)
+            return []
+        raise GitHubAPIError(response.status_code, f"list commits of {owner}/{repo}@{branch or 'default'}")
+
+    async def get_repository(self, owner: str, repo: str) -> dict:
+        response = await self._get(
+            self.client,
+            "repos.get",
+            f"{GITHUB_API_URL}/repos/{owner}/{repo}",
+            headers={"Accept": "application/vnd.github.v3+json"}
+        )
+        if response.status_code == 200:
+            return response.json()
+        logger.warning("GitHub API error fetching %s/%s: %s", owner, repo, response.status_code)
+        return {}
+
+    async def compare_commits(
+        self,
+        owner: str,
+        repo: str,
+        base: str,
+        head: str,
+        per_page: int = 100,
+        page: int = 1
+    ) -> dict:
+        """Commits reachable from ``head`` but not ``base`` (oldest first), with status and merge base.
+
+        Raises GitHubAPIError, e.g. 404 when ``base`` no longer exists after a force push.
+        """
+        response = await self._get(
+            self.client,
+            "repos.compare",
+            f"{GITHUB_API_URL}/repos/{owner}/{repo}/compare/{base}...{head}",
+            headers={"Accept": "application/vnd.github.v3+json"},
+            params={"per_page": per_page, "page": page}
+        )
+        if response.status_code != 200:
+            raise GitHubAPIError(response.status_code, f"compare {base[:12]}...{head}")
+        return response.json()
+
+    async def get_commit_details(self, owner: str, repo: str, sha: str, hedge: bool = False) -> dict:
+        """A commit with its files; empty if GitHub answers with an error.
+
+        Pass ``hedge`` on interactive paths to cut tail latency with a second request.
+        Raises GitHubUnavailable when GitHub does not answer in time.
+        """
+        response = await self._get(
+            self.client,
+            "repos.commit",
+            f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits/{sha}",
+            hedge=hedge,
             headers={"Accept": "application/vnd.github.v3+json"}
         )
         if response.status_code == 200:
             return response.json()
         else:
-            print(f"GitHub API error: {response.status_code}")
+            logger.warning("GitHub API error fetching %s/%s@%s: %s", owner, repo, sha[:8], response.status_code)
             return {}
 
+    async def list_user_repositories(self, token: str) -> List[Dict[str, Any]]:
+        """Every repository the token's user can access, most recently updated first.
+
+        Cached per token. After REPO_LIST_TTL_SECONDS the first page is revalidated
+        with If-None-Match (a 304 costs no rate limit); when it changed, all pages
+        are refetched concurrently using the Link header's last page.
+        """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        cached = repo_lists.get(key)
+        now = time.monotonic()
+        if cached is not None and now - cached[2] < REPO_LIST_TTL_SECONDS:
+            return cached[1]
+
+        url = f"{GITHUB_API_URL}/user/repos"
+        headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json",
+            "User-Agent": "Synapse-App",
+        }
+
+        async def fetch(page: int, extra_headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+            return await self._get(
+                self.client,
+                "user.repos",
+                url,
+                headers={**headers, **(extra_headers or {})},
+                params={"sort": "updated", "per_page": 100, "page": page},
+            )
+
+        etag = cached[0] if cached is not None else None
+        first = await fetch(1, {"If-None-Match": etag} if etag else None)
+        if first.status_code == 304 and cached is not None:
+            # Unchanged: keep the list until its max age, counted from the full fetch
+            remaining = REPO_LIST_MAX_AGE_SECONDS - (now - cached[3])
+            repo_lists.set(key, (etag, cached[1], now, cached[3]), ttl=max(remaining, 1))
+            return cached[1]
+        if first.status_code != 200:
+            raise GitHubAPIError(first.status_code, first.text[:200])
+
+        pages = [first.json()]
+        last = _last_page(first)
+        if last > 1:
+            semaphore = asyncio.Semaphore(GITHUB_PAGE_CONCURRENCY)
+
+            async def fetch_page(page: int) -> httpx.Response:
+                async with semaphore:
+                    return await fetch(page)
+
+            for response in await asyncio.gather(*(fetch_page(p) for p in range(2, last + 1))):
+                # A partial list would look complete to the user; fail instead
+                if response.status_code != 200:
+                    raise GitHubAPIError(response.status_code, response.text[:200])
+                pages.append(response.json())
+
+        seen = set()
+        repos = []
+        for page in pages:
+            for r in page:
+                # Pages can shift while being fetched, which repeats a repository
+                if r["id"] not in seen:
+                    seen.add(r["id"])
+                    repos.append(_format_repo(r))
+        repo_lists.set(key, (first.headers.get("etag"), repos, now, now))
+        logger.info("Fetched %d repositories in %d pages", len(repos), last)
+        return repos
+
 github_service = GitHubService()
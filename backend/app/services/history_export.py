@@ -0,0 +1,297 @@
+import io
+import csv
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.models.models import Commit, CommitAI, CommitFile, Project, ProjectCommit, RiskLevel
+from app.services.activity import add_links, record_summaries
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 500
+# Records written per transaction during import
+IMPORT_BATCH_SIZE = 500
+
+CSV_COLUMNS = [
+    "sha", "committed_at", "author_name", "author_login", "message", "url",
+    "files_changed", "additions", "deletions",
+    "risk_level", "tags", "simple_explanation", "technical_summary",
+]
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def project_record(project: Project) -> Dict:
+    return {
+        "type": "project",
+        "name": project.name,
+        "github_owner": project.github_owner,
+        "github_repo": project.github_repo,
+        "exported_at": datetime.utcnow().isoformat(),
+    }
+
+
+def commit_record(commit: Commit, ai: Optional[CommitAI], files: List[CommitFile]) -> Dict:
+    return {
+        "type": "commit",
+        "sha": commit.sha,
+        "message": commit.message,
+        "author_name": commit.author_name,
+        "author_login": commit.author_login,
+        "committed_at": _iso(commit.committed_at),
+        "url": commit.url,
+        "files": [
+            {
+                "path": f.path,
+                "previous_path": f.previous_path,
+                "status": f.status,
+                "additions": f.additions,
+                "deletions": f.deletions,
+            }
+            for f in files
+        ],
+        "ai_summary": {
+            "simple_explanation": ai.simple_explanation,
+            "technical_summary": ai.technical_summary,
+            "how_to_test": ai.how_to_test,
+            "tags": ai.tags,
+            "risk_level": ai.risk_level.value if ai.risk_level else None,
+            "plan_run_id": ai.plan_run_id,
+        } if ai else None,
+    }
+
+
+async def iter_commit_records(project_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Dict]:
+    """Yield a project's commits with summaries and files, oldest first.
+
+    Opens its own session: a StreamingResponse body runs after request-scoped
+    dependencies are closed. Memory stays at one batch whatever the project size.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            select(Commit, CommitAI)
+            .join(ProjectCommit, ProjectCommit.sha == Commit.sha)
+            .outerjoin(CommitAI, CommitAI.sha == Commit.sha)
+            .where(ProjectCommit.project_id == project_id)
+            .order_by(ProjectCommit.committed_at, ProjectCommit.sha)
+            .execution_options(yield_per=batch_size)
+        )
+        async for batch in result.partitions():
+            files = await _files_for(session, [commit.sha for commit, _ in batch])
+            for commit, ai in batch:
+                yield commit_record(commit, ai, files.get(commit.sha, []))
+            # Nothing from this batch is needed again
+            session.expunge_all()
+
+
+async def _files_for(session: AsyncSession, shas: List[str]) -> Dict[str, List[CommitFile]]:
+    files: Dict[str, List[CommitFile]] = {}
+    if not shas:
+        return files
+    result = await session.execute(
+        select(CommitFile).where(CommitFile.sha.in_(shas)).order_by(CommitFile.sha, CommitFile.path)
+    )
+    for f in result.scalars():
+        files.setdefault(f.sha, []).append(f)
+    return files
+
+
+async def ndjson_lines(project: Project) -> AsyncIterator[bytes]:
+    yield (json.dumps(project_record(project)) + "\n").encode()
+    count = 0
+    async for record in iter_commit_records(project.id):
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode()
+        count += 1
+    logger.info("Exported %d commits of project %s as NDJSON", count, project.id)
+
+
+def _csv_row(record: Dict) -> List:
+    ai = record["ai_summary"] or {}
+    files = record["files"]
+    return [
+        record["sha"], record["committed_at"], record["author_name"], record["author_login"],
+        record["message"], record["url"],
+        len(files) if files else "",
+        sum(f["additions"] or 0 for f in files) if files else "",
+        sum(f["deletions"] or 0 for f in files) if files else "",
+        ai.get("risk_level") or "",
+        ";".join(ai.get("tags") or []),
+        ai.get("simple_explanation") or "",
+        " | ".join(ai.get("technical_summary") or []),
+    ]
+
+
+async def csv_lines(project: Project) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    async for record in iter_commit_records(project.id):
+        writer.writerow(_csv_row(record))
+        count += 1
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+    logger.info("Exported %d commits of project %s as CSV", count, project.id)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    """Decode an NDJSON byte stream record by record"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+async def _project_for(db: AsyncSession, record: Dict, user_id: Optional[int]) -> Project:
+    result = await db.execute(
+        select(Project).where(
+            Project.github_owner == record["github_owner"],
+            Project.github_repo == record["github_repo"],
+        )
+    )
+    project = result.scalar_one_or_none()
+    if project is None:
+        project = Project(
+            name=record.get("name") or record["github_repo"],
+            github_owner=record["github_owner"],
+            github_repo=record["github_repo"],
+            connected_by_user_id=user_id,
+        )
+        db.add(project)
+        await db.flush()
+    return project
+
+
+async def _import_batch(db: AsyncSession, project: Project, records: List[Dict]) -> Tuple[int, int]:
+    shas = [r["sha"] for r in records]
+    existing = set((await db.execute(select(Commit.sha).where(Commit.sha.in_(shas)))).scalars())
+    linked = set((await db.execute(
+        select(ProjectCommit.sha).where(ProjectCommit.project_id == project.id, ProjectCommit.sha.in_(shas))
+    )).scalars())
+    with_ai = set((await db.execute(select(CommitAI.sha).where(CommitAI.sha.in_(shas)))).scalars())
+    with_files = set((await db.execute(
+        select(CommitFile.sha).where(CommitFile.sha.in_(shas)).distinct()
+    )).scalars())
+
+    imported = 0
+    new_links = []
+    new_summaries = {}
+    for r in records:
+        sha = r["sha"]
+        committed_at = _parse_time(r.get("committed_at"))
+        if sha not in existing:
+            db.add(Commit(
+                sha=sha,
+                project_id=project.id,
+                message=r.get("message"),
+                author_name=r.get("author_name"),
+                author_login=r.get("author_login"),
+                committed_at=committed_at,
+                files_summary=[],
+                url=r.get("url"),
+            ))
+            existing.add(sha)
+            imported += 1
+        if sha not in linked:
+            # Commits already stored for another project are shared, not copied
+            db.add(ProjectCommit(project_id=project.id, sha=sha, committed_at=committed_at))
+            new_links.append(sha)
+            linked.add(sha)
+        ai = r.get("ai_summary")
+        if ai and sha not in with_ai:
+            db.add(CommitAI(
+                sha=sha,
+                simple_explanation=ai.get("simple_explanation"),
+                technical_summary=ai.get("technical_summary"),
+                how_to_test=ai.get("how_to_test"),
+                tags=ai.get("tags"),
+                risk_level=RiskLevel(ai["risk_level"]) if ai.get("risk_level") else None,
+                plan_run_id=ai.get("plan_run_id"),
+            ))
+            new_summaries[sha] = ai.get("risk_level")
+            with_ai.add(sha)
+        if r.get("files") and sha not in with_files:
+            db.add_all(
+                CommitFile(
+                    sha=sha,
+                    project_id=project.id,
+                    path=f["path"],
+                    previous_path=f.get("previous_path"),
+                    status=f.get("status"),
+                    additions=f.get("additions") or 0,
+                    deletions=f.get("deletions") or 0,
+                    committed_at=committed_at,
+                )
+                for f in {f["path"]: f for f in r["files"]}.values()
+            )
+            with_files.add(sha)
+    # New links are counted with the summaries added above; only other projects' links move
+    await add_links(db, project.id, new_links)
+    await record_summaries(db, new_summaries, counted={(project.id, sha) for sha in new_links})
+    await db.commit()
+    # Keep the identity map from growing with the import
+    db.expunge_all()
+    return imported, len(records) - imported
+
+
+async def import_records(db: AsyncSession, records: AsyncIterator[Dict], user_id: Optional[int] = None) -> Dict:
+    """Load an export produced by ndjson_lines(), committing every IMPORT_BATCH_SIZE commits.
+
+    A project created by the import is connected by ``user_id`` (none when anonymous).
+    Existing commits, summaries and file rows are left untouched, so re-running an
+    import is safe.
+    """
+    project: Optional[Project] = None
+    batch: List[Dict] = []
+    imported = skipped = 0
+
+    async def flush():
+        nonlocal imported, skipped
+        added, existed = await _import_batch(db, project, batch)
+        imported += added
+        skipped += existed
+        batch.clear()
+
+    async for record in records:
+        kind = record.get("type")
+        if kind == "project":
+            if project is not None:
+                raise ValueError("Only one project per import")
+            project = await _project_for(db, record, user_id)
+        elif kind == "commit":
+            if project is None:
+                raise ValueError("The first record must be the project")
+            batch.append(record)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+        else:
+            raise ValueError(f"Unknown record type: {kind!r}")
+
+    if project is None:
+        raise ValueError("Empty import")
+    if batch:
+        await flush()
+    await db.commit()
+    logger.info("Imported %d commits into project %s (%d already present)", imported, project.id, skipped)
+    return {"project_id": project.id, "imported": imported, "skipped": skipped}
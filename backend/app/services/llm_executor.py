@@ -0,0 +1,247 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core import deadline, metrics
+
+logger = logging.getLogger(__name__)
+
+# Threads dedicated to blocking provider SDK calls (never the default pool)
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+# Running + queued calls; beyond this new calls fail fast instead of piling up
+LLM_MAX_PENDING = int(os.getenv("LLM_MAX_PENDING", "32"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "45"))
+# Consecutive failures that open a provider's circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+# How often a waiting call checks whether its HTTP client has gone away
+DISCONNECT_POLL_SECONDS = 0.5
+
+LLM_REJECTED = metrics.Counter(
+    "synapse_llm_rejected_total", "LLM calls refused before reaching a provider", ("provider", "reason")
+)
+LLM_BREAKER_STATE = metrics.Gauge(
+    "synapse_llm_circuit_open", "1 while a provider's circuit breaker is open", ("provider",)
+)
+
+
+class LLMUnavailable(Exception):
+    """The call could not be served; callers should use their fallback path."""
+
+
+class LLMTimeout(LLMUnavailable):
+    pass
+
+
+class LLMOverloaded(LLMUnavailable):
+    pass
+
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+
+class RequestCancelled(Exception):
+    """The HTTP client disconnected while its LLM call was pending."""
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open probe after a cooldown."""
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # Token of the half-open probe in flight; only its call may hand the slot back
+        self._probe: Optional[object] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Optional[object]:
+        """Admit a call: None when rejected, else a token to settle it with"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return object()
+            if state == "half_open" and self._probe is None:
+                self._probe = object()
+                return self._probe
+            return None
+
+    def release_probe(self, token: object) -> None:
+        """Hand back a half-open probe slot for a call whose outcome says nothing about the provider"""
+        with self._lock:
+            if self._probe is token:
+                self._probe = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe = None
+        LLM_BREAKER_STATE.set(0, provider=self.name)
+
+    def record_failure(self, token: object) -> None:
+        with self._lock:
+            self._failures += 1
+            # A call admitted before the circuit opened doesn't end another call's probe
+            if self._probe is token:
+                self._probe = None
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("Circuit opened for LLM provider %s", self.name)
+                self._opened_at = time.monotonic()
+        if self._opened_at is not None:
+            LLM_BREAKER_STATE.set(1, provider=self.name)
+
+
+class LLMExecutor:
+    def __init__(self, max_workers: int, max_pending: int, timeout: float):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers.setdefault(
+                provider, CircuitBreaker(provider, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_SECONDS)
+            )
+        return breaker
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _admit(self, provider: str) -> Tuple[CircuitBreaker, object]:
+        if deadline.expired():
+            LLM_REJECTED.inc(provider=provider, reason="deadline")
+            raise LLMTimeout("Request deadline exceeded")
+        breaker = self.breaker(provider)
+        token = breaker.allow()
+        if token is None:
+            LLM_REJECTED.inc(provider=provider, reason="circuit_open")
+            raise CircuitOpen(f"{provider} circuit is open")
+        if not self._acquire():
+            breaker.release_probe(token)
+            LLM_REJECTED.inc(provider=provider, reason="overloaded")
+            raise LLMOverloaded(f"{self.max_pending} LLM calls already pending")
+        return breaker, token
+
+    async def run(
+        self,
+        provider: str,
+        fn: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        request=None,
+    ) -> Any:
+        """Run a blocking provider call on the LLM pool, within the request's deadline if any.
+
+        Raises LLMUnavailable (circuit open, pool saturated, deadline exceeded) or
+        the call's own exception, and RequestCancelled if ``request`` disconnects.
+        """
+        breaker, token = self._admit(provider)
+        # The slot is released when the thread actually finishes (or the queued
+        # call is cancelled), so abandoned calls still count against the bound.
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, fn, *args)
+        future.add_done_callback(self._release)
+        return await self._settle(provider, breaker, token, asyncio.wrap_future(future), timeout, request)
+
+    async def run_async(
+        self,
+        provider: str,
+        coro_fn: Callable[..., Awaitable[Any]],
+        *args,
+        timeout: Optional[float] = None,
+        request=None,
+    ) -> Any:
+        """Same guarantees as run() for providers with a native async client"""
+        breaker, token = self._admit(provider)
+        task = asyncio.ensure_future(coro_fn(*args))
+        task.add_done_callback(self._release)
+        return await self._settle(provider, breaker, token, task, timeout, request)
+
+    async def _settle(
+        self, provider: str, breaker: CircuitBreaker, token: object, call: asyncio.Future, timeout, request
+    ) -> Any:
+        budget = timeout or self.timeout
+        timeout = deadline.clamp(budget)
+        try:
+            result = await self._wait(call, timeout, request)
+        except asyncio.TimeoutError:
+            if timeout < budget:
+                # Cut short by the request's deadline, which says nothing about the provider
+                breaker.release_probe(token)
+                LLM_REJECTED.inc(provider=provider, reason="deadline")
+                raise LLMTimeout(f"{provider} call stopped at the request deadline")
+            breaker.record_failure(token)
+            LLM_REJECTED.inc(provider=provider, reason="timeout")
+            raise LLMTimeout(f"{provider} call exceeded {timeout:.0f}s")
+        except RequestCancelled:
+            breaker.release_probe(token)
+            raise
+        except asyncio.CancelledError:
+            call.cancel()
+            breaker.release_probe(token)
+            raise
+        except Exception:
+            breaker.record_failure(token)
+            raise
+        breaker.record_success()
+        return result
+
+    async def _wait(self, call: asyncio.Future, timeout: float, request) -> Any:
+        if request is None:
+            return await asyncio.wait_for(call, timeout)
+
+        watcher = asyncio.ensure_future(self._watch_disconnect(request))
+        try:
+            done, _ = await asyncio.wait(
+                {call, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if call in done:
+                return call.result()
+            call.cancel()
+            if watcher in done:
+                raise RequestCancelled()
+            raise asyncio.TimeoutError()
+        finally:
+            watcher.cancel()
+
+    @staticmethod
+    async def _watch_disconnect(request) -> None:
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+llm_executor = LLMExecutor(LLM_MAX_WORKERS, LLM_MAX_PENDING, LLM_TIMEOUT_SECONDS)
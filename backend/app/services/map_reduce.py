@@ -0,0 +1,197 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.services.commit_routing import TIER_FAST
+from app.services.llm_executor import LLMUnavailable
+from app.services.llm_gateway import llm_gateway
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Commits whose patches add up to more than this are summarized chunk by chunk
+LLM_MAP_REDUCE_CHARS = int(os.getenv("LLM_MAP_REDUCE_CHARS", "12000"))
+# Target size of one chunk prompt's diff text
+LLM_CHUNK_CHARS = int(os.getenv("LLM_CHUNK_CHARS", "6000"))
+# Chunk calls in flight per commit (the LLM executor still bounds the total)
+LLM_MAP_CONCURRENCY = int(os.getenv("LLM_MAP_CONCURRENCY", "8"))
+# Chunks beyond this are listed by file name only, to keep the reduce prompt bounded
+LLM_MAP_MAX_CHUNKS = int(os.getenv("LLM_MAP_MAX_CHUNKS", "40"))
+LLM_CHUNK_CACHE_SIZE = int(os.getenv("LLM_CHUNK_CACHE_SIZE", "4096"))
+
+CHUNK_CALLS = metrics.Counter(
+    "synapse_llm_chunks_total", "Diff chunks in map-reduce summaries", ("result",)
+)
+
+HUNK_HEADER = re.compile(r"^@@ ", re.MULTILINE)
+
+# Keyed by a hash of the chunk prompt and model tier. The prompt holds only the
+# chunk's file names and patch text, so identical file diffs in re-runs,
+# cherry-picks and merges reuse the earlier summary.
+chunk_cache = TTLCache("llm_chunks", maxsize=LLM_CHUNK_CACHE_SIZE)
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+@dataclass
+class DiffChunk:
+    parts: List[Tuple[str, str]] = field(default_factory=list)  # (filename, diff text)
+    size: int = 0
+
+    @property
+    def filenames(self) -> List[str]:
+        return list(dict.fromkeys(name for name, _ in self.parts))
+
+    def add(self, filename: str, text: str) -> None:
+        self.parts.append((filename, text))
+        self.size += len(text)
+
+
+def needs_map_reduce(diff_chars: int) -> bool:
+    return diff_chars > LLM_MAP_REDUCE_CHARS
+
+
+def _split_patch(patch: str, limit: int) -> List[str]:
+    """Split one file's patch at hunk boundaries, hard-splitting hunks larger than limit"""
+    starts = [m.start() for m in HUNK_HEADER.finditer(patch)] or [0]
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    hunks = [patch[a:b] for a, b in zip(starts, starts[1:] + [len(patch)])]
+
+    pieces: List[str] = []
+    current = ""
+    for hunk in hunks:
+        while len(hunk) > limit:
+            cut = hunk.rfind("\n", 0, limit)
+            cut = cut if cut > 0 else limit
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(hunk[:cut])
+            hunk = hunk[cut:]
+        if current and len(current) + len(hunk) > limit:
+            pieces.append(current)
+            current = ""
+        current += hunk
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_diff(files: List[Dict], chunk_chars: int = LLM_CHUNK_CHARS) -> List[DiffChunk]:
+    """Pack GitHub file entries into chunks of roughly chunk_chars.
+
+    Small files share a chunk, large ones are split at hunk boundaries. Packing is
+    deterministic in file order so the same diff always yields the same chunks.
+    """
+    chunks: List[DiffChunk] = []
+    current = DiffChunk()
+    for f in files:
+        patch = f.get("patch") or ""
+        if not patch:
+            continue
+        filename = f.get("filename", "")
+        for piece in _split_patch(patch, chunk_chars):
+            if current.parts and current.size + len(piece) > chunk_chars:
+                chunks.append(current)
+                current = DiffChunk()
+            current.add(filename, piece)
+    if current.parts:
+        chunks.append(current)
+    return chunks
+
+
+def _chunk_prompt(chunk: DiffChunk) -> str:
+    # No commit message: it would tie the summary (and its cache key) to one commit
+    body = "\n".join(f"File: {name}\n{text}" for name, text in chunk.parts)
+    return f"""You are reviewing one part of a larger Git commit.
+
+Describe what this part of the diff changes in 2-5 short bullet points.
+Mention behaviour changes, removed functionality and anything risky.
+Answer in plain text only.
+
+{body}
+"""
+
+
+async def _summarize_chunk(chunk: DiffChunk, request=None) -> Optional[str]:
+    prompt = _chunk_prompt(chunk)
+    key = hashlib.sha256(f"{TIER_FAST}\0{prompt}".encode("utf-8", "ignore")).hexdigest()
+
+    cached = chunk_cache.get(key)
+    if cached is not None:
+        CHUNK_CALLS.inc(result="cached")
+        return cached
+
+    # Concurrent requests for the same chunk share one call
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        text = await llm_gateway.complete(prompt, tier=TIER_FAST, request=request)
+        text = text.strip()
+        chunk_cache.set(key, text)
+        CHUNK_CALLS.inc(result="ok")
+        future.set_result(text)
+        return text
+    except LLMUnavailable as e:
+        logger.warning("Chunk summary failed (%s): %s", ", ".join(chunk.filenames[:3]), e)
+        CHUNK_CALLS.inc(result="failed")
+        return None
+    finally:
+        _inflight.pop(key, None)
+        if not future.done():
+            future.set_result(None)
+
+
+async def map_commit(files: List[Dict], request=None) -> Tuple[List[Tuple[List[str], str]], List[str]]:
+    """Summarize a commit's diff chunk by chunk, concurrently.
+
+    Returns ``(summaries, skipped_files)``: per-chunk ``(filenames, summary)`` in
+    diff order, and the files that were not summarized (over the chunk cap or
+    failed). Raises LLMUnavailable if no chunk could be summarized.
+    """
+    chunks = split_diff(files)
+    kept, overflow = chunks[:LLM_MAP_MAX_CHUNKS], chunks[LLM_MAP_MAX_CHUNKS:]
+    semaphore = asyncio.Semaphore(LLM_MAP_CONCURRENCY)
+
+    async def run(chunk: DiffChunk) -> Optional[str]:
+        async with semaphore:
+            return await _summarize_chunk(chunk, request=request)
+
+    results = await asyncio.gather(*(run(c) for c in kept))
+
+    summaries = [(c.filenames, text) for c, text in zip(kept, results) if text]
+    if kept and not summaries:
+        raise LLMUnavailable("No diff chunk could be summarized")
+
+    summarized = {name for names, _ in summaries for name in names}
+    skipped = [
+        name
+        for c in kept + overflow
+        for name in c.filenames
+        if name not in summarized
+    ]
+    logger.info(
+        "Map-reduce summary: %d chunks, %d summarized, %d files skipped",
+        len(chunks), len(summaries), len(set(skipped)),
+    )
+    return summaries, list(dict.fromkeys(skipped))
+
+
+def format_chunk_summaries(summaries: List[Tuple[List[str], str]], skipped: List[str]) -> str:
+    """Chunk summaries as context for the reduce prompt"""
+    sections = [
+        f"Part {i} ({', '.join(names[:4])}{' ...' if len(names) > 4 else ''}):\n{text}"
+        for i, (names, text) in enumerate(summaries, 1)
+    ]
+    if skipped:
+        sections.append(f"Also changed, not summarized: {', '.join(skipped[:30])}")
+    return "\n\n".join(sections)
@@ -1,10 +1,13 @@
 from urllib.parse import urlencode
 import os
+import time
 import httpx
 
+from app.core.metrics import observe_github
+
 GITHUB_AUTH_URL = "https://github.com/login/oauth/authorize"
 GITHUB_TOKEN_URL = "https://github.com/login/oauth/access_token"
-GITHUB_USER_URL = "https://api.github.com/user"
+GITHUB_USER_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/") + "/user"
 
 GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
 GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
@@ -47,6 +50,7 @@ async def exchange_code_for_token(code: str) -> str:
     redirect_uri = _build_redirect_uri()
 
     async with httpx.AsyncClient() as client:
+        start = time.perf_counter()
         resp = await client.post(
             GITHUB_TOKEN_URL,
             headers={"Accept": "application/json"},
@@ -58,6 +62,7 @@ async def exchange_code_for_token(code: str) -> str:
             },
             timeout=30,
         )
+        observe_github("oauth.token", resp.status_code, time.perf_counter() - start)
         resp.raise_for_status()
         data = resp.json()
         access_token = data.get("access_token")
@@ -75,6 +80,8 @@ async def get_github_user(access_token: str) -> dict:
         "User-Agent": "Synapse-App",
     }
     async with httpx.AsyncClient() as client:
+        start = time.perf_counter()
         resp = await client.get(GITHUB_USER_URL, headers=headers, timeout=30)
+        observe_github("user", resp.status_code, time.perf_counter() - start)
         resp.raise_for_status()
         return resp.json()
\ No newline at end of file
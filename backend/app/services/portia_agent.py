@@ -1,44 +1,58 @@
-import os
 import json
-import asyncio
-from typing import Dict, Any, List
-from dotenv import load_dotenv
+import logging
+from typing import Dict, Any, List, Optional
+from app.services.commit_routing import TIER_RULES, TIER_STANDARD, route_commit, rule_based_summary
+from app.services.llm_executor import LLMUnavailable, RequestCancelled
+from app.services.llm_gateway import llm_gateway
+from app.services.map_reduce import needs_map_reduce, map_commit, format_chunk_summaries
 
-from portia import (
-    Config,
-    LLMProvider,
-    Portia,
-)
-
-load_dotenv()
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-
-# Configure Portia with proper settings
-google_config = Config.from_default(
-    llm_provider=LLMProvider.GOOGLE,
-    default_model="google/gemini-1.5-flash",
-    google_api_key=GOOGLE_API_KEY,
-)
-
-# Initialize Portia without tools to avoid validation issues
-portia = Portia(config=google_config, tools=[])
+logger = logging.getLogger(__name__)
 
 class PortiaAgent:
     async def summarize_commit(
         self,
         message: str,
         diff_snippet: str,
-        files: List[str]
+        files: List[str],
+        request=None,
+        diff_chars: Optional[int] = None,
+        file_patches: Optional[List[Dict]] = None,
+        fallback: bool = True,
+        diff_overview: Optional[str] = None
     ) -> Dict[str, Any]:
-        
-        # Use a structured prompt that Portia can handle better
+        """Structured commit summary; trivial commits skip the LLM, the rest are routed by diff size.
+
+        ``diff_snippet`` goes into the prompt as is; the caller keeps it to size.
+        Pass the GitHub ``file_patches`` to summarize diffs too large for one prompt
+        chunk by chunk (map) and combine the chunk summaries here (reduce), after
+        ``diff_overview`` if given.
+        With ``fallback=False`` a failed LLM call raises LLMUnavailable instead of
+        returning the generic fallback summary.
+        """
+        if diff_chars is None:
+            diff_chars = len(diff_snippet or "")
+        tier = route_commit(message, files, diff_chars)
+        if tier == TIER_RULES:
+            return rule_based_summary(message, files, diff_chars)
+
+        diff_label = "Code Diff Sample"
+        diff_text = "\n" + diff_snippet if diff_snippet else 'No diff available'
+        if file_patches and needs_map_reduce(diff_chars):
+            try:
+                summaries, skipped = await map_commit(file_patches, request=request)
+                diff_label = "Summaries Of Each Part Of The Diff"
+                diff_text = "\n" + "\n\n".join(filter(None, [diff_overview, format_chunk_summaries(summaries, skipped)]))
+            except LLMUnavailable as e:
+                logger.warning("Map step failed, summarizing from the diff sample: %s", e)
+
+        # Structured prompt so the answer parses as JSON whichever provider serves it
         prompt = f"""
 You are a code analysis assistant. Analyze this Git commit and provide a structured summary.
 
 COMMIT INFORMATION:
 Message: {message}
-Files Changed: {', '.join(files[:5]) if files else 'No files specified'}
-Code Diff Sample: {diff_snippet[:1000] if diff_snippet else 'No diff available'}
+Files Changed: {', '.join(files[:5]) if files else 'No files specified'}{f' and {len(files) - 5} more' if len(files) > 5 else ''}
+{diff_label}: {diff_text}
 
 TASK: Generate a JSON object with this exact structure:
 {{
@@ -57,101 +71,45 @@ Return ONLY the JSON object, no additional text or formatting.
 """
         
         try:
-            print(f"🧠 Generating AI summary with Portia...")
-            
-            # Use the standard Portia run method
-            response = await self._run_portia_safely(prompt)
+            response = await self._complete(prompt, tier, request=request)
             
             if not response:
-                print("❌ No response from Portia")
-                return self._fallback_summary(message)
+                logger.warning("No response from LLM")
+                return self._fallback_or_raise(message, fallback)
             
             # Parse the response
             parsed_data = self._parse_json_response(response)
             
             if parsed_data:
                 validated_data = self._validate_response_data(parsed_data, message)
-                print(f"✅ AI Summary generated successfully")
+                logger.debug("AI summary parsed successfully")
                 return validated_data
             else:
-                print("❌ Failed to parse JSON from response")
-                return self._fallback_summary(message)
+                logger.warning("Failed to parse JSON from LLM response")
+                return self._fallback_or_raise(message, fallback)
                 
+        except (RequestCancelled, LLMUnavailable):
+            raise
         except Exception as e:
-            print(f"❌ Portia error: {str(e)}")
-            return self._fallback_summary(message)
-    
-    async def _run_portia_safely(self, prompt: str) -> str:
-        """Run Portia safely with proper error handling"""
+            logger.exception("LLM error: %s", e)
+            return self._fallback_or_raise(message, fallback)
+
+    def _fallback_or_raise(self, message: str, fallback: bool) -> Dict[str, Any]:
+        if not fallback:
+            raise LLMUnavailable("No usable summary from the LLM")
+        return self._fallback_summary(message)
+
+    async def _complete(self, prompt: str, tier: str, request=None) -> Optional[str]:
+        """Run the prompt through the LLM gateway; None means use the fallback path"""
         try:
-            loop = asyncio.get_event_loop()
-            
-            def execute_portia():
-                try:
-                    # Use the standard run method
-                    result = portia.run(prompt)
-                    
-                    # Extract output from the result
-                    if result is None:
-                        return None
-                    
-                    # Try to get the final output
-                    if hasattr(result, 'final_output'):
-                        output = result.final_output
-                        # Handle set type (common in Portia responses)
-                        if isinstance(output, set):
-                            output_list = list(output)
-                            return output_list[0] if output_list else None
-                        elif isinstance(output, str):
-                            return output
-                        else:
-                            return str(output)
-                    
-                    # Try other attributes
-                    for attr in ['output', 'result', 'content', 'response', 'answer']:
-                        if hasattr(result, attr):
-                            value = getattr(result, attr)
-                            if value:
-                                return str(value)
-                    
-                    # Try to extract from steps if available
-                    if hasattr(result, 'steps') and result.steps:
-                        last_step = result.steps[-1]
-                        if hasattr(last_step, 'output'):
-                            return str(last_step.output)
-                    
-                    # Convert the whole result to string as last resort
-                    return str(result)
-                    
-                except Exception as e:
-                    print(f"❌ Portia execution error: {e}")
-                    # Try a simpler approach with direct config
-                    try:
-                        from langchain_google_genai import ChatGoogleGenerativeAI
-                        
-                        # Use LangChain directly as a fallback
-                        llm = ChatGoogleGenerativeAI(
-                            model="gemini-1.5-flash",
-                            google_api_key=GOOGLE_API_KEY,
-                            temperature=0.3
-                        )
-                        
-                        response = llm.invoke(prompt)
-                        if hasattr(response, 'content'):
-                            return response.content
-                        return str(response)
-                        
-                    except Exception as fallback_e:
-                        print(f"❌ Fallback LLM error: {fallback_e}")
-                        return None
-            
-            response = await loop.run_in_executor(None, execute_portia)
-            return response
-            
-        except Exception as e:
-            print(f"❌ Run error: {e}")
+            return await llm_gateway.complete(prompt, tier=tier, request=request)
+        except RequestCancelled:
+            raise
+        except LLMUnavailable as e:
+            logger.warning("LLM unavailable, using fallback: %s", e)
             return None
     
+    
     def _parse_json_response(self, text):
         """Parse JSON from text response"""
         if not text:
@@ -187,11 +145,11 @@ Return ONLY the JSON object, no additional text or formatting.
             return json.loads(text_str)
             
         except json.JSONDecodeError as e:
-            print(f"❌ JSON parse error: {e}")
-            print(f"❌ Attempted to parse: {text_str[:200] if text_str else 'empty'}...")
+            logger.warning("JSON parse error: %s", e)
+            logger.debug("Attempted to parse: %s", text_str[:200] if text_str else "empty")
             return None
         except Exception as e:
-            print(f"❌ Parse error: {e}")
+            logger.warning("Parse error: %s", e)
             return None
     
     def _validate_response_data(self, data, message):
@@ -259,8 +217,12 @@ Return ONLY the JSON object, no additional text or formatting.
             "plan_run_id": None
         }
 
-    async def answer_question(self, question: str, context_blocks: List[Dict]) -> Dict[str, Any]:
-        """Answer questions about commits"""
+    async def answer_question(self, question: str, context_blocks: List[Dict], request=None, fallback: bool = True) -> Dict[str, Any]:
+        """Answer questions about commits.
+
+        With ``fallback=False`` a missing answer raises LLMUnavailable instead of
+        returning an apology, so callers can tell real answers apart.
+        """
         
         # Build clear context
         context_lines = []
@@ -289,12 +251,11 @@ Answer in plain text only.
 """
         
         try:
-            print(f"🤖 Answering question with Portia...")
-            
-            # Get response from Portia
-            answer_text = await self._run_portia_safely(prompt)
+            answer_text = await self._complete(prompt, TIER_STANDARD, request=request)
             
             if not answer_text:
+                if not fallback:
+                    raise LLMUnavailable("No answer from the LLM")
                 return {
                     "answer": "I'm having trouble understanding your question. Could you please rephrase it or provide more context?",
                     "plan_run_id": None
@@ -312,14 +273,18 @@ Answer in plain text only.
                 except:
                     pass  # Keep original text if not valid JSON
             
-            print(f"✅ Portia answered successfully")
+            logger.debug("Question answered successfully")
             return {
                 "answer": answer_text,
                 "plan_run_id": None
             }
             
+        except (RequestCancelled, LLMUnavailable):
+            raise
         except Exception as e:
-            print(f"❌ Error in answer_question: {e}")
+            logger.exception("Error in answer_question: %s", e)
+            if not fallback:
+                raise LLMUnavailable(f"Q&A failed: {e}")
             return {
                 "answer": "I'm experiencing technical difficulties. Please try your question again in a moment.",
                 "plan_run_id": None
@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from app.core import metrics
+from app.core.database import AsyncSessionLocal
+from app.models.models import Commit, CommitAI, Project
+from app.services.activity import record_summaries
+from app.services.commit_files import store_commit_files
+from app.services.commit_summaries import generate_summary, needs_llm_summary, summary_row
+from app.services.llm_executor import llm_executor, LLMUnavailable
+from app.services.timeline_events import publish_summaries
+
+logger = logging.getLogger(__name__)
+
+# Newest commits summarized after a project is connected; Project.prefetch_limit overrides
+PREFETCH_DEFAULT_LIMIT = int(os.getenv("PREFETCH_DEFAULT_LIMIT", "20"))
+# Background summaries allowed per rolling hour, across all projects
+PREFETCH_BUDGET_PER_HOUR = int(os.getenv("PREFETCH_BUDGET_PER_HOUR", "120"))
+# Only start a background summary while at most this many LLM calls are pending
+PREFETCH_MAX_LLM_PENDING = int(os.getenv("PREFETCH_MAX_LLM_PENDING", "0"))
+# Pause after a provider failure before trying the next commit, doubled on each retry of a commit
+PREFETCH_FAILURE_BACKOFF_SECONDS = float(os.getenv("PREFETCH_FAILURE_BACKOFF_SECONDS", "30"))
+# Tries per commit while the provider is unavailable; the commit is re-queued until then
+PREFETCH_MAX_ATTEMPTS = int(os.getenv("PREFETCH_MAX_ATTEMPTS", "3"))
+IDLE_POLL_SECONDS = 0.5
+
+PREFETCH_SUMMARIES = metrics.Counter(
+    "synapse_prefetch_summaries_total", "Background commit summaries by result", ("result",)
+)
+PREFETCH_QUEUED = metrics.Gauge("synapse_prefetch_queue_depth", "Commits waiting for a background summary")
+
+
+class SummaryPrefetcher:
+    """Low-priority background summarization of recently ingested commits.
+
+    A single worker takes commits newest-first from a priority queue, waits until
+    no interactive LLM call is pending, and stays within a rolling hourly budget.
+    Progress per project is kept in memory for GET /projects/{id}/prefetch.
+    """
+
+    def __init__(self, budget_per_hour: int, max_llm_pending: int):
+        self.budget_per_hour = budget_per_hour
+        self.max_llm_pending = max_llm_pending
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._order = itertools.count()
+        self._spent: deque = deque()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.progress: Dict[int, Dict] = {}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.PriorityQueue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, project_id: int, commits: List[Commit], limit: Optional[int] = None) -> int:
+        """Queue the newest ``limit`` of ``commits`` for background summaries"""
+        limit = PREFETCH_DEFAULT_LIMIT if limit is None else limit
+        if self._queue is None or limit <= 0 or not commits:
+            return 0
+        # Undated commits (e.g. imported) sort last; datetime.min can't be compared with aware dates
+        newest = sorted(
+            commits, key=lambda c: c.committed_at.timestamp() if c.committed_at else float("-inf"), reverse=True
+        )[:limit]
+        for rank, commit in enumerate(newest):
+            # Ordered by recency rank, so every connected project gets its first
+            # screen summarized before any project gets its second
+            self._queue.put_nowait((rank, next(self._order), project_id, commit.sha, 1))
+        PREFETCH_QUEUED.inc(len(newest))
+
+        progress = self.progress.setdefault(project_id, {
+            "requested": 0, "summarized": 0, "skipped": 0, "failed": 0,
+        })
+        progress["requested"] += len(newest)
+        progress["queued_at"] = datetime.utcnow().isoformat()
+        logger.info("Queued %d commits of project %s for background summaries", len(newest), project_id)
+        return len(newest)
+
+    def status(self, project_id: int) -> Optional[Dict]:
+        progress = self.progress.get(project_id)
+        if progress is None:
+            return None
+        done = progress["summarized"] + progress["skipped"] + progress["failed"]
+        return {**progress, "pending": progress["requested"] - done}
+
+    async def wait_for(self, sha: str) -> None:
+        """Let an interactive request reuse a background summary already in progress"""
+        future = self._in_flight.get(sha)
+        if future is not None:
+            await asyncio.shield(future)
+
+    def _budget_left(self) -> bool:
+        cutoff = time.monotonic() - 3600
+        while self._spent and self._spent[0] < cutoff:
+            self._spent.popleft()
+        return len(self._spent) < self.budget_per_hour
+
+    async def _wait_for_turn(self) -> None:
+        # Interactive requests go first: only start when the LLM pool is (nearly) idle
+        while not self._budget_left() or llm_executor.pending > self.max_llm_pending:
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+
+    async def _run(self) -> None:
+        while True:
+            rank, _, project_id, sha, attempt = await self._queue.get()
+            PREFETCH_QUEUED.dec()
+            try:
+                await self._wait_for_turn()
+                result = await self._summarize(sha)
+            except asyncio.CancelledError:
+                raise
+            except LLMUnavailable as e:
+                # Provider outages are transient: try the commit again later, in its place by recency
+                if attempt < PREFETCH_MAX_ATTEMPTS:
+                    logger.info("Background summary of %s postponed (attempt %d): %s", sha[:8], attempt, e)
+                    result = "postponed"
+                    self._queue.put_nowait((rank, next(self._order), project_id, sha, attempt + 1))
+                    PREFETCH_QUEUED.inc()
+                else:
+                    logger.warning("Background summary of %s failed after %d attempts: %s", sha[:8], attempt, e)
+                    result = "failed"
+                await asyncio.sleep(PREFETCH_FAILURE_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            except Exception as e:
+                logger.warning("Background summary of %s failed: %s", sha[:8], e)
+                result = "failed"
+            PREFETCH_SUMMARIES.inc(result=result)
+            progress = self.progress.get(project_id)
+            if progress is not None and result in progress:
+                progress[result] += 1
+
+    async def _summarize(self, sha: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[sha] = future
+        try:
+            async with AsyncSessionLocal() as db:
+                if (await db.execute(select(CommitAI.id).where(CommitAI.sha == sha))).scalar_one_or_none():
+                    return "skipped"
+                commit = (await db.execute(select(Commit).where(Commit.sha == sha))).scalar_one_or_none()
+                if commit is None:
+                    return "skipped"
+                project = (await db.execute(
+                    select(Project).where(Project.id == commit.project_id)
+                )).scalar_one_or_none()
+                if project is None:
+                    return "skipped"
+
+                # No generic fallback: a failed call leaves the commit for the user to retry
+                summary, file_patches = await generate_summary(project, commit, fallback=False)
+                # Only model calls count against the budget; docs and version bumps are summarized by rules
+                if await needs_llm_summary(commit, file_patches):
+                    self._spent.append(time.monotonic())
+                db.add(summary_row(sha, summary))
+                await record_summaries(db, {sha: summary["risk_level"]})
+                await store_commit_files(db, commit, file_patches)
+                await db.commit()
+                await publish_summaries(db, {sha: summary})
+                logger.debug("Background summary saved for %s", sha[:8])
+                return "summarized"
+        finally:
+            self._in_flight.pop(sha, None)
+            future.set_result(None)
+
+
+summary_prefetcher = SummaryPrefetcher(PREFETCH_BUDGET_PER_HOUR, PREFETCH_MAX_LLM_PENDING)
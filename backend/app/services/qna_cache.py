@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.models.models import QnA
+
+logger = logging.getLogger(__name__)
+
+# Reuse an answer to a differently worded question when token overlap reaches this; 0 (the default) disables.
+# Only candidates containing every content word of the new question qualify.
+QNA_SIMILARITY_THRESHOLD = float(os.getenv("QNA_SIMILARITY_THRESHOLD", "0"))
+# Most recent answers per commit compared against a new question
+QNA_SIMILARITY_CANDIDATES = 200
+
+QNA_LOOKUPS = metrics.Counter("synapse_qna_cache_total", "Q&A answer cache lookups", ("result",))
+
+_CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "how's": "how is", "where's": "where is",
+    "it's": "it is", "isn't": "is not", "doesn't": "does not", "don't": "do not",
+    "didn't": "did not", "can't": "cannot", "won't": "will not", "aren't": "are not",
+}
+_LEADING_FILLER = re.compile(r"^(?:(?:please|hey|hi|so|ok|okay)[, ]+)+")
+_STOPWORDS = frozenset({
+    "a", "an", "the", "this", "that", "these", "those", "it", "its",
+    "please", "can", "could", "would", "you", "me", "i", "we", "us",
+    "tell", "explain", "describe", "about", "in", "of", "for", "to", "on", "with",
+    "is", "are", "was", "does", "do", "did", "commit",
+})
+_TOKEN = re.compile(r"[\w./-]+")
+
+_inflight: Dict[Tuple, asyncio.Future] = {}
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace, contraction and punctuation-insensitive form of a question"""
+    text = unicodedata.normalize("NFKC", question).casefold().replace("’", "'")
+    text = " ".join(_CONTRACTIONS.get(word, word) for word in text.split())
+    text = _LEADING_FILLER.sub("", text)
+    return text.rstrip(" ?!.")
+
+
+def question_hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def context_version(context_blocks: List[Dict]) -> str:
+    """Identifies the context an answer was based on; changes when a commit, its files or summary change"""
+    return hashlib.sha256(json.dumps(context_blocks, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _tokens(normalized: str) -> FrozenSet[str]:
+    tokens = set()
+    for token in _TOKEN.findall(normalized):
+        if token in _STOPWORDS:
+            continue
+        # Crude plural folding: "tests" matches "test"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.add(token)
+    return frozenset(tokens)
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the content words of two normalized questions"""
+    ta, tb = _tokens(a), _tokens(b)
+    if not ta or not tb:
+        return 1.0 if a == b else 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def _scope(project_id: int, sha: Optional[str]):
+    sha_clause = QnA.sha == sha if sha else QnA.sha.is_(None)
+    return (QnA.project_id == project_id, sha_clause)
+
+
+async def find_answer(
+    db: AsyncSession,
+    project_id: int,
+    sha: Optional[str],
+    normalized: str,
+    version: str,
+) -> Optional[QnA]:
+    """A stored answer to the same (or a near-identical) question over the same context"""
+    exact = (await db.execute(
+        select(QnA)
+        .where(*_scope(project_id, sha), QnA.question_hash == question_hash(normalized), QnA.context_version == version)
+        .order_by(QnA.id.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+    if exact is not None:
+        QNA_LOOKUPS.inc(result="exact")
+        return exact
+
+    if QNA_SIMILARITY_THRESHOLD > 0:
+        candidates = (await db.execute(
+            select(QnA)
+            .where(*_scope(project_id, sha), QnA.context_version == version)
+            .order_by(QnA.id.desc())
+            .limit(QNA_SIMILARITY_CANDIDATES)
+        )).scalars().all()
+        wanted = _tokens(normalized)
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            # "... for Stripe customers" must not answer "... for PayPal customers", however close
+            if not wanted <= _tokens(candidate.normalized_question or ""):
+                continue
+            score = similarity(normalized, candidate.normalized_question or "")
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is not None and best_score >= QNA_SIMILARITY_THRESHOLD:
+            logger.debug("Q&A near-duplicate of #%s (similarity %.2f)", best.id, best_score)
+            QNA_LOOKUPS.inc(result="similar")
+            return best
+
+    QNA_LOOKUPS.inc(result="miss")
+    return None
+
+
+async def record_hit(db: AsyncSession, qna: QnA) -> None:
+    # project_id narrows the update to one partition when qna is partitioned by project
+    await db.execute(
+        update(QnA)
+        .where(QnA.project_id == qna.project_id, QnA.id == qna.id)
+        .values(hit_count=QnA.hit_count + 1)
+    )
+    await db.commit()
+
+
+async def shared(key: Tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Run ``compute`` once for concurrent callers with the same key.
+
+    Waiters get None if the first caller fails, and should look the answer up again.
+    """
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await compute()
+        future.set_result(result)
+        return result
+    finally:
+        _inflight.pop(key, None)
+        if not future.done():
+            future.set_result(None)
+
+
+async def question_history(db: AsyncSession, project_id: Optional[int], sha: Optional[str], limit: int, offset: int) -> List[Dict]:
+    """Stored Q&A, newest first; without ``project_id``, a commit's questions from every project sharing it"""
+    scope = _scope(project_id, sha) if project_id is not None else (QnA.sha == sha,)
+    result = await db.execute(
+        select(QnA)
+        .where(*scope)
+        .order_by(QnA.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    return [
+        {
+            "id": q.id,
+            "project_id": q.project_id,
+            "question": q.question,
+            "answer": q.answer,
+            "user_id": q.user_id,
+            "hit_count": q.hit_count,
+            "context_version": q.context_version,
+            "created_at": q.created_at.isoformat() if q.created_at else None,
+        }
+        for q in result.scalars()
+    ]
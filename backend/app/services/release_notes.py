@@ -0,0 +1,374 @@
+import os
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.database import engine
+from app.models.models import Commit, CommitAI, Project, ReleaseNotes
+from app.services.activity import activity_author, record_summaries, risk_key, RISK_LEVELS, UNSUMMARIZED
+from app.services.branches import commit_from_github, compare_refs
+from app.services.commit_files import store_commit_files
+from app.services.commit_routing import TIER_FAST, TIER_STANDARD
+from app.services.commit_summaries import generate_summary, summary_row
+from app.services.github_service import GitHubAPIError
+from app.services.llm_executor import LLMUnavailable, RequestCancelled
+from app.services.llm_gateway import llm_gateway
+from app.services.prefetch import summary_prefetcher
+from app.services.timeline_events import publish_summaries
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Largest range summarized; longer ranges are rejected rather than summarized in part
+RELEASE_NOTES_MAX_COMMITS = int(os.getenv("RELEASE_NOTES_MAX_COMMITS", "500"))
+# Missing commit summaries and group reduces run at once per range (the LLM executor still bounds the total)
+RELEASE_NOTES_CONCURRENCY = int(os.getenv("RELEASE_NOTES_CONCURRENCY", "4"))
+# Average commits per first-level group, and sections merged per higher-level reduce
+RELEASE_NOTES_GROUP_SIZE = int(os.getenv("RELEASE_NOTES_GROUP_SIZE", "20"))
+RELEASE_GROUP_CACHE_SIZE = int(os.getenv("RELEASE_GROUP_CACHE_SIZE", "2048"))
+# Longest per-commit explanation quoted in a group prompt
+EXPLANATION_CHARS = 400
+
+RELEASE_NOTES_REQUESTS = metrics.Counter(
+    "synapse_release_notes_total", "Release-notes requests by result", ("result",)
+)
+RELEASE_GROUPS = metrics.Counter(
+    "synapse_release_groups_total", "Group reduces in release notes", ("result",)
+)
+
+# Keyed by a hash of the prompt and model tier. Group boundaries depend only on
+# the commits, so overlapping ranges share every group that lies inside both.
+group_cache = TTLCache("release_groups", maxsize=RELEASE_GROUP_CACHE_SIZE)
+_inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+@dataclass
+class CommitRange:
+    base_sha: str
+    head_sha: str
+    # Oldest first
+    commits: List[Commit]
+
+
+async def _github_range(db: AsyncSession, project: Project, base: str, head: str) -> CommitRange:
+    try:
+        comparison = await compare_refs(project, base, head, RELEASE_NOTES_MAX_COMMITS)
+    except GitHubAPIError as e:
+        if e.status_code == 404:
+            raise LookupError(f"{base}...{head} not found in {project.github_owner}/{project.github_repo}")
+        raise
+    if comparison.get("ahead_by", 0) > RELEASE_NOTES_MAX_COMMITS:
+        raise ValueError(
+            f"{base}...{head} has {comparison['ahead_by']} commits; at most {RELEASE_NOTES_MAX_COMMITS} are summarized"
+        )
+
+    gh_commits = comparison.get("commits") or []
+    shas = [c["sha"] for c in gh_commits]
+    rows = {c.sha: c for c in (await db.execute(select(Commit).where(Commit.sha.in_(shas)))).scalars()}
+    commits = []
+    for commit_data in gh_commits:
+        commit = rows.get(commit_data["sha"])
+        if commit is None:
+            # Not stored: the range doesn't make it part of the project
+            try:
+                commit = commit_from_github(project, commit_data)
+            except Exception as e:
+                logger.warning("Skipping commit %s in range: %s", commit_data["sha"][:8], e)
+                continue
+        commits.append(commit)
+    merge_base = (comparison.get("merge_base_commit") or {}).get("sha") or base
+    return CommitRange(merge_base, shas[-1] if shas else merge_base, commits)
+
+
+async def resolve_range(db: AsyncSession, project: Project, base: str, head: str) -> CommitRange:
+    """Commits in ``base...head``, as the compare API resolves them.
+
+    Membership always comes from git ancestry: commit dates can't tell whether a
+    commit authored before ``base`` was merged after it, and notes are stored
+    under the resolved SHAs for every project. Commits already stored are read
+    from the database; the others are built from the comparison and not stored.
+
+    Raises LookupError for unknown refs and ValueError for ranges over
+    RELEASE_NOTES_MAX_COMMITS. Writes nothing.
+    """
+    return await _github_range(db, project, base, head)
+
+
+async def find_release_notes(db: AsyncSession, commit_range: CommitRange) -> Optional[ReleaseNotes]:
+    return (await db.execute(
+        select(ReleaseNotes).where(
+            ReleaseNotes.base_sha == commit_range.base_sha, ReleaseNotes.head_sha == commit_range.head_sha
+        )
+    )).scalar_one_or_none()
+
+
+def release_notes_dict(notes: Dict[str, Any], commit_range: CommitRange, cached: bool) -> Dict[str, Any]:
+    return {
+        "base_sha": commit_range.base_sha,
+        "head_sha": commit_range.head_sha,
+        "commits": len(commit_range.commits),
+        "cached": cached,
+        **notes,
+    }
+
+
+def stored_notes(row: ReleaseNotes) -> Dict[str, Any]:
+    return {
+        "notes": row.notes,
+        "stats": row.stats,
+        "complete": True,
+        "generated_summaries": 0,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+async def _commit_summaries(
+    db: AsyncSession,
+    project: Project,
+    commits: List[Commit],
+    request=None,
+) -> Tuple[Dict[str, Dict], int]:
+    """Stored summaries of the commits, generating the missing ones concurrently.
+
+    Returns ``{sha: {explanation, risk, tags}}`` and how many were generated.
+    Commits whose summary failed are left out.
+    """
+    shas = [c.sha for c in commits]
+    # Background summaries already running for these commits are reused
+    await asyncio.gather(*(summary_prefetcher.wait_for(sha) for sha in shas))
+    stored = {row.sha: row for row in (await db.execute(select(CommitAI).where(CommitAI.sha.in_(shas)))).scalars()}
+    summaries = {
+        sha: {"explanation": row.simple_explanation or "", "risk": risk_key(row.risk_level), "tags": row.tags or []}
+        for sha, row in stored.items()
+    }
+    missing = [c for c in commits if c.sha not in stored]
+    if not missing:
+        return summaries, 0
+
+    semaphore = asyncio.Semaphore(RELEASE_NOTES_CONCURRENCY)
+
+    async def run(commit: Commit):
+        async with semaphore:
+            try:
+                # No generic fallback: a failed commit is described by its message instead
+                return await generate_summary(project, commit, request=request, fallback=False)
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                logger.warning("Summary of %s for release notes failed: %s", commit.sha[:8], e)
+                return None
+
+    results = await asyncio.gather(*(run(c) for c in missing))
+    generated = {c.sha: (c, result) for c, result in zip(missing, results) if result is not None}
+    if not generated:
+        return summaries, 0
+
+    # A concurrent request may have stored some of them meanwhile. Commits that
+    # aren't stored (fetched only for this range) keep their summary unstored too
+    raced = set((await db.execute(select(CommitAI.sha).where(CommitAI.sha.in_(list(generated))))).scalars())
+    known = set((await db.execute(select(Commit.sha).where(Commit.sha.in_(list(generated))))).scalars())
+    risks = {}
+    stored_now = {}
+    for sha, (commit, (summary, file_patches)) in generated.items():
+        summaries[sha] = {
+            "explanation": summary["simple_explanation"] or "",
+            "risk": risk_key(summary["risk_level"]),
+            "tags": summary["tags"] or [],
+        }
+        if sha in raced or sha not in known:
+            continue
+        db.add(summary_row(sha, summary))
+        risks[sha] = summary["risk_level"]
+        stored_now[sha] = summary
+        await store_commit_files(db, commit, file_patches)
+    await record_summaries(db, risks)
+    await db.commit()
+    await publish_summaries(db, stored_now)
+    logger.info("Generated %d of %d missing summaries for release notes", len(generated), len(missing))
+    return summaries, len(generated)
+
+
+def _commit_line(commit: Commit, summary: Optional[Dict]) -> str:
+    title = next(iter((commit.message or "").strip().splitlines()), "")[:120]
+    if summary is None:
+        return f"- {commit.sha[:7]} {title}"
+    line = f"- {commit.sha[:7]} [{summary['risk']} risk] {title}: {summary['explanation'][:EXPLANATION_CHARS]}"
+    if summary["tags"]:
+        line += f" (tags: {', '.join(summary['tags'][:5])})"
+    return line
+
+
+def group_commits(commits: List[Commit], size: int = RELEASE_NOTES_GROUP_SIZE) -> List[List[int]]:
+    """Split a range into groups of about ``size`` commits, as index lists.
+
+    A group ends after a commit whose SHA falls on a boundary (1 in ``size``),
+    or at twice ``size``. Boundaries depend only on the commits, so two ranges
+    that overlap split their shared part into the same groups.
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    for i, commit in enumerate(commits):
+        current.append(i)
+        if int(commit.sha[:8], 16) % size == 0 or len(current) >= 2 * size:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _group_prompt(entries: List[str]) -> str:
+    body = "\n".join(entries)
+    return f"""You are writing part of the release notes of a software project.
+
+Summarize the changes below as 3-8 release-note bullet points. Merge related
+changes, put user-visible changes first and mark breaking or risky changes
+with "(risk)". Answer in plain text only.
+
+{body}
+"""
+
+
+def _final_prompt(commit_range: CommitRange, stats: Dict, sections: List[str]) -> str:
+    risk = ", ".join(f"{stats['risk'][r]} {r}" for r in RISK_LEVELS if stats["risk"][r])
+    body = "\n\n".join(sections)
+    return f"""You are writing the release notes for {len(commit_range.commits)} commits, from {commit_range.base_sha[:12]} to {commit_range.head_sha[:12]}.
+Risk levels: {risk}.
+
+Using the summaries below, write release notes in Markdown with the sections
+"## Highlights", "## Changes" and "## Risks". Be concise, group related
+changes, and mention every risky or breaking change.
+
+{body}
+"""
+
+
+async def _complete(prompt: str, tier: str, request=None) -> Optional[str]:
+    key = hashlib.sha256(f"{tier}\0{prompt}".encode("utf-8", "ignore")).hexdigest()
+    cached = group_cache.get(key)
+    if cached is not None:
+        RELEASE_GROUPS.inc(result="cached")
+        return cached
+    try:
+        text = (await llm_gateway.complete(prompt, tier=tier, request=request)).strip()
+    except LLMUnavailable as e:
+        logger.warning("Release notes reduce failed: %s", e)
+        RELEASE_GROUPS.inc(result="failed")
+        return None
+    group_cache.set(key, text)
+    RELEASE_GROUPS.inc(result="ok")
+    return text
+
+
+async def _reduce_level(groups: List[List[str]], request=None) -> Tuple[List[str], bool]:
+    """Reduce each group to one section; a failed group keeps its entries"""
+    semaphore = asyncio.Semaphore(RELEASE_NOTES_CONCURRENCY)
+
+    async def run(entries: List[str]) -> Optional[str]:
+        async with semaphore:
+            return await _complete(_group_prompt(entries), TIER_FAST, request=request)
+
+    results = await asyncio.gather(*(run(g) for g in groups))
+    sections = [text if text is not None else "\n".join(g) for g, text in zip(groups, results)]
+    return sections, all(text is not None for text in results)
+
+
+def range_stats(commits: List[Commit], summaries: Dict[str, Dict]) -> Dict[str, Any]:
+    """Per risk level, tag and author counts; no model call involved"""
+    risk: Counter = Counter()
+    tags: Counter = Counter()
+    authors: Counter = Counter()
+    for commit in commits:
+        summary = summaries.get(commit.sha)
+        risk[summary["risk"] if summary else UNSUMMARIZED] += 1
+        tags.update(summary["tags"] if summary else [])
+        authors[activity_author(commit.author_login, commit.author_name)] += 1
+    dates = [c.committed_at for c in commits if c.committed_at is not None]
+    return {
+        "risk": {r: risk[r] for r in RISK_LEVELS},
+        "tags": [{"tag": t, "commits": n} for t, n in tags.most_common(10)],
+        "authors": [{"author": a, "commits": n} for a, n in authors.most_common(10)],
+        "first_commit_at": min(dates).isoformat() if dates else None,
+        "last_commit_at": max(dates).isoformat() if dates else None,
+    }
+
+
+async def _save(db: AsyncSession, commit_range: CommitRange, notes: str, stats: Dict) -> None:
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(ReleaseNotes).values(
+        base_sha=commit_range.base_sha,
+        head_sha=commit_range.head_sha,
+        commit_count=len(commit_range.commits),
+        notes=notes,
+        stats=stats,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["base_sha", "head_sha"],
+        set_={"commit_count": stmt.excluded.commit_count, "notes": stmt.excluded.notes, "stats": stmt.excluded.stats},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def _generate(db: AsyncSession, project: Project, commit_range: CommitRange, request=None) -> Dict[str, Any]:
+    commits = commit_range.commits
+    summaries, generated = await _commit_summaries(db, project, commits, request=request)
+    stats = range_stats(commits, summaries)
+    complete = len(summaries) == len(commits)
+    if not commits:
+        return {"notes": "No changes in this range.", "stats": stats, "complete": True, "generated_summaries": 0}
+
+    entries = [_commit_line(c, summaries.get(c.sha)) for c in commits]
+    if len(entries) <= 2 * RELEASE_NOTES_GROUP_SIZE:
+        sections = ["\n".join(entries)]
+    else:
+        groups = [[entries[i] for i in group] for group in group_commits(commits)]
+        sections, reduced = await _reduce_level(groups, request=request)
+        complete = complete and reduced
+        while len(sections) > RELEASE_NOTES_GROUP_SIZE:
+            runs = [sections[i:i + RELEASE_NOTES_GROUP_SIZE] for i in range(0, len(sections), RELEASE_NOTES_GROUP_SIZE)]
+            sections, reduced = await _reduce_level(runs, request=request)
+            complete = complete and reduced
+        logger.debug("Release notes for %d commits reduced to %d sections", len(commits), len(sections))
+
+    notes = await _complete(_final_prompt(commit_range, stats, sections), TIER_STANDARD, request=request)
+    if notes is None:
+        complete = False
+        notes = "## Changes\n\n" + "\n\n".join(sections)
+
+    # Partial notes are returned but not stored, so a later request can complete them
+    if complete:
+        await _save(db, commit_range, notes, stats)
+    return {"notes": notes, "stats": stats, "complete": complete, "generated_summaries": generated}
+
+
+async def build_release_notes(db: AsyncSession, project: Project, commit_range: CommitRange, request=None) -> Dict[str, Any]:
+    """Generate (and store, when every step succeeded) the notes of a resolved range"""
+    key = (commit_range.base_sha, commit_range.head_sha)
+    # Concurrent requests for the same range share one generation
+    pending = _inflight.get(key)
+    if pending is not None:
+        result = await asyncio.shield(pending)
+        if result is not None:
+            RELEASE_NOTES_REQUESTS.inc(result="shared")
+            return release_notes_dict(result, commit_range, cached=True)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _generate(db, project, commit_range, request=request)
+        future.set_result(result)
+        RELEASE_NOTES_REQUESTS.inc(result="generated" if result["complete"] else "partial")
+        return release_notes_dict(result, commit_range, cached=False)
+    finally:
+        _inflight.pop(key, None)
+        if not future.done():
+            future.set_result(None)
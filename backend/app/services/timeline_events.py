@@ -0,0 +1,65 @@
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pubsub import event_bus
+from app.models.models import Commit, ProjectCommit
+
+logger = logging.getLogger(__name__)
+
+# Newest SHAs listed in a "commits" event; the count covers the rest
+EVENT_MAX_SHAS = 20
+
+
+def project_channel(project_id: int) -> str:
+    return f"project:{project_id}"
+
+
+def _timeline_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """The summary fields the timeline shows"""
+    risk_level = summary.get("risk_level")
+    return {
+        "simple_explanation": summary.get("simple_explanation"),
+        "technical_summary": (summary.get("technical_summary") or [])[:3],
+        "tags": summary.get("tags") or [],
+        "risk_level": getattr(risk_level, "value", risk_level),
+    }
+
+
+async def publish_commits(project_id: int, commits: Iterable[Commit], count: Optional[int] = None) -> None:
+    """Tell a project's timelines that commits were ingested; call after the commit.
+
+    ``count`` includes commits only linked to the project (already stored for another).
+    """
+    commits = list(commits)
+    count = len(commits) if count is None else count
+    if not count:
+        return
+    # Undated commits sort last; datetime.min can't be compared with aware dates
+    newest = sorted(
+        commits, key=lambda c: c.committed_at.timestamp() if c.committed_at else float("-inf"), reverse=True
+    )
+    await event_bus.publish(project_channel(project_id), {
+        "type": "commits",
+        "project_id": project_id,
+        "count": count,
+        "shas": [c.sha for c in newest[:EVENT_MAX_SHAS]],
+    })
+
+
+async def publish_summaries(db: AsyncSession, summaries: Dict[str, Dict[str, Any]]) -> None:
+    """Push new summaries to every project containing the commits; call after the commit"""
+    if not summaries:
+        return
+    rows = (await db.execute(
+        select(ProjectCommit.project_id, ProjectCommit.sha).where(ProjectCommit.sha.in_(list(summaries)))
+    )).all()
+    for project_id, sha in rows:
+        await event_bus.publish(project_channel(project_id), {
+            "type": "summary",
+            "project_id": project_id,
+            "sha": sha,
+            "ai_summary": _timeline_summary(summaries[sha]),
+        })
@@ -0,0 +1,69 @@
+"""Import-time report for the API process.
+
+Runs ``python -X importtime -c "import app.main"`` in a clean interpreter and
+lists the slowest top-level packages and modules, so provider SDKs creeping
+back onto the startup path show up immediately.
+
+    python -m bench.import_report --top 25
+    python -m bench.import_report --budget-ms 1500   # exit 1 when over budget (CI)
+"""
+import os
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def collect(module: str) -> list:
+    """Return (module, self_us, cumulative_us) rows from -X importtime output"""
+    env = {**os.environ, "AI_WARMUP": "false"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit(f"import {module} failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, help="Fail when total import time exceeds this")
+    args = parser.parse_args(argv)
+
+    rows = collect(args.module)
+    total_ms = next((c for n, _, c in rows if n == args.module), 0) / 1000
+
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total_ms:.0f} ms total\n")
+    print(f"{'package':<32} {'self ms':>9}")
+    for name, us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"{name:<32} {us / 1000:>9.1f}")
+
+    print(f"\n{'module':<48} {'cumulative ms':>14}")
+    for name, _, cumulative in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{name:<48} {cumulative / 1000:>14.1f}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nOver budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
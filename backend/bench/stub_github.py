@@ -0,0 +1,276 @@
+"""Local GitHub API stand-in serving deterministic synthetic repositories.
+
+Run standalone with ``python -m bench.stub_github --port 9100 --commits 2000``;
+``bench.run`` starts it automatically.
+"""
+import os
+import random
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+STUB_COMMITS = int(os.getenv("STUB_COMMITS", "500"))
+STUB_FILES_PER_COMMIT = int(os.getenv("STUB_FILES_PER_COMMIT", "8"))
+STUB_PATCH_LINES = int(os.getenv("STUB_PATCH_LINES", "40"))
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+# Tail latency and failures: this share of calls takes STUB_SLOW_MS more, or answers 502
+STUB_SLOW_RATIO = float(os.getenv("STUB_SLOW_RATIO", "0"))
+STUB_SLOW_MS = float(os.getenv("STUB_SLOW_MS", "1000"))
+STUB_ERROR_RATIO = float(os.getenv("STUB_ERROR_RATIO", "0"))
+STUB_DEFAULT_BRANCH = os.getenv("STUB_DEFAULT_BRANCH", "main")
+# Any other branch forks this many commits behind the default branch's head
+STUB_BRANCH_BEHIND = int(os.getenv("STUB_BRANCH_BEHIND", "10"))
+STUB_BRANCH_COMMITS = int(os.getenv("STUB_BRANCH_COMMITS", "5"))
+STUB_BRANCHES = os.getenv("STUB_BRANCHES", "feature,develop").split(",")
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+AUTHORS = ["alice", "bob", "carol", "dave", "erin"]
+EXTENSIONS = [".py", ".js", ".md", ".json", ".ts", ".go"]
+
+app = FastAPI(title="GitHub stub")
+
+
+def _sha(owner: str, repo: str, index) -> str:
+    return hashlib.sha1(f"{owner}/{repo}/{index}".encode()).hexdigest()
+
+
+# Per repository: commits added to the default branch, and per other branch
+# (fork index, commit count, rewrite epoch); changed through /_stub/* for tests
+_default_extra: dict = {}
+_branches: dict = {}
+# Per repository: default-branch commit index -> hours its author date is set back
+_backdated: dict = {}
+# SHA -> (branch, position), rebuilt lazily per repo after any change
+_sha_index: dict = {}
+
+
+def _branch_state(owner: str, repo: str, branch: str) -> dict:
+    key = (owner, repo, branch)
+    if key not in _branches:
+        if branch not in STUB_BRANCHES:
+            raise HTTPException(status_code=404, detail="Not Found")
+        _branches[key] = {
+            "fork": max(STUB_COMMITS - 1 - STUB_BRANCH_BEHIND, 0),
+            "count": STUB_BRANCH_COMMITS,
+            "epoch": 0,
+        }
+        _sha_index.pop((owner, repo), None)
+    return _branches[key]
+
+
+def _history(owner: str, repo: str, branch: str) -> list:
+    """Commit ids of a branch, oldest first: ints on the default branch, (branch, epoch, n) elsewhere"""
+    if branch == STUB_DEFAULT_BRANCH:
+        return list(range(STUB_COMMITS + _default_extra.get((owner, repo), 0)))
+    state = _branch_state(owner, repo, branch)
+    return list(range(state["fork"] + 1)) + [
+        (branch, state["epoch"], n) for n in range(state["count"])
+    ]
+
+
+def _commit_sha(owner: str, repo: str, cid) -> str:
+    if isinstance(cid, int):
+        return _sha(owner, repo, cid)
+    return _sha(owner, repo, f"{cid[0]}:{cid[1]}:{cid[2]}")
+
+
+def _resolve(owner: str, repo: str, ref: str) -> list:
+    """History up to ``ref`` (a branch name or a full or abbreviated commit SHA), oldest first"""
+    is_sha = 7 <= len(ref) <= 40 and all(c in "0123456789abcdef" for c in ref)
+    if not is_sha:
+        return _history(owner, repo, ref)
+    table = _sha_index.get((owner, repo))
+    if table is None:
+        table = _sha_index[(owner, repo)] = {}
+        for branch in [STUB_DEFAULT_BRANCH] + [b for (o, r, b) in _branches if (o, r) == (owner, repo)]:
+            for position, cid in enumerate(_history(owner, repo, branch)):
+                table.setdefault(_commit_sha(owner, repo, cid), (branch, position))
+    if ref not in table:
+        # GitHub resolves unambiguous abbreviations
+        matches = [sha for sha in table if sha.startswith(ref)]
+        if len(matches) != 1:
+            raise HTTPException(status_code=404, detail="Not Found")
+        ref = matches[0]
+    branch, position = table[ref]
+    return _history(owner, repo, branch)[:position + 1]
+
+
+def _position(owner: str, repo: str, cid) -> float:
+    """Place of a commit in time; a branch commit sits between default-branch commits"""
+    if isinstance(cid, int):
+        return cid - _backdated.get((owner, repo), {}).get(cid, 0)
+    return _branch_state(owner, repo, cid[0])["fork"] + cid[2] + 0.5
+
+
+def _commit_summary(owner: str, repo: str, cid) -> dict:
+    sha = _commit_sha(owner, repo, cid)
+    hours = _position(owner, repo, cid)
+    index = int(hours)
+    message = f"Synthetic change #{cid}" if isinstance(cid, int) else f"{cid[0]} change #{cid[2]}"
+    author = AUTHORS[index % len(AUTHORS)]
+    date = (EPOCH + timedelta(hours=hours)).isoformat().replace("+00:00", "Z")
+    return {
+        "sha": sha,
+        "html_url": f"https://github.com/{owner}/{repo}/commit/{sha}",
+        "commit": {
+            "message": f"{message}\n\nTouches {STUB_FILES_PER_COMMIT} files.",
+            "author": {"name": author.title(), "email": f"{author}@example.com", "date": date},
+        },
+        "author": {"login": author},
+    }
+
+
+def _patch(index: int, file_no: int) -> str:
+    lines = [f"@@ -1,{STUB_PATCH_LINES} +1,{STUB_PATCH_LINES} @@ def synthetic_{index}_{file_no}():"]
+    for n in range(STUB_PATCH_LINES):
+        prefix = "+" if n % 3 == 0 else "-" if n % 3 == 1 else " "
+        lines.append(f"{prefix}    value_{n} = compute({index}, {file_no}, {n})")
+    return "\n".join(lines)
+
+
+async def _latency():
+    delay = STUB_LATENCY_MS
+    if STUB_SLOW_RATIO and random.random() < STUB_SLOW_RATIO:
+        delay += STUB_SLOW_MS
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if STUB_ERROR_RATIO and random.random() < STUB_ERROR_RATIO:
+        raise HTTPException(status_code=502, detail="Injected failure")
+
+
+@app.get("/repos/{owner}/{repo}")
+async def get_repo(owner: str, repo: str):
+    await _latency()
+    return {"full_name": f"{owner}/{repo}", "default_branch": STUB_DEFAULT_BRANCH, "private": False}
+
+
+@app.get("/repos/{owner}/{repo}/commits")
+async def list_commits(owner: str, repo: str, per_page: int = 30, page: int = 1, sha: str = None):
+    await _latency()
+    history = _resolve(owner, repo, sha or STUB_DEFAULT_BRANCH)
+    # Newest commit first, like GitHub
+    newest_first = history[::-1][(page - 1) * per_page:page * per_page]
+    summaries = []
+    for position, cid in enumerate(newest_first):
+        summary = _commit_summary(owner, repo, cid)
+        parent_at = len(history) - 1 - ((page - 1) * per_page + position) - 1
+        summary["parents"] = [{"sha": _commit_sha(owner, repo, history[parent_at])}] if parent_at >= 0 else []
+        summaries.append(summary)
+    return summaries
+
+
+@app.get("/repos/{owner}/{repo}/compare/{basehead}")
+async def compare(owner: str, repo: str, basehead: str, per_page: int = 250, page: int = 1):
+    await _latency()
+    base_ref, _, head_ref = basehead.partition("...")
+    base, head = _resolve(owner, repo, base_ref), _resolve(owner, repo, head_ref)
+    in_base, in_head = set(base), set(head)
+    ahead = [cid for cid in head if cid not in in_base]
+    behind = [cid for cid in base if cid not in in_head]
+    shared = [cid for cid in head if cid in in_base]
+    status = (
+        "identical" if not ahead and not behind
+        else "ahead" if not behind
+        else "behind" if not ahead
+        else "diverged"
+    )
+    return {
+        "status": status,
+        "ahead_by": len(ahead),
+        "behind_by": len(behind),
+        "total_commits": len(ahead),
+        "merge_base_commit": {"sha": _commit_sha(owner, repo, shared[-1])} if shared else None,
+        "commits": [_commit_summary(owner, repo, cid) for cid in ahead[(page - 1) * per_page:page * per_page]],
+    }
+
+
+@app.post("/_stub/{owner}/{repo}/advance")
+async def advance(owner: str, repo: str, branch: str = STUB_DEFAULT_BRANCH, count: int = 1, backdate: float = 0):
+    """Push ``count`` new commits to a branch; on the default branch, ``backdate``
+    hours sets their author dates back, like commits written earlier and merged now"""
+    if branch == STUB_DEFAULT_BRANCH:
+        first = STUB_COMMITS + _default_extra.get((owner, repo), 0)
+        _default_extra[(owner, repo)] = first - STUB_COMMITS + count
+        if backdate:
+            _backdated.setdefault((owner, repo), {}).update({cid: backdate for cid in range(first, first + count)})
+    else:
+        _branch_state(owner, repo, branch)["count"] += count
+    _sha_index.pop((owner, repo), None)
+    return {"branch": branch}
+
+
+@app.post("/_stub/{owner}/{repo}/force-push")
+async def force_push(owner: str, repo: str, branch: str, count: int = 2):
+    """Rewrite a non-default branch: its own commits are replaced by ``count`` new ones"""
+    state = _branch_state(owner, repo, branch)
+    state["epoch"] += 1
+    state["count"] = count
+    _sha_index.pop((owner, repo), None)
+    return {"branch": branch}
+
+
+@app.get("/repos/{owner}/{repo}/commits/{sha}")
+async def get_commit(owner: str, repo: str, sha: str):
+    await _latency()
+    cid = _resolve(owner, repo, sha)[-1]
+    commit = _commit_summary(owner, repo, cid)
+    index = int(_position(owner, repo, cid))
+    commit["files"] = [
+        {
+            "filename": f"src/module_{(index + f) % 50}/file_{f}{EXTENSIONS[f % len(EXTENSIONS)]}",
+            "status": "modified",
+            "additions": STUB_PATCH_LINES // 3,
+            "deletions": STUB_PATCH_LINES // 3,
+            "patch": _patch(index, f),
+        }
+        for f in range(STUB_FILES_PER_COMMIT)
+    ]
+    return commit
+
+
+@app.get("/user/repos")
+async def list_user_repos(request: Request, response: Response, per_page: int = 30, page: int = 1):
+    await _latency()
+    total = 250
+    start = (page - 1) * per_page
+    repos = [
+        {
+            "id": i,
+            "name": f"repo-{i}",
+            "full_name": f"bench/repo-{i}",
+            "description": None,
+            "language": "Python",
+            "stargazers_count": i,
+            "updated_at": (EPOCH + timedelta(days=i)).isoformat().replace("+00:00", "Z"),
+            "html_url": f"https://github.com/bench/repo-{i}",
+            "private": i % 4 == 0,
+            "owner": {"login": "bench", "avatar_url": ""},
+        }
+        for i in range(start, min(start + per_page, total))
+    ]
+    last = (total + per_page - 1) // per_page
+    base = str(request.url).split("?")[0]
+    etag = '"' + hashlib.sha1(f"{per_page}/{page}/{total}".encode()).hexdigest() + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Link"] = f'<{base}?per_page={per_page}&page={last}>; rel="last"'
+    return repos
+
+
+@app.get("/user")
+async def get_user():
+    await _latency()
+    return {"id": 1, "login": "bench", "name": "Bench User", "email": None, "avatar_url": ""}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
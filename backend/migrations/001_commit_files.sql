@@ -0,0 +1,23 @@
+-- Normalized per-commit file list (app.models.models.CommitFile).
+-- Rows are filled during project ingestion and backfilled when a commit is viewed.
+
+CREATE TABLE IF NOT EXISTS commit_files (
+    id            SERIAL PRIMARY KEY,
+    sha           VARCHAR NOT NULL REFERENCES commits (sha) ON DELETE CASCADE,
+    project_id    INTEGER NOT NULL REFERENCES projects (id),
+    path          VARCHAR NOT NULL,
+    previous_path VARCHAR,
+    status        VARCHAR,
+    additions     INTEGER DEFAULT 0,
+    deletions     INTEGER DEFAULT 0,
+    committed_at  TIMESTAMP WITH TIME ZONE,
+    CONSTRAINT uq_commit_files_sha_path UNIQUE (sha, path)
+);
+
+-- Path history: WHERE project_id = ? AND path = ? ORDER BY committed_at DESC
+CREATE INDEX IF NOT EXISTS ix_commit_files_project_path
+    ON commit_files (project_id, path, committed_at);
+
+-- Hotspots: WHERE project_id = ? AND committed_at >= ? GROUP BY path
+CREATE INDEX IF NOT EXISTS ix_commit_files_project_committed_at
+    ON commit_files (project_id, committed_at);
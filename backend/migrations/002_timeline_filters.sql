@@ -0,0 +1,24 @@
+-- Indexes behind the /projects/{id}/commits filters (risk_level, tag, author, since/until).
+
+-- tags: JSON -> JSONB so containment (tags @> '["security"]') can use a GIN index
+ALTER TABLE commit_ai ALTER COLUMN tags TYPE JSONB USING tags::jsonb;
+
+CREATE INDEX IF NOT EXISTS ix_commit_ai_tags
+    ON commit_ai USING GIN (tags jsonb_path_ops);
+
+CREATE INDEX IF NOT EXISTS ix_commit_ai_risk_level
+    ON commit_ai (risk_level);
+
+-- Timeline order and date range
+CREATE INDEX IF NOT EXISTS ix_commits_project_committed_at
+    ON commits (project_id, committed_at);
+
+-- Author filter (matches the login or the display name)
+CREATE INDEX IF NOT EXISTS ix_commits_project_author_login
+    ON commits (project_id, author_login, committed_at);
+
+CREATE INDEX IF NOT EXISTS ix_commits_project_author_name
+    ON commits (project_id, author_name, committed_at);
+
+ANALYZE commits;
+ANALYZE commit_ai;
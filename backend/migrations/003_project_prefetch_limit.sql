@@ -0,0 +1,3 @@
+-- Per-project number of newest commits summarized in the background after ingestion.
+-- NULL means the server default (PREFETCH_DEFAULT_LIMIT), 0 disables prefetching.
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS prefetch_limit INTEGER;
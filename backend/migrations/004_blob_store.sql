@@ -0,0 +1,25 @@
+-- Content-addressed, compressed patch storage (app.models.models.Blob, BlobDictionary).
+-- commit_files.patch_hash points at the blob holding the file's full patch.
+
+CREATE TABLE IF NOT EXISTS blob_dictionaries (
+    id           SERIAL PRIMARY KEY,
+    codec        VARCHAR NOT NULL,
+    data         BYTEA NOT NULL,
+    sample_count INTEGER,
+    created_at   TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    hash          VARCHAR(64) PRIMARY KEY,
+    codec         VARCHAR NOT NULL,
+    dictionary_id INTEGER REFERENCES blob_dictionaries (id),
+    size          INTEGER NOT NULL,
+    stored_size   INTEGER NOT NULL,
+    data          BYTEA NOT NULL,
+    created_at    TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+-- Payloads are already compressed; skip TOAST's own pglz pass
+ALTER TABLE blobs ALTER COLUMN data SET STORAGE EXTERNAL;
+
+ALTER TABLE commit_files ADD COLUMN IF NOT EXISTS patch_hash VARCHAR(64) REFERENCES blobs (hash);
@@ -0,0 +1,8 @@
+-- Q&A answers are stored and reused per (project, commit, normalized question, context).
+ALTER TABLE qna ADD COLUMN IF NOT EXISTS normalized_question TEXT;
+ALTER TABLE qna ADD COLUMN IF NOT EXISTS question_hash VARCHAR(64);
+ALTER TABLE qna ADD COLUMN IF NOT EXISTS context_version VARCHAR(64);
+ALTER TABLE qna ADD COLUMN IF NOT EXISTS hit_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS ix_qna_lookup
+    ON qna (project_id, sha, question_hash, context_version);
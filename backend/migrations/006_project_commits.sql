@@ -0,0 +1,34 @@
+-- Commits, their files and summaries are stored once per SHA; project_commits
+-- records which projects' histories contain each commit (app.models.models.ProjectCommit).
+-- commits.project_id and commit_files.project_id now mean "first ingested by".
+
+CREATE TABLE IF NOT EXISTS project_commits (
+    project_id   INTEGER NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    sha          VARCHAR NOT NULL REFERENCES commits (sha) ON DELETE CASCADE,
+    committed_at TIMESTAMP WITH TIME ZONE,
+    created_at   TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (project_id, sha)
+);
+
+INSERT INTO project_commits (project_id, sha, committed_at)
+SELECT project_id, sha, committed_at FROM commits WHERE project_id IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+-- Timeline: WHERE project_id = ? ORDER BY committed_at DESC
+CREATE INDEX IF NOT EXISTS ix_project_commits_project_committed_at
+    ON project_commits (project_id, committed_at);
+
+-- Author filters are joined to project_commits, so they lead with the author
+DROP INDEX IF EXISTS ix_commits_project_author_login;
+DROP INDEX IF EXISTS ix_commits_project_author_name;
+CREATE INDEX IF NOT EXISTS ix_commits_author_login ON commits (author_login, committed_at);
+CREATE INDEX IF NOT EXISTS ix_commits_author_name ON commits (author_name, committed_at);
+
+-- Path history joins project_commits; hotspots start from project_commits and
+-- reach commit_files through uq_commit_files_sha_path
+DROP INDEX IF EXISTS ix_commit_files_project_path;
+DROP INDEX IF EXISTS ix_commit_files_project_committed_at;
+CREATE INDEX IF NOT EXISTS ix_commit_files_path ON commit_files (path, committed_at);
+
+-- Q&A history of a commit across projects
+CREATE INDEX IF NOT EXISTS ix_qna_sha ON qna (sha);
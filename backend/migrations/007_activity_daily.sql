@@ -0,0 +1,26 @@
+-- Daily commit counts per project, author and risk level (app.models.models.ActivityDaily),
+-- kept current by ingestion, imports and summaries; read by GET /projects/{id}/activity.
+-- POST /projects/{id}/activity/rebuild recounts a single project.
+
+CREATE TABLE IF NOT EXISTS activity_daily (
+    project_id INTEGER NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    day        DATE    NOT NULL,
+    author     VARCHAR NOT NULL,
+    risk_level VARCHAR NOT NULL,
+    commits    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (project_id, day, author, risk_level)
+);
+
+-- commit_ai.risk_level is an enum of the names (LOW, MEDIUM, HIGH)
+INSERT INTO activity_daily (project_id, day, author, risk_level, commits)
+SELECT pc.project_id,
+       (pc.committed_at AT TIME ZONE 'UTC')::date,
+       COALESCE(c.author_login, c.author_name, 'unknown'),
+       COALESCE(lower(ai.risk_level::text), 'unsummarized'),
+       count(*)
+FROM project_commits pc
+JOIN commits c ON c.sha = pc.sha
+LEFT JOIN commit_ai ai ON ai.sha = pc.sha
+WHERE pc.committed_at IS NOT NULL
+GROUP BY 1, 2, 3, 4
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,25 @@
+-- Tracked branches per project (app.models.models.ProjectBranch) and the commits
+-- each branch contains (BranchCommit). Existing projects get their default
+-- branch on the next sync, adopting the history already stored.
+
+CREATE TABLE IF NOT EXISTS project_branches (
+    id          SERIAL PRIMARY KEY,
+    project_id  INTEGER NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    name        VARCHAR NOT NULL,
+    is_default  BOOLEAN NOT NULL DEFAULT false,
+    head_sha    VARCHAR,
+    synced_at   TIMESTAMP WITH TIME ZONE,
+    created_at  TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    CONSTRAINT uq_project_branches_project_name UNIQUE (project_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS branch_commits (
+    branch_id    INTEGER NOT NULL REFERENCES project_branches (id) ON DELETE CASCADE,
+    sha          VARCHAR NOT NULL REFERENCES commits (sha) ON DELETE CASCADE,
+    committed_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (branch_id, sha)
+);
+
+-- Timeline filtered by branch: WHERE branch_id = ? ORDER BY committed_at DESC
+CREATE INDEX IF NOT EXISTS ix_branch_commits_branch_committed_at
+    ON branch_commits (branch_id, committed_at);
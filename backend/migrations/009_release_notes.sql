@@ -0,0 +1,13 @@
+-- Release notes generated for a commit range (app.models.models.ReleaseNotes),
+-- reused while the resolved base and head stay the same.
+
+CREATE TABLE IF NOT EXISTS release_notes (
+    id           SERIAL PRIMARY KEY,
+    base_sha     VARCHAR NOT NULL,
+    head_sha     VARCHAR NOT NULL,
+    commit_count INTEGER NOT NULL,
+    notes        TEXT,
+    stats        JSON,
+    created_at   TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    CONSTRAINT uq_release_notes_range UNIQUE (base_sha, head_sha)
+);
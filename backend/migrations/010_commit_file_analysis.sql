@@ -0,0 +1,13 @@
+-- Per-file results of the diff analysis (app.services.diff_analysis) on commit_files:
+-- language, whether the file is generated (lockfiles, minified and vendored code),
+-- and the functions/classes the change touches. Older rows keep NULL language and
+-- symbols; hotspots treat them as hand-written.
+
+ALTER TABLE commit_files ADD COLUMN IF NOT EXISTS language  VARCHAR;
+ALTER TABLE commit_files ADD COLUMN IF NOT EXISTS generated BOOLEAN NOT NULL DEFAULT false;
+ALTER TABLE commit_files ADD COLUMN IF NOT EXISTS symbols   JSON;
+
+-- Lockfiles are the bulk of generated churn; flag the ones already stored
+UPDATE commit_files SET generated = true
+WHERE NOT generated
+  AND lower(path) ~ '(^|/)(package-lock\.json|npm-shrinkwrap\.json|yarn\.lock|pnpm-lock\.yaml|poetry\.lock|pipfile\.lock|uv\.lock|cargo\.lock|composer\.lock|gemfile\.lock|go\.sum)$';
@@ -0,0 +1,5 @@
+-- Projects containing a commit (commit view, live timeline events, activity
+-- rollups) look project_commits up by sha alone, which its primary key
+-- (project_id, sha) can't serve.
+
+CREATE INDEX IF NOT EXISTS ix_project_commits_sha ON project_commits (sha);
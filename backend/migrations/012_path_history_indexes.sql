@@ -0,0 +1,20 @@
+-- Per-project path history and hotspots after 006_project_commits.sql dropped the
+-- (project_id, path, committed_at) index: commit_files no longer says which
+-- projects contain a row, so both queries take project membership from
+-- project_commits and touch commit_files only for the project's rows.
+--
+-- Hotspots and the path-history page walk the project's commits newest first;
+-- with sha included that walk never reads the project_commits heap.
+DROP INDEX IF EXISTS ix_project_commits_project_committed_at;
+CREATE INDEX IF NOT EXISTS ix_project_commits_project_committed_at
+    ON project_commits (project_id, committed_at) INCLUDE (sha);
+
+-- For paths the project changed rarely, the page is picked from the path's index
+-- entries alone (sha for the membership check, id to fetch the page's rows),
+-- so other projects' rows for the same path are never read from the heap.
+DROP INDEX IF EXISTS ix_commit_files_path;
+CREATE INDEX IF NOT EXISTS ix_commit_files_path
+    ON commit_files (path, committed_at) INCLUDE (sha, id);
+
+ANALYZE project_commits;
+ANALYZE commit_files;
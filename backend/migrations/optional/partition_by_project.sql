@@ -0,0 +1,105 @@
+-- Optional layout for large installations: hash-partition the per-project
+-- tables, project_commits and qna, by project_id. Timelines, counts, date
+-- windows and Q&A lookups of a project then read one partition and its indexes
+-- instead of indexes over every project's rows.
+--
+-- commits, commit_ai and commit_files are not partitioned: they are stored once
+-- per SHA and shared by every project containing the commit (see
+-- 006_project_commits.sql), and the API reaches them by sha from project_commits.
+--
+-- Not part of the numbered migrations. Apply after them, in one transaction,
+-- while the API is stopped (the tables are rewritten):
+--
+--   PGOPTIONS='-c synapse.partitions=32' psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -1 \
+--       -f migrations/optional/partition_by_project.sql
+--
+-- synapse.partitions is the number of hash partitions per table (16 when unset).
+-- It can't be changed in place: run the script with synapse.partitions=0, which
+-- moves the data back into plain tables, then again with the new count.
+--
+-- The replaced tables are kept as <table>_unpartitioned (or <table>_partitioned
+-- when reverting) for checking; drop them before running the script again.
+-- Q&A rows without a project are not copied into the partitioned qna and stay
+-- in qna_unpartitioned.
+-- Partitioned qna's primary key is (project_id, id); ids still come from qna_id_seq.
+
+CREATE FUNCTION pg_temp.partition_by_project(
+    tbl text, plain_key text, partitioned_key text, partitions int
+) RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    is_partitioned boolean := EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = tbl::regclass);
+    old text := tbl || CASE WHEN partitions > 0 THEN '_unpartitioned' ELSE '_partitioned' END;
+    index_defs text[];
+    item record;
+    i int;
+BEGIN
+    IF is_partitioned = (partitions > 0) THEN
+        RAISE NOTICE '% is already %', tbl, CASE WHEN is_partitioned THEN 'partitioned' ELSE 'a plain table' END;
+        RETURN;
+    END IF;
+    -- A leftover table's partitions would also clash with the new partition names
+    FOR item IN SELECT unnest(ARRAY[tbl || '_unpartitioned', tbl || '_partitioned']) AS name LOOP
+        IF to_regclass(item.name) IS NOT NULL THEN
+            RAISE EXCEPTION '% is left from an earlier run; drop it first', item.name;
+        END IF;
+    END LOOP;
+
+    -- Secondary indexes are recreated from their definitions, so indexes added by
+    -- later migrations carry over; the primary key changes with the layout.
+    -- Definitions read off a partitioned table say ON ONLY, which would skip the partitions.
+    SELECT array_agg(replace(indexdef, ' ON ONLY ', ' ON ')) INTO index_defs
+    FROM pg_indexes
+    WHERE schemaname = current_schema() AND tablename = tbl
+      AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = tbl::regclass AND contype = 'p');
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, old);
+    -- Index names are unique per schema; renaming the primary key's index renames the constraint
+    FOR item IN SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = old LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', item.indexname,
+                       left(item.indexname, 45) || right(old, length(old) - length(tbl)));
+    END LOOP;
+
+    IF partitions > 0 THEN
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS, PRIMARY KEY (%s)) PARTITION BY HASH (project_id)',
+                       tbl, old, partitioned_key);
+        FOR i IN 0 .. partitions - 1 LOOP
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES WITH (MODULUS %s, REMAINDER %s)',
+                           tbl || '_p' || i, tbl, partitions, i);
+        END LOOP;
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I WHERE project_id IS NOT NULL', tbl, old);
+    ELSE
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS, PRIMARY KEY (%s))', tbl, old, plain_key);
+        IF position('project_id' IN plain_key) = 0 THEN
+            -- NOT NULL came with the partitioned primary key
+            EXECUTE format('ALTER TABLE %I ALTER COLUMN project_id DROP NOT NULL', tbl);
+        END IF;
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I', tbl, old);
+    END IF;
+
+    -- Foreign keys are validated once over the copied rows rather than per insert
+    FOR item IN SELECT conname, pg_get_constraintdef(oid) AS def FROM pg_constraint
+                WHERE conrelid = old::regclass AND contype = 'f' AND conparentid = 0 LOOP
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I %s', tbl, item.conname, item.def);
+    END LOOP;
+    FOR i IN 1 .. coalesce(array_length(index_defs, 1), 0) LOOP
+        EXECUTE index_defs[i];
+    END LOOP;
+    RAISE NOTICE '% moved to a % table; the old one is kept as %', tbl,
+                 CASE WHEN partitions > 0 THEN 'partitioned' ELSE 'plain' END, old;
+END $$;
+
+SELECT pg_temp.partition_by_project(
+    'project_commits', 'project_id, sha', 'project_id, sha',
+    coalesce(nullif(current_setting('synapse.partitions', true), ''), '16')::int
+);
+SELECT pg_temp.partition_by_project(
+    'qna', 'id', 'project_id, id',
+    coalesce(nullif(current_setting('synapse.partitions', true), ''), '16')::int
+);
+
+-- The copied qna.id default still draws from qna_id_seq; the sequence must
+-- belong to the live table, or dropping the old one would drop it too
+ALTER SEQUENCE IF EXISTS qna_id_seq OWNED BY qna.id;
+
+ANALYZE project_commits;
+ANALYZE qna;
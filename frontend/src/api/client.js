@@ -21,13 +21,63 @@ export const authAPI = {
 export const projectsAPI = {
   create: (data) => api.post('/projects/', data),
   get: (id) => api.get(`/projects/${id}`),
-  getCommits: (id, page = 1) => api.get(`/projects/${id}/commits?page=${page}`),
+  getBranches: (id) => api.get(`/projects/${id}/branches`),
+  addBranch: (id, name) => api.post(`/projects/${id}/branches`, { name }),
+  sync: (id) => api.post(`/projects/${id}/sync`),
+  // filters: { branch, risk_level, tag, author, since, until }; arrays repeat the key
+  getCommits: (id, page = 1, filters = {}) =>
+    api.get(`/projects/${id}/commits`, {
+      params: { page, ...filters },
+      paramsSerializer: { indexes: null },
+    }),
 }
 
 export const commitsAPI = {
   get: (sha) => api.get(`/commits/${sha}`),
   summarize: (sha) => api.post(`/commits/${sha}/summarize`),
   getGeminiSummary: (sha) => api.get(`/commits/${sha}/gemini-summary`),
+  getQuestions: (sha, limit = 20) => api.get(`/commits/${sha}/questions`, { params: { limit } }),
+  getPatch: (sha, path, offset = 0) =>
+    api.get(`/commits/${sha}/files/${path.split('/').map(encodeURIComponent).join('/')}/patch`, {
+      params: { offset },
+    }),
+}
+
+// ws:// or wss:// matching the API URL
+const EVENTS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws')
+
+export const eventsAPI = {
+  // Calls onEvent with each event pushed for the project ("commits", "summary",
+  // "resync"), reconnecting with backoff. Returns a function that closes the socket.
+  subscribe: (projectId, onEvent) => {
+    let socket = null
+    let timer = null
+    let closed = false
+    let retries = 0
+    const connect = () => {
+      socket = new WebSocket(`${EVENTS_BASE_URL}/projects/${projectId}/events`)
+      socket.onopen = () => {
+        // Events sent while disconnected are lost
+        if (retries > 0) onEvent({ type: 'resync' })
+        retries = 0
+      }
+      socket.onmessage = (message) => {
+        const event = JSON.parse(message.data)
+        if (event.type !== 'ping' && event.type !== 'hello') onEvent(event)
+      }
+      socket.onclose = (event) => {
+        if (closed || event.code === 4404) return
+        timer = setTimeout(connect, Math.min(30000, 1000 * 2 ** retries))
+        retries += 1
+      }
+    }
+    connect()
+    return () => {
+      closed = true
+      clearTimeout(timer)
+      socket?.close()
+    }
+  },
 }
 
 export const aiAPI = {
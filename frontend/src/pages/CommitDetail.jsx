@@ -12,9 +12,13 @@ export default function CommitDetail() {
   const [qna, setQna] = useState([])
   const [loading, setLoading] = useState(true)
   const [asking, setAsking] = useState(false)
+  // Patches are fetched per file when expanded: { [filename]: { text, nextOffset, loading, error } }
+  const [patches, setPatches] = useState({})
 
   useEffect(() => {
+    setPatches({})
     loadCommit()
+    loadQuestions()
   }, [sha])
 
   const loadCommit = async () => {
@@ -28,6 +32,48 @@ export default function CommitDetail() {
     }
   }
 
+  const loadQuestions = async () => {
+    try {
+      const response = await commitsAPI.getQuestions(sha)
+      // Newest first from the API; the list below reads oldest to newest
+      setQna(
+        response.data
+          .map((item) => ({ id: `saved-${item.id}`, question: item.question, answer: item.answer }))
+          .reverse()
+      )
+    } catch (error) {
+      console.error('Failed to load Q&A history:', error)
+    }
+  }
+
+  const loadPatch = async (filename, offset = 0) => {
+    setPatches((prev) => ({ ...prev, [filename]: { ...prev[filename], loading: true, error: null } }))
+    try {
+      const response = await commitsAPI.getPatch(sha, filename, offset)
+      setPatches((prev) => ({
+        ...prev,
+        [filename]: {
+          text: (offset > 0 ? prev[filename]?.text || '' : '') + response.data.patch,
+          nextOffset: response.data.next_offset,
+          loading: false,
+          open: true,
+        },
+      }))
+    } catch (error) {
+      console.error('Failed to load patch:', error)
+      setPatches((prev) => ({ ...prev, [filename]: { ...prev[filename], loading: false, error: 'Could not load the diff' } }))
+    }
+  }
+
+  const togglePatch = (filename) => {
+    const patch = patches[filename]
+    if (patch?.text !== undefined) {
+      setPatches((prev) => ({ ...prev, [filename]: { ...patch, open: !patch.open } }))
+    } else if (!patch?.loading) {
+      loadPatch(filename)
+    }
+  }
+
   const handleAsk = async (e) => {
     e.preventDefault()
     if (!question.trim()) return
@@ -322,8 +368,37 @@ export default function CommitDetail() {
                         {file.changes !== undefined && (
                           <span className="text-slate-400">{file.changes} changes</span>
                         )}
+                        {file.has_patch && (
+                          <button
+                            onClick={() => togglePatch(file.filename)}
+                            className="px-2 py-1 bg-slate-700/50 hover:bg-slate-600/50 text-slate-300 rounded-md transition-colors"
+                          >
+                            {patches[file.filename]?.loading
+                              ? 'Loading…'
+                              : patches[file.filename]?.open ? 'Hide diff' : 'Show diff'}
+                          </button>
+                        )}
                       </div>
                     </div>
+                    {patches[file.filename]?.error && (
+                      <div className="mt-3 text-xs text-red-400">{patches[file.filename].error}</div>
+                    )}
+                    {patches[file.filename]?.open && (
+                      <div className="mt-3">
+                        <pre className="max-h-96 overflow-auto bg-slate-950/60 rounded-lg p-3 text-xs font-mono text-slate-300 whitespace-pre">
+                          {patches[file.filename].text}
+                        </pre>
+                        {patches[file.filename].nextOffset != null && (
+                          <button
+                            onClick={() => loadPatch(file.filename, patches[file.filename].nextOffset)}
+                            disabled={patches[file.filename].loading}
+                            className="mt-2 text-xs text-violet-300 hover:text-violet-200"
+                          >
+                            Load more
+                          </button>
+                        )}
+                      </div>
+                    )}
                   </div>
                 ))}
               </div>
@@ -1,7 +1,26 @@
 import { useState, useEffect } from 'react'
 import { useParams, Link, useNavigate } from 'react-router-dom'
-import { projectsAPI, commitsAPI } from '../api/client'
-import { format } from 'date-fns'
+import { projectsAPI, commitsAPI, eventsAPI } from '../api/client'
+import { format, subDays } from 'date-fns'
+
+const EMPTY_FILTERS = { branch: '', risk: '', tags: '', author: '', days: '' }
+
+// Timeline filter form -> query params for GET /projects/{id}/commits
+const toParams = (filters) => {
+  const params = {}
+  if (filters.branch) params.branch = filters.branch
+  if (filters.risk) params.risk_level = [filters.risk]
+  const tags = filters.tags.split(',').map((t) => t.trim()).filter(Boolean)
+  if (tags.length) params.tag = tags
+  if (filters.author.trim()) params.author = filters.author.trim()
+  if (filters.days) params.since = subDays(new Date(), Number(filters.days)).toISOString()
+  return params
+}
+
+const totalOf = (response) => {
+  const total = parseInt(response.headers['x-total-count'], 10)
+  return Number.isNaN(total) ? null : total
+}
 
 export default function Timeline() {
   const { projectId } = useParams()
@@ -13,20 +32,62 @@ export default function Timeline() {
   const [hasMore, setHasMore] = useState(true)
   const [loadingMore, setLoadingMore] = useState(false)
   const [summarizingCommit, setSummarizingCommit] = useState(null)
+  const [filters, setFilters] = useState(EMPTY_FILTERS)
+  const [appliedFilters, setAppliedFilters] = useState(EMPTY_FILTERS)
+  const [total, setTotal] = useState(null)
+  const [branches, setBranches] = useState([])
+  const [newCommits, setNewCommits] = useState(0)
+  const [refreshes, setRefreshes] = useState(0)
 
   useEffect(() => {
     loadData()
   }, [projectId])
 
+  useEffect(() => {
+    if (!loading) reloadCommits()
+  }, [appliedFilters, refreshes])
+
+  // New commits and summaries are pushed instead of refetching the timeline
+  useEffect(() => {
+    return eventsAPI.subscribe(projectId, (event) => {
+      if (event.type === 'summary') {
+        showSummary(event.sha, event.ai_summary)
+      } else if (event.type === 'commits') {
+        setNewCommits((count) => count + event.count)
+      } else if (event.type === 'resync') {
+        setRefreshes((n) => n + 1)
+      }
+    })
+  }, [projectId])
+
+  const showSummary = (sha, summary) => {
+    setCommits((current) =>
+      current.map((commit) => (commit.sha === sha ? { ...commit, ai_summary: { ...commit.ai_summary, ...summary } } : commit))
+    )
+  }
+
+  const showNewCommits = () => {
+    setNewCommits(0)
+    setRefreshes((n) => n + 1)
+  }
+
+  const showCommits = (commitsRes, loaded) => {
+    const matching = totalOf(commitsRes)
+    setTotal(matching)
+    setHasMore(matching !== null ? loaded < matching : commitsRes.data.length === 20)
+  }
+
   const loadData = async () => {
     try {
-      const [projectRes, commitsRes] = await Promise.all([
+      const [projectRes, commitsRes, branchesRes] = await Promise.all([
         projectsAPI.get(projectId),
-        projectsAPI.getCommits(projectId, 1),
+        projectsAPI.getCommits(projectId, 1, toParams(appliedFilters)),
+        projectsAPI.getBranches(projectId),
       ])
       setProject(projectRes.data)
+      setBranches(branchesRes.data)
       setCommits(commitsRes.data)
-      setHasMore(commitsRes.data.length === 20)
+      showCommits(commitsRes, commitsRes.data.length)
     } catch (error) {
       console.error('Failed to load data:', error)
     } finally {
@@ -34,14 +95,38 @@ export default function Timeline() {
     }
   }
 
+  const reloadCommits = async () => {
+    setLoadingMore(true)
+    try {
+      const commitsRes = await projectsAPI.getCommits(projectId, 1, toParams(appliedFilters))
+      setCommits(commitsRes.data)
+      setPage(1)
+      showCommits(commitsRes, commitsRes.data.length)
+    } catch (error) {
+      console.error('Failed to filter commits:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
+  const applyFilters = (event) => {
+    event.preventDefault()
+    setAppliedFilters(filters)
+  }
+
+  const clearFilters = () => {
+    setFilters(EMPTY_FILTERS)
+    setAppliedFilters(EMPTY_FILTERS)
+  }
+
   const loadMoreCommits = async () => {
     setLoadingMore(true)
     try {
       const nextPage = page + 1
-      const commitsRes = await projectsAPI.getCommits(projectId, nextPage)
+      const commitsRes = await projectsAPI.getCommits(projectId, nextPage, toParams(appliedFilters))
       setCommits([...commits, ...commitsRes.data])
       setPage(nextPage)
-      setHasMore(commitsRes.data.length === 20)
+      showCommits(commitsRes, commits.length + commitsRes.data.length)
     } catch (error) {
       console.error('Failed to load more commits:', error)
     } finally {
@@ -55,12 +140,7 @@ export default function Timeline() {
       console.log(`🔄 Requesting AI summary for commit: ${sha}`)
       const response = await commitsAPI.summarize(sha)
       console.log(`✅ AI Summary response:`, response.data)
-    
-      // Refresh the commits list to show the new summary
-      console.log('🔄 Refreshing commits list...')
-      const commitsRes = await projectsAPI.getCommits(projectId, 1)
-      console.log('📊 Updated commits:', commitsRes.data)
-      setCommits(commitsRes.data)
+      showSummary(sha, response.data)
     
     } catch (error) {
       console.error('❌ Failed to generate AI summary:', error)
@@ -130,10 +210,99 @@ export default function Timeline() {
                 </span>
               </h1>
               <p className="text-slate-400">
-                <span className="text-violet-400 font-semibold">{commits.length}</span> commits analyzed.   
+                <span className="text-violet-400 font-semibold">{total ?? commits.length}</span> commits analyzed.   
               </p>
             </div>
           </div>
+
+          {newCommits > 0 && (
+            <button
+              onClick={showNewCommits}
+              className="w-full py-2 rounded-lg border border-violet-700/60 bg-violet-900/30 text-violet-200 text-sm hover:bg-violet-900/50 transition-colors"
+            >
+              {newCommits} new commit{newCommits === 1 ? '' : 's'}, click to show
+            </button>
+          )}
+
+          {/* Filters */}
+          <form
+            onSubmit={applyFilters}
+            className="flex flex-wrap items-end gap-3 bg-slate-900/60 backdrop-blur border border-slate-800 rounded-lg p-4"
+          >
+            {branches.length > 1 && (
+              <label className="flex flex-col gap-1 text-xs text-slate-400">
+                Branch
+                <select
+                  value={filters.branch}
+                  onChange={(e) => setFilters({ ...filters, branch: e.target.value })}
+                  className="bg-slate-800/60 border border-slate-700 rounded px-2 py-1.5 text-sm text-white"
+                >
+                  <option value="">All branches</option>
+                  {branches.map((b) => (
+                    <option key={b.name} value={b.name}>{b.name}</option>
+                  ))}
+                </select>
+              </label>
+            )}
+            <label className="flex flex-col gap-1 text-xs text-slate-400">
+              Risk
+              <select
+                value={filters.risk}
+                onChange={(e) => setFilters({ ...filters, risk: e.target.value })}
+                className="bg-slate-800/60 border border-slate-700 rounded px-2 py-1.5 text-sm text-white"
+              >
+                <option value="">Any</option>
+                <option value="high">High</option>
+                <option value="medium">Medium</option>
+                <option value="low">Low</option>
+              </select>
+            </label>
+            <label className="flex flex-col gap-1 text-xs text-slate-400">
+              Tags
+              <input
+                value={filters.tags}
+                onChange={(e) => setFilters({ ...filters, tags: e.target.value })}
+                placeholder="security, api"
+                className="bg-slate-800/60 border border-slate-700 rounded px-2 py-1.5 text-sm text-white w-40"
+              />
+            </label>
+            <label className="flex flex-col gap-1 text-xs text-slate-400">
+              Author
+              <input
+                value={filters.author}
+                onChange={(e) => setFilters({ ...filters, author: e.target.value })}
+                placeholder="login or name"
+                className="bg-slate-800/60 border border-slate-700 rounded px-2 py-1.5 text-sm text-white w-40"
+              />
+            </label>
+            <label className="flex flex-col gap-1 text-xs text-slate-400">
+              Period
+              <select
+                value={filters.days}
+                onChange={(e) => setFilters({ ...filters, days: e.target.value })}
+                className="bg-slate-800/60 border border-slate-700 rounded px-2 py-1.5 text-sm text-white"
+              >
+                <option value="">All time</option>
+                <option value="7">Last 7 days</option>
+                <option value="30">Last 30 days</option>
+                <option value="90">Last 90 days</option>
+                <option value="365">Last year</option>
+              </select>
+            </label>
+            <button
+              type="submit"
+              className="px-4 py-1.5 bg-gradient-to-r from-violet-600 to-blue-600 rounded-lg text-white text-sm font-medium hover:from-violet-700 hover:to-blue-700 transition-all duration-300"
+            >
+              Apply
+            </button>
+            <button
+              type="button"
+              onClick={clearFilters}
+              className="px-4 py-1.5 border border-slate-700 rounded-lg text-slate-300 text-sm hover:border-slate-600 transition-all duration-300"
+            >
+              Clear
+            </button>
+          </form>
         </div>
 
         {/* Timeline Container */}